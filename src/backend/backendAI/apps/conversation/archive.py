@@ -0,0 +1,150 @@
+"""Cold storage for inactive chat sessions.
+
+A session with no message activity for N days is packed, together with all
+of its messages, into one zstd-compressed BSON blob in
+`conversation_archives`, next to a small summary. The hot `conversations` /
+`messages` collections and their indexes then only hold active sessions.
+
+Archived sessions are restored transparently: `rehydrate_session` is called
+by the service when a session or message lookup misses.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+import bson
+import zstandard
+from bson.binary import Binary
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from pymongo import ReplaceOne
+
+from core.etag import bump_version, SESSION_SCOPE
+from .models import get_archives_collection, get_conversations_collection, get_messages_collection
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CODEC = "zstd+bson"
+
+# Stay clear of MongoDB's 16 MB document limit
+MAX_BLOB_BYTES = 15 * 1024 * 1024
+
+
+def _inactive_filter(cutoff):
+    return {"$or": [
+        {"last_activity_at": {"$lt": cutoff}},
+        {"last_activity_at": {"$exists": False}, "created_at": {"$lt": cutoff}},
+    ]}
+
+
+def archive_session(session):
+    """Move one session and its messages into the archive.
+
+    The session is only removed if its seq has not moved since it was read,
+    so a message written concurrently aborts the archival instead of being
+    lost. Returns (raw_bytes, stored_bytes), or None if skipped.
+    """
+    session_id = session["session_id"]
+    seq = session.get("seq")
+    messages = list(get_messages_collection().find({"session_id": session_id}).sort("_id", 1))
+
+    raw = bson.encode({"session": session, "messages": messages})
+    blob = zstandard.ZstdCompressor(level=settings.CONVERSATION_ARCHIVE_ZSTD_LEVEL).compress(raw)
+    if len(blob) > MAX_BLOB_BYTES:
+        logger.warning(f"[Archive] Session {session_id} too large to archive ({len(blob)} bytes compressed)")
+        return None
+
+    archives = get_archives_collection()
+    archives.replace_one(
+        {"session_id": session_id},
+        {
+            "session_id": session_id,
+            "user_id": session.get("user_id"),
+            "created_at": session.get("created_at"),
+            "last_activity_at": session.get("last_activity_at") or session.get("created_at"),
+            "archived_at": timezone.now(),
+            "message_count": len(messages),
+            "last_image_url": session.get("last_image_url"),
+            "codec": ARCHIVE_CODEC,
+            "raw_bytes": len(raw),
+            "blob": Binary(blob),
+        },
+        upsert=True,
+    )
+
+    # seq: None also matches sessions that never had a seq
+    if not get_conversations_collection().delete_one({"_id": session["_id"], "seq": seq}).deleted_count:
+        archives.delete_one({"session_id": session_id})
+        logger.info(f"[Archive] Session {session_id} changed during archival, skipped")
+        return None
+
+    # Messages stamped after the snapshot (none expected) stay behind and survive rehydration
+    get_messages_collection().delete_many({"session_id": session_id, "seq": {"$not": {"$gt": seq or 0}}})
+    cache.delete(f"session_owner:{session_id}")
+    bump_version(SESSION_SCOPE, session_id)
+    return len(raw), len(blob)
+
+
+def archive_inactive_sessions(inactive_days=90, batch_size=100, sleep_seconds=0.5, max_sessions=None):
+    """Archive sessions with no activity for `inactive_days`.
+
+    Returns:
+        {"archived": 120, "skipped": 1, "raw_bytes": ..., "stored_bytes": ..., "compression_ratio": 6.3}
+    """
+    cutoff = timezone.now() - timedelta(days=inactive_days)
+    conversations = get_conversations_collection()
+    stats = {"archived": 0, "skipped": 0, "raw_bytes": 0, "stored_bytes": 0}
+    # Skipped sessions stay inactive; page past them by _id
+    last_id = None
+
+    while max_sessions is None or stats["archived"] < max_sessions:
+        query = _inactive_filter(cutoff)
+        if last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        sessions = list(conversations.find(query).sort("_id", 1).limit(batch_size))
+        if not sessions:
+            break
+
+        for session in sessions:
+            last_id = session["_id"]
+            sizes = archive_session(session)
+            if sizes is None:
+                stats["skipped"] += 1
+                continue
+            stats["archived"] += 1
+            stats["raw_bytes"] += sizes[0]
+            stats["stored_bytes"] += sizes[1]
+
+        if len(sessions) < batch_size:
+            break
+        time.sleep(sleep_seconds)
+
+    stats["compression_ratio"] = round(stats["raw_bytes"] / stats["stored_bytes"], 1) if stats["stored_bytes"] else 0.0
+    logger.info(f"[Archive] Archived {stats['archived']} sessions inactive for {inactive_days} days: {stats}")
+    return stats
+
+
+def rehydrate_session(session_id):
+    """Restore an archived session into the hot collections. Returns the session or None."""
+    archives = get_archives_collection()
+    archive = archives.find_one({"session_id": session_id})
+    if not archive:
+        return None
+
+    data = bson.decode(zstandard.ZstdDecompressor().decompress(archive["blob"]))
+    session = data["session"]
+    session["last_activity_at"] = timezone.now()  # not re-archived by the next run
+    messages = data["messages"]
+
+    # Upserts by _id keep concurrent rehydrations of the same session idempotent
+    get_conversations_collection().replace_one({"_id": session["_id"]}, session, upsert=True)
+    if messages:
+        get_messages_collection().bulk_write(
+            [ReplaceOne({"_id": message["_id"]}, message, upsert=True) for message in messages],
+            ordered=False,
+        )
+    archives.delete_one({"_id": archive["_id"]})
+    logger.info(f"[Archive] Rehydrated session {session_id} ({len(messages)} messages)")
+    return session
@@ -4,19 +4,34 @@ from pymongo import ReturnDocument
 from .models import get_conversations_collection
 from core import ResponseFormatter
 from core import ResponseCode
+from core.claim_check import claim, ClaimCheckError
+from core.scheduler import release
+from core.job_limiter import release_job
+from core.cancellation import CANCELED, is_cancelled
 
 
-@shared_task(name="conversation.finalize_conversation_task")
+@shared_task(name="conversation.finalize_conversation_task", ignore_result=True)
 def finalize_conversation_task(result_tuple, session_id: str, message_id: str) -> dict:
     """Persist final results of prompt+image pipeline into the conversation.
     Stores refined_prompt and image_url (if present) with status COMPLETED or FAILED.
     """
-    from .service import add_message, update_message_by_message_id
+    from .service import NOT_CANCELED, update_message_by_message_id
     
     import logging
     logger = logging.getLogger(__name__)
 
-    refined_prompt_data, generated_image_data = result_tuple
+    try:
+        refined_prompt_data, generated_image_data = claim(result_tuple)
+    except ClaimCheckError as e:
+        logger.error(f"[Finalize] {e}")
+        refined_prompt_data, generated_image_data = {}, ResponseFormatter.error(message="Processing result expired.")
+
+    # Canceled request (or a pipeline step of one): no result is stored, even if the feature finished
+    if is_cancelled(message_id) or (generated_image_data.get("result") or {}).get("status") == CANCELED:
+        update_message_by_message_id(session_id, message_id, {"status": CANCELED, "content": "Canceled."})
+        release(message_id)
+        release_job(message_id)
+        return {"ok": False, "canceled": True}
 
     # Check if pipeline failed
     if refined_prompt_data.get("code") == ResponseCode.ERROR or generated_image_data.get("code") == ResponseCode.ERROR:
@@ -44,7 +59,10 @@ def finalize_conversation_task(result_tuple, session_id: str, message_id: str) -
             }
         }
         
-        update_message_by_message_id(session_id, message_id, message)
+        # A cancel that landed since the check above keeps the message CANCELED
+        update_message_by_message_id(session_id, message_id, message, where=NOT_CANCELED)
+        release(message_id)
+        release_job(message_id)
         return {"ok": False, "error": error_message}
     else:
         # Extract refined prompt info
@@ -52,6 +70,13 @@ def finalize_conversation_task(result_tuple, session_id: str, message_id: str) -
         
         # Extract image info
         image_result = generated_image_data.get("result", {})
+
+        if image_result.get("operations"):
+            # Multi-step request: the pipeline completes this message when its last step is done
+            from apps.intent_router.pipeline import start_pipeline
+            # The job's scheduler slot and permit are released when the last step finishes
+            plan = start_pipeline(session_id, message_id, refined, image_result["operations"])
+            return {"ok": True, "pipeline_id": plan["pipeline_id"]}
         
         # Debug logging
         logger.warning(f"[Finalize] refined keys: {refined.keys() if refined else 'None'}")
@@ -84,5 +109,25 @@ def finalize_conversation_task(result_tuple, session_id: str, message_id: str) -
             message["image_url"] = urls[0] if urls else None
             message["uploaded_urls"] = urls
 
-    update_message_by_message_id(session_id, message_id, message)
+    update_message_by_message_id(session_id, message_id, message, where=NOT_CANCELED)
+    release(message_id)
+    release_job(message_id)
     return {"ok": True}
+
+
+@shared_task(name="conversation.archive_inactive_sessions_task", ignore_result=True)
+def archive_inactive_sessions_task(inactive_days: int = None, batch_size: int = None, max_sessions: int = None):
+    """Move inactive chat sessions into compressed cold storage.
+
+    Scheduled by Celery beat (see backendAI/celery.py). Arguments default to
+    the CONVERSATION_ARCHIVE_* settings.
+    """
+    from django.conf import settings
+    from .archive import archive_inactive_sessions
+
+    return archive_inactive_sessions(
+        inactive_days=inactive_days or settings.CONVERSATION_ARCHIVE_AFTER_DAYS,
+        batch_size=batch_size or settings.CONVERSATION_ARCHIVE_BATCH_SIZE,
+        sleep_seconds=settings.CONVERSATION_ARCHIVE_SLEEP_SECONDS,
+        max_sessions=max_sessions or settings.CONVERSATION_ARCHIVE_MAX_SESSIONS or None,
+    )
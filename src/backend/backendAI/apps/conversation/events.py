@@ -0,0 +1,95 @@
+"""Redis pub/sub channel per chat session.
+
+Writers (API and Celery workers) publish message changes with
+`publish_message_event`; the SSE endpoint relays them to clients with
+`stream_session_events`.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from core.redis_client import get_redis
+
+from .message_schema import expand_message
+
+logger = logging.getLogger(__name__)
+
+_stream_slots = threading.BoundedSemaphore(settings.SSE_MAX_STREAMS_PER_PROCESS)
+
+# Reconnect delay sent when this process already serves SSE_MAX_STREAMS_PER_PROCESS streams
+BUSY_RETRY_MS = 10000
+
+
+def session_channel(session_id):
+    return f"chat:session:{session_id}"
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def publish_message_event(session_id, event, message):
+    """Publish a message change to the session channel. Never raises."""
+    if not message:
+        return
+    try:
+        get_redis().publish(session_channel(session_id), json.dumps({"event": event, "message": message}, default=str))
+    except Exception as e:
+        logger.warning(f"[ChatEvents] Failed to publish {event} for session {session_id}: {str(e)}")
+
+
+def stream_session_events(session_id, message_id=None):
+    """Yield SSE frames for a session until SSE_MAX_STREAM_SECONDS elapse.
+
+    Every open stream holds a server thread, so a process serves at most
+    SSE_MAX_STREAMS_PER_PROCESS; further clients are told to reconnect
+    after BUSY_RETRY_MS.
+
+    Args:
+        session_id: Session to follow
+        message_id: Optional message whose current state is sent first, so a
+            client that connects after the message finished still receives
+            its final state. It is read after subscribing; an update landing
+            in between arrives as an event instead of being lost.
+    """
+    if not _stream_slots.acquire(blocking=False):
+        logger.warning(f"[ChatEvents] Stream limit reached, asking session {session_id} to reconnect")
+        yield f"retry: {BUSY_RETRY_MS}\n\n"
+        return
+    try:
+        yield from _stream(session_id, message_id)
+    finally:
+        _stream_slots.release()
+
+
+def _stream(session_id, message_id):
+    # service publishes through this module; import it at call time
+    from .service import get_message
+
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(session_channel(session_id))
+    deadline = time.monotonic() + settings.SSE_MAX_STREAM_SECONDS
+    last_sent = time.monotonic()
+
+    try:
+        yield "retry: 3000\n\n"
+        if message_id:
+            initial = get_message(session_id, message_id)
+            if initial:
+                yield _sse("message.snapshot", expand_message(initial))
+
+        while time.monotonic() < deadline:
+            item = pubsub.get_message(timeout=1.0)
+            if item and item.get("type") == "message":
+                payload = json.loads(item["data"])
+                yield _sse(payload["event"], payload["message"])
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= settings.SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        pubsub.close()
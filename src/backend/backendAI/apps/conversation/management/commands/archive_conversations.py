@@ -0,0 +1,34 @@
+"""
+Move chat sessions inactive for N days into compressed cold storage.
+
+Usage:
+    python manage.py archive_conversations --inactive-days 90 --batch-size 100
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.conversation.archive import archive_inactive_sessions
+
+
+class Command(BaseCommand):
+    help = "Archive inactive conversation sessions into zstd-compressed blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inactive-days', type=int, default=settings.CONVERSATION_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.CONVERSATION_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--sleep', type=float, default=settings.CONVERSATION_ARCHIVE_SLEEP_SECONDS,
+                            help="Seconds to pause between batches")
+        parser.add_argument('--max-sessions', type=int, default=settings.CONVERSATION_ARCHIVE_MAX_SESSIONS or None)
+
+    def handle(self, *args, **options):
+        stats = archive_inactive_sessions(
+            inactive_days=options['inactive_days'],
+            batch_size=options['batch_size'],
+            sleep_seconds=options['sleep'],
+            max_sessions=options['max_sessions'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {stats['archived']} sessions ({stats['skipped']} skipped), "
+            f"{stats['raw_bytes']} -> {stats['stored_bytes']} bytes (x{stats['compression_ratio']})"
+        ))
@@ -0,0 +1,42 @@
+"""
+Move embedded `conversations.messages` arrays into the `messages` collection.
+
+Safe to re-run and to run while the API is serving: sessions that still have
+an embedded array are also migrated lazily on first access.
+
+Usage:
+    python manage.py migrate_conversation_messages --batch-size 100
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.conversation.models import get_conversations_collection, ensure_indexes
+from apps.conversation.service import migrate_embedded_messages
+
+
+class Command(BaseCommand):
+    help = "Move embedded conversation messages into the messages collection"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Sessions fetched per cursor batch")
+        parser.add_argument('--limit', type=int, default=0,
+                            help="Stop after this many sessions (0 = all)")
+
+    def handle(self, *args, **options):
+        ensure_indexes()
+        conversations = get_conversations_collection()
+        cursor = conversations.find(
+            {"messages": {"$exists": True}},
+            batch_size=options['batch_size'],
+        ).limit(options['limit'])
+
+        sessions = 0
+        moved = 0
+        for session in cursor:
+            moved += migrate_embedded_messages(session)
+            sessions += 1
+            if sessions % 100 == 0:
+                self.stdout.write(f"{sessions} sessions migrated ({moved} messages)")
+
+        self.stdout.write(self.style.SUCCESS(f"Migrated {sessions} sessions, {moved} messages"))
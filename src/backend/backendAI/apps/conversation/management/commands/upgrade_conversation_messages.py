@@ -0,0 +1,60 @@
+"""
+Rewrite stored chat messages into the compact v2 schema.
+
+Messages are also upgraded lazily when read; this command clears the
+backlog in small batches so cold sessions shrink too. Safe to re-run.
+
+Usage:
+    python manage.py upgrade_conversation_messages --batch-size 500 --sleep 0.2
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from pymongo import ReplaceOne
+
+from apps.conversation.models import get_messages_collection
+from apps.conversation.message_schema import SCHEMA_VERSION, compact_message
+
+
+class Command(BaseCommand):
+    help = "Upgrade conversation messages to the compact schema in keyset-ordered batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0.2,
+                            help="Seconds to pause between batches")
+        parser.add_argument('--max-batches', type=int, default=0,
+                            help="Stop after this many batches (0 = until done)")
+
+    def handle(self, *args, **options):
+        messages = get_messages_collection()
+        query = {"v": {"$ne": SCHEMA_VERSION}}
+        last_id = None
+        batches = 0
+        upgraded = 0
+
+        while not options['max_batches'] or batches < options['max_batches']:
+            batch_query = dict(query, _id={"$gt": last_id}) if last_id else query
+            docs = list(messages.find(batch_query).sort("_id", 1).limit(options['batch_size']))
+            if not docs:
+                break
+
+            operations = [
+                ReplaceOne(
+                    {"_id": doc["_id"], "v": {"$ne": SCHEMA_VERSION}},
+                    dict(compact_message(doc), session_id=doc.get("session_id")),
+                )
+                for doc in docs
+            ]
+            result = messages.bulk_write(operations, ordered=False)
+            upgraded += result.modified_count
+            batches += 1
+            last_id = docs[-1]["_id"]
+            self.stdout.write(f"Batch {batches}: {result.modified_count} messages (total {upgraded})")
+
+            if len(docs) < options['batch_size']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Upgraded {upgraded} messages in {batches} batches"))
@@ -0,0 +1,150 @@
+"""Stored message schema (v2) and the legacy API shape.
+
+v1 (legacy) system messages repeated each result URL three times
+(image.image_url, image_url, uploaded_urls) and carried the full refined
+prompt metadata; user messages kept the whole validated request.
+
+v2 stores every value once under short keys and omits empty values:
+
+    common  message_id, role, created_at, seq, deleted, deleted_at, v=2
+            (unchanged: they are indexed or queried)
+    st      status
+    txt     prompt / content text
+    urls    image URLs (user: the direct input image)
+    rp, in  refined prompt text and intent
+    meta    image metadata
+    err, ec error message and [refined_code, image_code]
+    sel, add, fp   selected_messages, additional_images, feature_params
+
+`compact_message` converts either shape (or a partial update) to v2;
+`expand_message` renders v2 back into the v1 shape existing clients expect.
+`message_image_urls` reads context images from either shape.
+"""
+
+SCHEMA_VERSION = 2
+
+# Keys stored unchanged in both versions
+COMMON_FIELDS = ("message_id", "role", "created_at", "seq", "deleted", "deleted_at")
+
+# v1 keys replaced by v2 short keys
+LEGACY_FIELDS = (
+    "status", "prompt", "content", "image_url", "uploaded_urls", "image",
+    "refined_prompt", "error", "selected_messages", "additional_images",
+    "feature_params", "user_id",
+)
+
+# v1 keys superseded by each v2 key (unset when a v2 update lands on a v1 doc)
+SHORT_TO_LEGACY = {
+    "st": ("status",),
+    "txt": ("prompt", "content"),
+    "urls": ("image_url", "uploaded_urls", "image"),
+    "rp": ("refined_prompt",),
+    "in": ("refined_prompt",),
+    "meta": ("image",),
+    "err": ("error", "prompt", "content"),
+    "ec": ("error",),
+    "sel": ("selected_messages",),
+    "add": ("additional_images",),
+    "fp": ("feature_params",),
+}
+
+_SHORT_KEYS = tuple(SHORT_TO_LEGACY)
+
+
+def _empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+
+def compact_message(message):
+    """v2 document for a v1/v2 message or a partial update (fields only)."""
+    if message.get("v") == SCHEMA_VERSION:
+        return dict(message)
+
+    out = {key: message[key] for key in COMMON_FIELDS if key in message}
+    image = message.get("image") or {}
+    refined = message.get("refined_prompt") or {}
+    error = message.get("error") or {}
+
+    out["st"] = message.get("status")
+    out["txt"] = message.get("prompt") or message.get("content")
+    out["urls"] = (
+        message.get("uploaded_urls")
+        or [url for url in (message.get("image_url") or image.get("image_url"),) if url]
+    )
+    if isinstance(refined, dict):
+        out["rp"] = refined.get("prompt")
+        out["in"] = refined.get("intent")
+    else:
+        out["rp"] = refined
+    out["meta"] = {k: v for k, v in (image.get("metadata") or {}).items() if not (k == "intent" and v == out["in"])}
+    out["err"] = error.get("message")
+    if out["err"] and out["txt"] == out["err"]:
+        out["txt"] = None
+    codes = [error.get("refined_code"), error.get("image_code")]
+    out["ec"] = codes if any(code is not None for code in codes) else None
+    out["sel"] = message.get("selected_messages")
+    out["add"] = message.get("additional_images")
+    out["fp"] = message.get("feature_params")
+
+    # Keep anything this schema does not know about
+    for key, value in message.items():
+        if key not in COMMON_FIELDS and key not in LEGACY_FIELDS and key not in ("_id", "session_id", "v"):
+            out.setdefault(key, value)
+
+    out = {key: value for key, value in out.items() if not _empty(value) or key in COMMON_FIELDS}
+    out["v"] = SCHEMA_VERSION
+    return out
+
+
+def expand_message(doc, user_id=None):
+    """Render a stored message in the v1 API shape."""
+    if not doc or doc.get("v") != SCHEMA_VERSION:
+        return doc
+
+    message = {key: doc[key] for key in COMMON_FIELDS if key in doc}
+    if doc.get("deleted"):
+        return message
+
+    urls = doc.get("urls", [])
+    if "st" in doc:
+        message["status"] = doc["st"]
+
+    if doc.get("role") == "user":
+        message["prompt"] = doc.get("txt", "")
+        if urls:
+            message["image_url"] = urls[0]
+        if user_id:
+            message["user_id"] = user_id
+        for short, legacy in (("sel", "selected_messages"), ("add", "additional_images"), ("fp", "feature_params")):
+            if short in doc:
+                message[legacy] = doc[short]
+    elif doc.get("err"):
+        message["content"] = message["prompt"] = doc["err"]
+        refined_code, image_code = doc.get("ec") or [None, None]
+        message["error"] = {"message": doc["err"], "refined_code": refined_code, "image_code": image_code}
+    else:
+        if "txt" in doc:
+            message["content"] = message["prompt"] = doc["txt"]
+        if "rp" in doc or "in" in doc:
+            message["refined_prompt"] = {"prompt": doc.get("rp", ""), "intent": doc.get("in", ""), "metadata": {}}
+        if urls:
+            metadata = dict(doc.get("meta", {}))
+            if "in" in doc:
+                metadata.setdefault("intent", doc["in"])
+            message["image"] = {"image_url": urls[0], "metadata": metadata}
+            message["image_url"] = urls[0]
+            message["uploaded_urls"] = urls
+
+    for key, value in doc.items():
+        if key not in COMMON_FIELDS and key not in _SHORT_KEYS and key not in ("_id", "session_id", "v"):
+            message.setdefault(key, value)
+    return message
+
+
+def message_image_urls(message):
+    """Context images of a message in either shape: the primary image, else all uploads."""
+    if message.get("v") == SCHEMA_VERSION:
+        return list(message.get("urls", [])[:1])
+    if message.get("image_url"):
+        return [message["image_url"]]
+    return list(message.get("uploaded_urls") or [])
@@ -2,13 +2,57 @@
 
 Avoid performing any network/DB access at module import time so Django
 startup or simple imports don't require configured settings. Use
-`get_conversations_collection()` to obtain the collection when needed.
+`get_conversations_collection()` / `get_messages_collection()` to obtain
+the collections when needed.
+
+Layout:
+    conversations:         one small document per session (session_id, user_id, created_at)
+    messages:              one document per message, keyed by session_id + message_id
+    conversation_archives: inactive sessions as one compressed blob each (see archive.py)
 """
 
-from .mongo_client import get_collection
+from pymongo import ASCENDING
+
+from core.mongo import get_collection
+
+_indexes_ready = False
 
 
 def get_conversations_collection():
 	"""Return the `conversations` collection (lazy)."""
 	return get_collection('conversations')
 
+
+def get_messages_collection():
+	"""Return the `messages` collection (lazy), creating its indexes on first use."""
+	collection = get_collection('messages')
+	if not _indexes_ready:
+		ensure_indexes()
+	return collection
+
+
+def get_archives_collection():
+	"""Return the `conversation_archives` collection (lazy)."""
+	return get_collection('conversation_archives')
+
+
+def ensure_indexes():
+	"""Create the conversation indexes (idempotent)."""
+	global _indexes_ready
+	messages = get_collection('messages')
+	# Session history in order
+	messages.create_index([('session_id', ASCENDING), ('created_at', ASCENDING)], name='session_created_at')
+	# Single-message lookups / status updates
+	messages.create_index([('message_id', ASCENDING)], name='message_id')
+	# Delta sync: changes after a per-session sequence number
+	messages.create_index([('session_id', ASCENDING), ('seq', ASCENDING)], name='session_seq')
+	get_conversations_collection().create_index([('session_id', ASCENDING)], name='session_id')
+	# Archival scan for inactive sessions
+	get_conversations_collection().create_index([('last_activity_at', ASCENDING)], name='last_activity_at')
+	get_archives_collection().create_index([('session_id', ASCENDING)], name='session_id', unique=True)
+	get_archives_collection().create_index([('user_id', ASCENDING)], name='user_id')
+	# Positional lookups into sessions not yet migrated off the embedded array
+	get_conversations_collection().create_index(
+		[('messages.message_id', ASCENDING)], name='legacy_messages_message_id', sparse=True
+	)
+	_indexes_ready = True
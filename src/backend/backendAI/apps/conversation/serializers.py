@@ -16,8 +16,9 @@ class MessageInputSerializer(serializers.Serializer):
     )
     
     # Message context for editing
+    # Ids end up in Mongo field paths (message_images.<id>), so only UUIDs are accepted
     selected_messages = serializers.ListField(
-        child=serializers.CharField(), 
+        child=serializers.UUIDField(), 
         required=False,
         help_text="List of message IDs to use as context (for image editing features)"
     )
@@ -42,6 +43,9 @@ class MessageInputSerializer(serializers.Serializer):
         """
     )
 
+    def validate_selected_messages(self, value):
+        return [str(message_id) for message_id in value]
+
     def validate(self, attrs):
         if not attrs.get('prompt') and not attrs.get('selected_messages'):
             raise serializers.ValidationError("Either prompt or selected_messages is required.")
@@ -1,9 +1,13 @@
 # conversation/service.py
-from .models import get_conversations_collection
+from .models import get_conversations_collection, get_messages_collection, get_archives_collection
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from pymongo import ReturnDocument
+from pymongo import ReturnDocument, ReplaceOne, UpdateOne
+from pymongo.errors import PyMongoError
 import uuid
 import logging
+from datetime import timedelta
 from apps.prompt_service.celery_tasks import process_prompt_task
 from apps.image_service.celery_tasks import generate_image_task
 from .celery_tasks import finalize_conversation_task
@@ -11,53 +15,424 @@ from celery import chain
 from core import ResponseFormatter
 from core.token_client import token_client
 from core.exceptions import InsufficientTokensError, TokenServiceError
+from core.claim_check import check_in
+from core.scheduler import submit, cancel as cancel_scheduled, DEFAULT_TIER
+from core.job_limiter import acquire_job, release_job
+from core.cancellation import CANCELED, request_cancel
+from core.etag import bump_version, SESSION_SCOPE
+from .events import publish_message_event
+from .archive import rehydrate_session
+from .message_schema import SCHEMA_VERSION, SHORT_TO_LEGACY, compact_message, expand_message, message_image_urls
 
 logger = logging.getLogger(__name__)
 
 
+# Message documents are returned without Mongo/internal keys
+MESSAGE_PROJECTION = {"_id": 0, "session_id": 0, "seq_at": 0}
+SYNC_PROJECTION = {"_id": 0, "session_id": 0}
+
+# Deleted messages stay behind as tombstones ({message_id, deleted, seq}) for sync
+LIVE_MESSAGES = {"deleted": {"$ne": True}}
+
+# Conditions for update_message_by_message_id(where=...); v1 docs keep `status`, v2 docs `st`
+STILL_PROCESSING = {"$or": [{"st": "PROCESSING"}, {"status": "PROCESSING"}]}
+NOT_CANCELED = {"st": {"$ne": CANCELED}, "status": {"$ne": CANCELED}}
+
+# Max changes returned by one sync page
+SYNC_PAGE_SIZE = 200
+
+
+def _next_seq(session_id, count=1):
+    """Reserve `count` values of the session's change sequence; returns the last one.
+
+    Every message insert, update and delete is stamped with a fresh seq (and
+    `seq_at`, the time of the write) so clients can ask for "changes after N"
+    (see sync_messages). A seq is reserved one round trip before its write
+    lands, and writes of one session do run concurrently (a user turn, the
+    finalize of an earlier message, a cancel), so a lower seq can become
+    visible after a higher one. sync_messages only moves the cursor past
+    writes older than SYNC_SETTLE_SECONDS for that reason.
+    """
+    session = get_conversations_collection().find_one_and_update(
+        {"session_id": session_id},
+        {"$inc": {"seq": count}, "$set": {"last_activity_at": timezone.now()}},
+        projection={"_id": 0, "seq": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    return session["seq"] if session else None
+
+
 def create_or_get_session(user_id):
     conversations = get_conversations_collection()
     session_id = str(uuid.uuid4())
     doc = conversations.find_one_and_update(
         {"session_id": session_id},
-        {"$setOnInsert": {"session_id": session_id, "user_id": user_id, "messages": [], "created_at": timezone.now()}},
+        {"$setOnInsert": {
+            "session_id": session_id,
+            "user_id": user_id,
+            "created_at": timezone.now(),
+            # Context pointers, see _record_message_images
+            "last_image_url": None,
+            "last_uploaded_urls": [],
+            "message_images": {},
+        }},
         upsert=True,
         return_document=ReturnDocument.AFTER,
     )
+    doc["messages"] = []
     return doc
 
 
-def add_message(session_id, message):
-    message = dict(message)
-    if 'created_at' not in message:
-        message['created_at'] = timezone.now()
-    if 'message_id' not in message:
-        message["message_id"] = str(uuid.uuid4())
+def migrate_embedded_messages(session_doc):
+    """Move a legacy session's embedded `messages` array into the messages collection.
 
+    Idempotent: messages are upserted by (session_id, message_id) before the
+    array is removed, so a crash in between only repeats the copy.
+    Returns the number of messages moved.
+    """
+    embedded = session_doc.get("messages")
+    if embedded is None:
+        return 0
+
+    session_id = session_doc["session_id"]
+    last_seq = _next_seq(session_id, len(embedded)) if embedded else 0
+    operations = []
+    for offset, message in enumerate(embedded):
+        message = dict(message)
+        message.pop("_id", None)
+        message.setdefault("message_id", str(uuid.uuid4()))
+        message["session_id"] = session_id
+        message["seq"] = last_seq - len(embedded) + 1 + offset
+        message = dict(compact_message(message), session_id=session_id, seq_at=timezone.now())
+        operations.append(ReplaceOne(
+            {"session_id": session_id, "message_id": message["message_id"]},
+            message,
+            upsert=True,
+        ))
+
+    if operations:
+        get_messages_collection().bulk_write(operations, ordered=False)
+    get_conversations_collection().update_one({"_id": session_doc["_id"]}, {"$unset": {"messages": ""}})
+    logger.info(f"Moved {len(operations)} embedded messages of session {session_id} to the messages collection")
+    return len(operations)
+
+
+def get_session_owner(session_id):
+    """user_id of a session, cached since it never changes."""
+    cache_key = f"session_owner:{session_id}"
+    user_id = cache.get(cache_key)
+    if user_id is None:
+        session = get_session(session_id, fields=["user_id"])
+        user_id = session.get("user_id") if session else None
+        if user_id:
+            cache.set(cache_key, user_id, timeout=settings.SESSION_OWNER_CACHE_SECONDS)
+    return user_id
+
+
+def get_session(session_id, fields=None):
+    """Session document without messages; `fields` limits the projection.
+
+    Archived sessions are rehydrated on access.
+    """
+    projection = {field: 1 for field in fields} if fields else None
+    if projection is not None:
+        projection["messages"] = {"$slice": 0}
     conversations = get_conversations_collection()
-    res = conversations.find_one_and_update(
-        {"session_id": session_id},
-        {"$push": {"messages": message}},
-        return_document=ReturnDocument.AFTER,
+    session = conversations.find_one({"session_id": session_id}, projection)
+    if session is None and rehydrate_session(session_id):
+        session = conversations.find_one({"session_id": session_id}, projection)
+    if session and "messages" in session:
+        # Legacy embedded layout: migrate on first touch
+        full = session if projection is None else conversations.find_one({"session_id": session_id})
+        migrate_embedded_messages(full)
+        session.pop("messages", None)
+    return session
+
+
+def _upgrade_on_read(session_id, docs):
+    """Return docs in the v2 schema, writing back any v1 ones (once per message)."""
+    upgraded = []
+    operations = []
+    for doc in docs:
+        if doc.get("v") != SCHEMA_VERSION:
+            doc = compact_message(doc)
+            operations.append(ReplaceOne(
+                {"session_id": session_id, "message_id": doc["message_id"], "v": {"$exists": False}},
+                dict(doc, session_id=session_id),
+            ))
+        upgraded.append(doc)
+
+    if operations:
+        try:
+            get_messages_collection().bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            logger.warning(f"Failed to upgrade {len(operations)} messages of session {session_id}: {str(e)}")
+    return upgraded
+
+
+def get_messages(session_id, limit=None):
+    """Messages of a session in creation order (the newest `limit` if given)."""
+    cursor = get_messages_collection().find({"session_id": session_id, **LIVE_MESSAGES}, MESSAGE_PROJECTION)
+    if limit:
+        messages = list(cursor.sort([("created_at", -1), ("_id", -1)]).limit(limit))
+        messages.reverse()
+        return _upgrade_on_read(session_id, messages)
+    return _upgrade_on_read(session_id, list(cursor.sort([("created_at", 1), ("_id", 1)])))
+
+
+def get_message(session_id, message_id):
+    """Single message by (session_id, message_id) as one small indexed read.
+
+    Falls back to a positional projection for sessions still in the legacy
+    embedded layout, so only the matching array element is returned.
+    """
+    message = get_messages_collection().find_one(
+        {"message_id": message_id, "session_id": session_id},
+        MESSAGE_PROJECTION,
+    )
+    if message:
+        return None if message.get("deleted") else _upgrade_on_read(session_id, [message])[0]
+    if rehydrate_session(session_id):
+        return get_message(session_id, message_id)
+
+    legacy = get_conversations_collection().find_one(
+        {"session_id": session_id, "messages.message_id": message_id},
+        {"_id": 0, "messages.$": 1},
     )
-    return message
+    if legacy and legacy.get("messages"):
+        message = legacy["messages"][0]
+        message.pop("_id", None)
+        return compact_message(message)
+    return None
 
 
-def update_message_by_message_id(session_id, message_id, fields: dict):
-    conversations = get_conversations_collection()
-    return conversations.find_one_and_update(
+def get_messages_by_ids(session_id, message_ids):
+    """Messages of a session with the given ids, in the order requested."""
+    if not message_ids:
+        return []
+    found = {
+        m["message_id"]: m
+        for m in _upgrade_on_read(session_id, get_messages_collection().find(
+            {"session_id": session_id, "message_id": {"$in": list(message_ids)}, **LIVE_MESSAGES},
+            MESSAGE_PROJECTION,
+        ))
+    }
+    return [found[message_id] for message_id in message_ids if message_id in found]
+
+
+def get_last_system_image_message(session_id):
+    """Newest system message carrying images."""
+    message = get_messages_collection().find_one(
         {
             "session_id": session_id,
-            "messages.message_id": message_id
+            "role": "system",
+            "$or": [
+                {"urls.0": {"$exists": True}},
+                {"image_url": {"$nin": [None, ""]}},
+                {"uploaded_urls.0": {"$exists": True}},
+            ],
         },
+        MESSAGE_PROJECTION,
+        sort=[("created_at", -1), ("_id", -1)],
+    )
+    return _upgrade_on_read(session_id, [message])[0] if message else None
+
+
+def _last_image_update(session_id, message, urls):
+    # (filter, update) moving the pointer to `message`. It only moves forward:
+    # a late update of an older message leaves a newer image in place.
+    return (
+        {"session_id": session_id, "last_image_at": {"$not": {"$gt": message.get("created_at")}}},
+        {"$set": {
+            "last_image_url": urls[0],
+            "last_uploaded_urls": list(message.get("urls", [])),
+            "last_image_at": message.get("created_at"),
+            "last_image_message_id": message["message_id"],
+        }},
+    )
+
+
+def _record_message_images(session_id, message):
+    """Keep the session's context pointers in step with a message that carries images.
+
+    One bulk write sets message_images.<message_id> and, for system messages
+    newer than the current pointer, last_image_url / last_uploaded_urls, so
+    process_message can resolve context images from a single projected
+    session read.
+    """
+    urls = message_image_urls(message)
+    if not urls:
+        return
+    operations = [UpdateOne(
+        {"session_id": session_id}, {"$set": {f"message_images.{message['message_id']}": urls}}
+    )]
+    if message.get("role") == "system":
+        operations.append(UpdateOne(*_last_image_update(session_id, message, urls)))
+    get_conversations_collection().bulk_write(operations, ordered=False)
+
+
+def _forget_message_images(session_id, message_id):
+    """Drop a deleted message from the context pointers, falling back to the previous image."""
+    conversations = get_conversations_collection()
+    conversations.update_one({"session_id": session_id}, {"$unset": {f"message_images.{message_id}": ""}})
+    cleared = conversations.update_one(
+        {"session_id": session_id, "last_image_message_id": message_id},
+        {"$set": {"last_image_url": None, "last_uploaded_urls": [], "last_image_at": None, "last_image_message_id": None}},
+    )
+    if not cleared.modified_count:
+        return
+    previous = get_last_system_image_message(session_id)
+    urls = message_image_urls(previous or {})
+    if urls:
+        conversations.update_one(*_last_image_update(session_id, previous, urls))
+
+
+def add_messages(session_id, messages):
+    """Insert several messages (stored compact) with one bulk write, one seq block and one version bump.
+
+    Returns the stored (v2) documents.
+    """
+    messages = [dict(message) for message in messages]
+    last_seq = _next_seq(session_id, len(messages))
+    for offset, message in enumerate(messages):
+        if 'created_at' not in message:
+            message['created_at'] = timezone.now()
+        if 'message_id' not in message:
+            message["message_id"] = str(uuid.uuid4())
+        message["seq"] = last_seq - len(messages) + 1 + offset if last_seq is not None else None
+    messages = [compact_message(message) for message in messages]
+
+    seq_at = timezone.now()
+    get_messages_collection().insert_many(
+        [dict(message, session_id=session_id, seq_at=seq_at) for message in messages], ordered=True
+    )
+    for message in messages:
+        _record_message_images(session_id, message)
+    bump_version(SESSION_SCOPE, session_id)
+    for message in messages:
+        publish_message_event(session_id, "message.created", expand_message(message))
+    return messages
+
+
+def add_message(session_id, message):
+    return add_messages(session_id, [message])[0]
+
+
+def update_message_by_message_id(session_id, message_id, fields: dict, where=None):
+    """Update a message; with `where`, only if it also matches that filter.
+
+    Returns the updated (v2) document, or None when nothing matched.
+    """
+    messages = get_messages_collection()
+    fields = compact_message(fields)
+    superseded = {legacy for key in fields for legacy in SHORT_TO_LEGACY.get(key, ())}
+    update = {"$set": dict(fields, seq=_next_seq(session_id), seq_at=timezone.now())}
+    if superseded:
+        update["$unset"] = {legacy: "" for legacy in superseded}
+    doc = messages.find_one_and_update(
         {
-            "$set": {f"messages.$.{k}": v for k, v in fields.items()}
+            "session_id": session_id,
+            "message_id": message_id,
+            **(where or {}),
         },
+        update,
+        projection=MESSAGE_PROJECTION,
         return_document=ReturnDocument.AFTER,
     )
+    if not doc:
+        return None
+    _record_message_images(session_id, doc)
+    bump_version(SESSION_SCOPE, session_id)
+    publish_message_event(session_id, "message.updated", expand_message(doc))
+    return doc
+
+
+def delete_message(session_id, message_id):
+    """Replace a message with a tombstone so syncing clients learn of the delete."""
+    tombstone = {
+        "session_id": session_id,
+        "message_id": message_id,
+        "deleted": True,
+        "deleted_at": timezone.now(),
+        "seq": _next_seq(session_id),
+        "v": SCHEMA_VERSION,
+    }
+    tombstone["seq_at"] = timezone.now()
+    res = get_messages_collection().replace_one(
+        {"session_id": session_id, "message_id": message_id, **LIVE_MESSAGES},
+        tombstone,
+    )
+    if not res.matched_count:
+        return False
+
+    _forget_message_images(session_id, message_id)
+    bump_version(SESSION_SCOPE, session_id)
+    tombstone.pop("session_id")
+    tombstone.pop("seq_at")
+    publish_message_event(session_id, "message.deleted", tombstone)
+    return True
+
+
+def _settled(seq_at, cutoff):
+    # Messages written before seq_at existed are long settled
+    return seq_at is None or seq_at < cutoff
+
+
+def sync_messages(session_id, since=0, limit=SYNC_PAGE_SIZE):
+    """Messages created, changed or deleted after the `since` cursor.
 
+    since=0 returns a full snapshot. Otherwise changes come in seq order,
+    at most `limit` per page; pass the returned cursor back as `since`.
+
+    A write can land after a write with a higher seq (see _next_seq), so the
+    cursor only covers changes written more than SYNC_SETTLE_SECONDS ago:
+    every lower seq has landed by then. Newer changes are returned anyway
+    and sent again by the next sync; clients apply them by message_id.
+
+    Returns:
+        None if the session does not exist, else
+        {"messages": [...], "deleted": ["<message_id>", ...], "cursor": 42, "has_more": False}
+    """
+    session = get_session(session_id, fields=["seq"])
+    if not session:
+        return None
+    messages = get_messages_collection()
+    cutoff = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+    if since <= 0:
+        # Cursor is read before the snapshot, so concurrent writes are re-sent next sync
+        settled = messages.find_one(
+            {"session_id": session_id, "seq_at": {"$not": {"$gte": cutoff}}},
+            {"_id": 0, "seq": 1},
+            sort=[("seq", -1)],
+        )
+        snapshot = messages.find({"session_id": session_id, **LIVE_MESSAGES}, MESSAGE_PROJECTION)
+        return {
+            "messages": _upgrade_on_read(session_id, snapshot.sort([("created_at", 1), ("_id", 1)])),
+            "deleted": [],
+            "cursor": settled.get("seq", 0) if settled else 0,
+            "has_more": False,
+        }
+
+    changes = list(
+        messages.find({"session_id": session_id, "seq": {"$gt": since}}, SYNC_PROJECTION)
+        .sort("seq", 1)
+        .limit(limit + 1)
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    cursor = max([since] + [m["seq"] for m in changes if _settled(m.pop("seq_at", None), cutoff)])
+    changes = _upgrade_on_read(session_id, changes)
+    return {
+        "messages": [m for m in changes if not m.get("deleted")],
+        "deleted": [m["message_id"] for m in changes if m.get("deleted")],
+        "cursor": cursor,
+        # A page of unsettled changes does not move the cursor; stop instead of re-reading it
+        "has_more": has_more and cursor > since,
+    }
 
-def process_message(session_id, message):
+
+def process_message(session_id, message, tier=DEFAULT_TIER, degraded=False):
     """Process a user message by dispatching Celery tasks for prompt refine and AI feature execution.
     
     Supports all AI features with context awareness:
@@ -69,11 +444,22 @@ def process_message(session_id, message):
     - image_expand: Extend image boundaries
     - style_transfer: Apply artistic style from reference
     
+    The chain is queued in the fair-share scheduler (core/scheduler.py) under the
+    session owner; `tier` (from the caller's JWT roles) sets its weight and priority.
+    `degraded` (admission control under load) lowers the generation resolution.
+    
     Returns minimal status and request IDs, while storing messages with status updates.
+    
+    Raises:
+        InsufficientTokensError: The session owner has fewer than MIN_TOKENS_REQUIRED tokens
+        JobLimitExceeded: The session owner already has USER_JOB_LIMITS jobs in flight
     """
-    # Extract user_id for token check
-    convo = get_conversation(session_id)
-    user_id = convo.get('user_id') if convo else None
+    selected_message_ids = message.get('selected_messages', [])
+    direct_image_url = message.get('image_url')
+    additional_images = message.get('additional_images', [])
+
+    # Owner for the token check (cached, no Mongo read on the hot path)
+    user_id = get_session_owner(session_id)
     
     if not user_id:
         logger.error(f"No user_id found for session {session_id}")
@@ -82,24 +468,17 @@ def process_message(session_id, message):
     # Check token balance (minimum 10 tokens required)
     MIN_TOKENS_REQUIRED = 10
     try:
-        balance = token_client.get_user_tokens(user_id)
+        balance = token_client.get_cached_user_tokens(user_id)
         if balance < MIN_TOKENS_REQUIRED:
             logger.warning(f"User {user_id} has insufficient tokens: {balance} < {MIN_TOKENS_REQUIRED}")
-            return ResponseFormatter.error(
-                message=f"Insufficient tokens. You have {balance} tokens, but need at least {MIN_TOKENS_REQUIRED} to process this request.",
-                status_code=402  # Payment Required
+            raise InsufficientTokensError(
+                f"Insufficient tokens. You have {balance} tokens, but need at least {MIN_TOKENS_REQUIRED} to process this request."
             )
         logger.info(f"User {user_id} has sufficient tokens: {balance} >= {MIN_TOKENS_REQUIRED}")
     except TokenServiceError as e:
         logger.error(f"Token service error: {str(e)}")
         # Allow processing to continue if token service is down (graceful degradation)
         logger.warning("Token service unavailable, allowing request to proceed")
-    
-    # Store user message
-    user_msg = dict(message)
-    user_msg["created_at"] = timezone.now()
-    user_msg["role"] = "user"
-    add_message(session_id, user_msg)
 
     sys_message_id = str(uuid.uuid4())
 
@@ -107,44 +486,43 @@ def process_message(session_id, message):
     context_images = []
     
     # Priority 1: Direct image_url from request (for quick testing with existing images)
-    direct_image_url = message.get('image_url')
     if direct_image_url:
         context_images.append(direct_image_url)
+
+    # Context pointers are only read when selected messages or the fallback need them
+    session = {}
+    if selected_message_ids or not (direct_image_url or additional_images):
+        session = get_session(
+            session_id,
+            fields=["last_image_url", "last_uploaded_urls"]
+            + [f"message_images.{msg_id}" for msg_id in selected_message_ids],
+        ) or {}
     
+    # Sessions created before the context pointers existed fall back to message queries
+    has_pointers = "last_image_url" in session
+
     # Priority 2: Get images from selected_messages (user reply to specific messages)
-    selected_message_ids = message.get('selected_messages', [])
-    if selected_message_ids and convo and convo.get('messages'):
-        for msg_id in selected_message_ids:
-            # Find the selected message
-            selected_msg = next((m for m in convo['messages'] if m.get('message_id') == msg_id), None)
-            if selected_msg:
-                # Check image_url field
-                if selected_msg.get('image_url'):
-                    context_images.append(selected_msg.get('image_url'))
-                # Check uploaded_urls array
-                elif selected_msg.get('uploaded_urls'):
-                    urls = selected_msg.get('uploaded_urls', [])
-                    context_images.extend(urls)
+    if selected_message_ids:
+        if has_pointers:
+            message_images = session.get('message_images', {})
+            for msg_id in selected_message_ids:
+                context_images.extend(message_images.get(msg_id, []))
+        else:
+            for selected_msg in get_messages_by_ids(session_id, selected_message_ids):
+                context_images.extend(message_image_urls(selected_msg))
     
     # Priority 3: Add additional_images from request (for reference images)
-    additional_images = message.get('additional_images', [])
     if additional_images:
         context_images.extend(additional_images)
     
     # Priority 4: Get from last message if no context images yet (fallback)
-    if not context_images and convo and convo.get('messages'):
-        # Find the last system message with images
-        for msg in reversed(convo['messages']):
-            if msg.get('role') == 'system':
-                if msg.get('image_url'):
-                    context_images.append(msg.get('image_url'))
-                    break
-                # Check uploaded_urls array
-                elif msg.get('uploaded_urls'):
-                    urls = msg.get('uploaded_urls', [])
-                    if urls:
-                        context_images.extend(urls)
-                        break
+    if not context_images:
+        # Last system message with images
+        if has_pointers:
+            last = {"image_url": session.get('last_image_url'), "uploaded_urls": session.get('last_uploaded_urls')}
+        else:
+            last = get_last_system_image_message(session_id) or {}
+        context_images.extend(message_image_urls(last))
 
     # Build context with all available information
     context = {
@@ -153,7 +531,9 @@ def process_message(session_id, message):
         "image_url": context_images[0] if context_images else None,  # Primary image (backward compatible)
         "reference_image": context_images[1] if len(context_images) > 1 else None,  # Secondary image for features like style_transfer
         "selected_messages": selected_message_ids,
-        "feature_params": message.get('feature_params', {})  # User-provided parameters
+        "feature_params": message.get('feature_params', {}),  # User-provided parameters
+        "degraded": degraded,
+        "job_id": sys_message_id,  # Cancel flag checked while the feature runs
     }
     
     # Dispatch prompt refine task with enriched context
@@ -175,35 +555,106 @@ def process_message(session_id, message):
     logger.warning(f"[ConversationService] Feature params: {context.get('feature_params')}")
     logger.warning("="*80)
     
-    # Create the chain and execute it
-    workflow = (
-        process_prompt_task.s(prompt_payload) |
-        route_to_ai_feature_task.s() |
-        finalize_conversation_task.s(session_id=session_id, message_id=sys_message_id)
-    )
-    
-    logger.warning(f"[ConversationService] Chain created with | operator")
-    async_result = workflow.apply_async()
-    logger.warning(f"[ConversationService] Chain dispatched! Task ID: {async_result.id}")
-
-    # Store processing status with the pipeline id
-    add_message(session_id, {
-        "message_id": sys_message_id,
-        "role": "system",
-        "status": "PROCESSING",
-        "created_at": timezone.now(),
-    })
+    # One of the user's job permits until finalize (raises JobLimitExceeded);
+    # everything after it releases the permit when it fails
+    acquire_job(user_id, sys_message_id, tier)
+    stored = False
+    try:
+        # Store the user message and the PROCESSING placeholder in one bulk write,
+        # before dispatch so finalize always finds the placeholder
+        user_msg = dict(message)
+        user_msg["created_at"] = timezone.now()
+        user_msg["role"] = "user"
+        add_messages(session_id, [
+            user_msg,
+            {
+                "message_id": sys_message_id,
+                "role": "system",
+                "status": "PROCESSING",
+                "created_at": timezone.now(),
+            },
+        ])
+        stored = True
+
+        # Create the chain and execute it
+        workflow = (
+            process_prompt_task.s(check_in(prompt_payload)) |
+            route_to_ai_feature_task.s() |
+            finalize_conversation_task.s(session_id=session_id, message_id=sys_message_id)
+        )
+
+        logger.warning(f"[ConversationService] Chain created with | operator")
+        waiting = submit(user_id, tier, workflow, job_id=sys_message_id)
+    except Exception:
+        release_job(sys_message_id)
+        if stored:
+            update_message_by_message_id(session_id, sys_message_id, {
+                "status": "FAILED",
+                "content": "Failed to start processing.",
+            })
+        raise
+    logger.warning(f"[ConversationService] Chain submitted for {user_id} ({tier}), {waiting} job(s) ahead")
 
     # Return processing info to client
     result = {"status": "PROCESSING", "message_id": sys_message_id}
     return ResponseFormatter.success(result=result)
 
 
+def cancel_message(session_id, message_id):
+    """Cancel a chat request that is still processing (see core/cancellation.py).
+
+    Marks the message CANCELED (only while it is still PROCESSING), flags the
+    job and drops it from the scheduler queue if it has not been dispatched.
+    A dispatched chain keeps running up to its next flag check (before the
+    feature call, before each poll) and finalize, which stores nothing,
+    leaves the message CANCELED and frees the job's slot and permit.
+
+    Returns:
+        ResponseFormatter dict; result is {"message_id", "status"}. Errors:
+        not_found, or an error when the message is not a processing request.
+    """
+    doc = get_message(session_id, message_id)
+    if not doc:
+        return ResponseFormatter.not_found(message="Message not found")
+    if doc.get("pipeline_id"):
+        return ResponseFormatter.error(message="Cancel the request message, not one of its steps", status_code=409)
+    status = expand_message(doc).get("status")
+    if doc.get("role") != "system" or status != "PROCESSING":
+        return ResponseFormatter.error(message=f"Message is not processing (status: {status})", status_code=409)
+
+    # Conditional: a finalize that completed the message since the read above wins
+    canceled = update_message_by_message_id(
+        session_id, message_id, {"status": CANCELED, "content": "Canceled."}, where=STILL_PROCESSING
+    )
+    if not canceled:
+        return ResponseFormatter.error(message="Message is not processing", status_code=409)
+
+    request_cancel(message_id)
+    user_id = get_session_owner(session_id)
+    if user_id and cancel_scheduled(user_id, message_id):
+        # Never dispatched: no finalize will run to free the permit
+        release_job(message_id)
+        logger.info(f"[ConversationService] {message_id} canceled before dispatch")
+    logger.info(f"[ConversationService] Message {message_id} canceled in session {session_id}")
+    return ResponseFormatter.success(result={"message_id": message_id, "status": CANCELED})
+
+
 def get_conversation(session_id):
-    conversations = get_conversations_collection()
-    return conversations.find_one({"session_id": session_id})
+    """Full session with its messages (for the history endpoint only)."""
+    convo = get_session(session_id)
+    if not convo:
+        return None
+    convo["messages"] = get_messages(session_id)
+    return convo
 
 
 def delete_session(session_id):
     conversations = get_conversations_collection()
-    return conversations.delete_one({"session_id": session_id})
+    res = conversations.delete_one({"session_id": session_id})
+    get_messages_collection().delete_many({"session_id": session_id})
+    archived = get_archives_collection().delete_one({"session_id": session_id})
+    if archived.deleted_count and not res.deleted_count:
+        res = archived
+    cache.delete(f"session_owner:{session_id}")
+    bump_version(SESSION_SCOPE, session_id)
+    return res
@@ -5,6 +5,9 @@ from .views import (
     ChatSessionDetailView,
     ChatMessageView,
     ChatMessageDetailView,
+    ChatMessageCancelView,
+    ChatSessionEventsView,
+    ChatSessionSyncView,
     chat_client,
 )
 
@@ -16,5 +19,8 @@ urlpatterns = [
     # Message operations
     path("sessions/<str:session_id>/messages", ChatMessageView.as_view(), name="chat-message"),
     path("sessions/<str:session_id>/messages/<str:message_id>", ChatMessageDetailView.as_view(), name="chat-message-detail"),
+    path("sessions/<str:session_id>/messages/<str:message_id>/cancel", ChatMessageCancelView.as_view(), name="chat-message-cancel"),
+    path("sessions/<str:session_id>/events", ChatSessionEventsView.as_view(), name="chat-session-events"),
+    path("sessions/<str:session_id>/sync", ChatSessionSyncView.as_view(), name="chat-session-sync"),
     path("chat-client/", chat_client, name="chat-client")
 ]
@@ -1,19 +1,33 @@
 # conversation/views.py
 from rest_framework.views import APIView
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from core import ResponseFormatter, APIResponse
+from core import ResponseFormatter, APIResponse, ResponseCode
+from core.etag import condition_on_version, SESSION_SCOPE
+from core.scheduler import request_tier
+from core.job_limiter import JobLimitExceeded, job_limit_response
+from core.exceptions import InsufficientTokensError
+from core.admission import is_degraded
 import json
 import asyncio
 
 from .service import (
     create_or_get_session,
     get_conversation,
+    get_message,
+    get_session_owner,
+    delete_message,
     delete_session,
+    sync_messages,
+    SYNC_PAGE_SIZE,
     process_message,
+    cancel_message,
 )
 from .serializers import MessageInputSerializer
+from .events import stream_session_events
+from .message_schema import expand_message
 
 
 def clean_doc(doc: dict) -> dict:
@@ -26,6 +40,13 @@ def clean_doc(doc: dict) -> dict:
     return doc
 
 
+def render_messages(request, messages, user_id=None):
+    """Messages in the legacy shape, or as stored with ?compact=1."""
+    if request.GET.get('compact') in ('1', 'true'):
+        return messages
+    return [expand_message(m, user_id=user_id) for m in messages]
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class ChatSessionListView(APIView):
     """POST /v1/chat/sessions {userId}"""
@@ -61,9 +82,20 @@ class ChatMessageView(APIView):
         if not serializer.is_valid():
             return APIResponse.error(message=serializer.errors)
 
-        result = process_message(session_id, serializer.validated_data)
-        # If service returned a formatter dict, wrap into APIResponse
+        try:
+            result = process_message(
+                session_id, serializer.validated_data,
+                tier=request_tier(request), degraded=is_degraded(request),
+            )
+        except JobLimitExceeded as e:
+            return job_limit_response(e)
+        except InsufficientTokensError as e:
+            return APIResponse.error(message=str(e), status_code=402)
+        # If service returned a formatter dict, wrap into APIResponse.
+        # Errors keep a 4xx status so IdempotencyMiddleware releases the key for a retry.
         if isinstance(result, dict) and 'code' in result and 'message' in result:
+            if result['code'] != ResponseCode.SUCCESS:
+                return APIResponse.error(message=result['message'], code=result['code'], result=result.get('result'))
             return APIResponse.success(result=result.get('result'))
         return APIResponse.success(result=result)
 
@@ -72,12 +104,14 @@ class ChatMessageView(APIView):
 class ChatSessionDetailView(APIView):
     """GET /v1/chat/sessions/{session_id} and DELETE"""
 
+    @condition_on_version(SESSION_SCOPE, lambda request, session_id, **kwargs: session_id)
     def get(self, request, session_id):
         convo = get_conversation(session_id)
         if not convo:
             return APIResponse.error()
 
         result = clean_doc(convo)
+        result['messages'] = render_messages(request, result.get('messages', []), convo.get('user_id'))
         return APIResponse.success(result=result)
 
     def delete(self, request, session_id):
@@ -91,24 +125,79 @@ class ChatSessionDetailView(APIView):
 class ChatMessageDetailView(APIView):
     """GET /v1/chat/sessions/{session_id}/{message_id}"""
 
+    @condition_on_version(SESSION_SCOPE, lambda request, session_id, **kwargs: session_id)
     def get(self, request, session_id, message_id):
-        print("ChatMessageDetailView - GET request:", request)
-        convo = get_conversation(session_id)
-        if not convo:
-            return APIResponse.error(message='Conversation not found')
+        target = get_message(session_id, message_id)
+        if not target:
+            return APIResponse.error(message='Message not found')
 
-        messages = convo.get("messages", [])
-        target = next(
-            (m for m in reversed(messages) if m.get("message_id") == message_id),
-            None
-        )
+        [target] = render_messages(request, [target], get_session_owner(session_id))
+        return APIResponse.success(result=target)
 
-        if not target:
+    def delete(self, request, session_id, message_id):
+        if not delete_message(session_id, message_id):
             return APIResponse.error(message='Message not found')
 
-        target.pop("_id", None)
+        return APIResponse.success()
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatMessageCancelView(APIView):
+    """POST /v1/chat/sessions/{session_id}/messages/{message_id}/cancel"""
+
+    def post(self, request, session_id, message_id):
+        result = cancel_message(session_id, message_id)
+        if result['code'] == ResponseCode.NOT_FOUND:
+            return APIResponse.not_found(message=result['message'])
+        if result['code'] != ResponseCode.SUCCESS:
+            return APIResponse.error(message=result['message'], status_code=409)
+        return APIResponse.success(result=result['result'])
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatSessionSyncView(APIView):
+    """GET /v1/chat/sessions/{session_id}/sync?since=<cursor>&limit=<n>
+
+    Messages created or changed after `since` plus ids of deleted messages.
+    since=0 (default) returns the full history and the starting cursor.
+    """
+
+    @condition_on_version(SESSION_SCOPE, lambda request, session_id, **kwargs: session_id)
+    def get(self, request, session_id):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', SYNC_PAGE_SIZE))
+        except ValueError:
+            return APIResponse.error(message='since and limit must be integers')
+        if since < 0 or not 1 <= limit <= SYNC_PAGE_SIZE:
+            return APIResponse.error(message=f'since must be >= 0 and limit between 1 and {SYNC_PAGE_SIZE}')
+
+        result = sync_messages(session_id, since=since, limit=limit)
+        if result is None:
+            return APIResponse.error(message='Conversation not found')
+
+        result['messages'] = render_messages(request, result['messages'], get_session_owner(session_id))
+        return APIResponse.success(result=result)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ChatSessionEventsView(View):
+    """GET /v1/chat/sessions/{session_id}/events[?message_id=...]
+
+    Server-Sent Events stream of message.created / message.updated for the
+    session. With message_id, the current state of that message is sent
+    first. The stream ends after SSE_MAX_STREAM_SECONDS; EventSource
+    reconnects automatically.
+    """
+
+    def get(self, request, session_id):
+        response = StreamingHttpResponse(
+            stream_session_events(session_id, message_id=request.GET.get('message_id')),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx)
+        return response
 
-        return APIResponse.success(result=target)
 
 from django.shortcuts import render
 
@@ -4,6 +4,7 @@ Celery Tasks for Image Expansion
 
 import logging
 from celery import shared_task
+from core.cancellation import is_cancelled, CANCELED
 from .services import ImageExpandService, ImageExpandError
 
 logger = logging.getLogger(__name__)
@@ -33,6 +34,10 @@ def expand_image_task(self, image_url: str, user_id: str, **kwargs):
 @shared_task(bind=True, max_retries=10)
 def poll_expand_status_task(self, task_id: str):
     """Poll expand task status"""
+    if is_cancelled(task_id):
+        logger.info(f"Task {task_id} canceled, polling stopped")
+        return {"task_id": task_id, "status": CANCELED}
+
     try:
         service = ImageExpandService()
         result = service.poll_task_status(task_id)
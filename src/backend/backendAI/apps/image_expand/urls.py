@@ -3,8 +3,10 @@ URL routing for Image Expand feature
 """
 from django.urls import path
 from .views import ImageExpandView, ImageExpandStatusView
+from core.cancellation import FeatureCancelView
 
 urlpatterns = [
     path('', ImageExpandView.as_view(), name='image-expand'),
     path('status/<str:task_id>/', ImageExpandStatusView.as_view(), name='image-expand-status'),
+    path('cancel/<str:task_id>/', FeatureCancelView.as_view(), name='image-expand-cancel'),
 ]
@@ -7,6 +7,8 @@ from core import APIResponse
 from .serializers import ImageExpandInputSerializer
 from .services import ImageExpandService, ImageExpandError
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs, release_job_when_done
+from core.cancellation import cancellable_status
 from core.image_input_handler import ImageInputHandler
 import logging
 
@@ -16,6 +18,7 @@ logger = logging.getLogger(__name__)
 class ImageExpandView(APIView):
     """Expand image - POST /v1/features/image-expand/"""
     
+    @limit_concurrent_jobs(probe='apps.image_expand.services.provider_status')
     @track_processing_time(feature='image_expand', min_required_tokens=10)
     def post(self, request):
         serializer = ImageExpandInputSerializer(data=request.data)
@@ -69,6 +72,8 @@ class ImageExpandView(APIView):
 class ImageExpandStatusView(APIView):
     """Poll expand status - GET /v1/features/image-expand/status/<task_id>/"""
     
+    @release_job_when_done
+    @cancellable_status
     def get(self, request, task_id):
         try:
             # Get user_id from query params for gallery save
@@ -1 +1,2 @@
 """Image Gallery app package - manages user-generated images stored on Cloudinary."""
+from . import celery_tasks  # noqa
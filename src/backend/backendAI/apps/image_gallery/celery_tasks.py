@@ -0,0 +1,74 @@
+"""
+Celery Tasks for Image Gallery
+Background maintenance of the image_gallery table
+"""
+
+import logging
+from celery import shared_task
+from django.conf import settings
+from .services import image_gallery_service
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="image_gallery.purge_deleted_images_task", ignore_result=True)
+def purge_deleted_images_task(
+    retention_days: int = None,
+    batch_size: int = None,
+    sleep_seconds: float = None,
+    max_batches: int = None,
+    delete_files: bool = None
+):
+    """
+    Hard delete soft-deleted gallery rows past the retention window
+    
+    Scheduled by Celery beat (see backendAI/celery.py). Arguments default to
+    the GALLERY_PURGE_* settings.
+    
+    Returns:
+        Purge stats dict (purged, batches, files_deleted, files_failed, rows_per_second)
+    """
+    stats = image_gallery_service.purge_deleted_images(
+        retention_days=retention_days if retention_days is not None else settings.GALLERY_PURGE_RETENTION_DAYS,
+        batch_size=batch_size or settings.GALLERY_PURGE_BATCH_SIZE,
+        sleep_seconds=sleep_seconds if sleep_seconds is not None else settings.GALLERY_PURGE_SLEEP_SECONDS,
+        max_batches=max_batches or settings.GALLERY_PURGE_MAX_BATCHES or None,
+        delete_files=delete_files if delete_files is not None else settings.GALLERY_PURGE_DELETE_FILES,
+    )
+    logger.info(f"[GalleryPurge] {stats}")
+    return stats
+
+
+@shared_task(name="image_gallery.ensure_gallery_partitions_task", ignore_result=True)
+def ensure_gallery_partitions_task(months_ahead: int = None):
+    """
+    Pre-create monthly partitions of image_gallery and video_gallery
+    
+    Runs daily from Celery beat so inserts never fall into the DEFAULT
+    partition. Idempotent.
+    """
+    from apps.video_gallery.services import video_gallery_service
+
+    months_ahead = months_ahead or settings.GALLERY_PARTITION_MONTHS_AHEAD
+    image_gallery_service.ensure_partitions(months_ahead=months_ahead)
+    video_gallery_service.ensure_partitions(months_ahead=months_ahead)
+    logger.info(f"[GalleryPartitions] Partitions ensured {months_ahead} months ahead")
+
+
+@shared_task(name="image_gallery.save_images_task", ignore_result=True)
+def save_images_task(user_id: str, image_urls: list, refined_prompt: str = None,
+                     intent: str = None, metadata: dict = None):
+    """
+    Save generated images to the gallery off the generation worker
+
+    Routed to the persistence queue, so a slow gallery insert never holds a
+    submit/polling slot.
+    """
+    saved = image_gallery_service.save_multiple_images(
+        user_id=user_id,
+        image_urls=image_urls,
+        refined_prompt=refined_prompt,
+        intent=intent,
+        metadata=metadata,
+    )
+    logger.info(f"[Gallery] Saved {len(saved)}/{len(image_urls)} images for user {user_id}")
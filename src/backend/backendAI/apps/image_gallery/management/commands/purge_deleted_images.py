@@ -0,0 +1,42 @@
+"""
+Hard delete soft-deleted gallery images past the retention window.
+
+Usage:
+    python manage.py purge_deleted_images --retention-days 30 --batch-size 200 --sleep 0.5
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.image_gallery.services import image_gallery_service, ImageGalleryError
+
+
+class Command(BaseCommand):
+    help = "Purge soft-deleted image_gallery rows in small keyset-ordered batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.GALLERY_PURGE_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.GALLERY_PURGE_BATCH_SIZE)
+        parser.add_argument('--sleep', type=float, default=settings.GALLERY_PURGE_SLEEP_SECONDS,
+                            help="Seconds to pause between batches")
+        parser.add_argument('--max-batches', type=int, default=settings.GALLERY_PURGE_MAX_BATCHES or None)
+        parser.add_argument('--delete-files', action='store_true', default=settings.GALLERY_PURGE_DELETE_FILES,
+                            help="Also delete stored files from the file service")
+
+    def handle(self, *args, **options):
+        try:
+            stats = image_gallery_service.purge_deleted_images(
+                retention_days=options['retention_days'],
+                batch_size=options['batch_size'],
+                sleep_seconds=options['sleep'],
+                max_batches=options['max_batches'],
+                delete_files=options['delete_files'],
+            )
+        except ImageGalleryError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {stats['purged']} images in {stats['batches']} batches "
+            f"({stats['rows_per_second']} rows/s, {stats['elapsed_seconds']}s). "
+            f"Files deleted: {stats['files_deleted']}, failed: {stats['files_failed']}"
+        ))
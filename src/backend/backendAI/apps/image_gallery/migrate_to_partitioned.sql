@@ -0,0 +1,111 @@
+-- ============================================================================
+-- Migrate image_gallery to a partitioned table (one-off, existing deployments)
+-- PostgreSQL 13+ / Supabase
+-- ============================================================================
+--
+-- Fresh installs should just run schema.sql. For a database created from the
+-- old schema.sql (or by `manage.py migrate`), this script:
+--   1. renames the current heap to image_gallery_legacy
+--   2. creates the partitioned image_gallery with one partition per month
+--      that has data, plus the next 3 months and a DEFAULT partition
+--   3. copies all rows across
+-- Run it in a maintenance window: writes to image_gallery block until COMMIT.
+-- Drop image_gallery_legacy once the row counts have been checked.
+
+BEGIN;
+
+-- Partition helpers (same definitions as schema.sql)
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    from_date DATE := date_trunc('month', month_start)::date;
+    to_date DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    partition_name TEXT := format('%s_y%sm%s', parent, to_char(from_date, 'YYYY'), to_char(from_date, 'MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent, from_date, to_date
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent TEXT, months_back INT DEFAULT 0, months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    offset_months INT;
+BEGIN
+    FOR offset_months IN -months_back..months_ahead LOOP
+        PERFORM create_monthly_partition(
+            parent,
+            (date_trunc('month', CURRENT_DATE) + make_interval(months => offset_months))::date
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 1. Move the old table (and the names of its constraint/indexes) out of the way
+LOCK TABLE image_gallery IN ACCESS EXCLUSIVE MODE;
+ALTER TABLE image_gallery RENAME TO image_gallery_legacy;
+ALTER TABLE image_gallery_legacy RENAME CONSTRAINT image_gallery_pkey TO image_gallery_legacy_pkey;
+ALTER INDEX IF EXISTS idx_image_gallery_user_created RENAME TO idx_image_gallery_legacy_user_created;
+ALTER INDEX IF EXISTS idx_image_gallery_user_deleted RENAME TO idx_image_gallery_legacy_user_deleted;
+ALTER INDEX IF EXISTS idx_image_gallery_deleted_at RENAME TO idx_image_gallery_legacy_deleted_at;
+ALTER INDEX IF EXISTS idx_image_gallery_created_at RENAME TO idx_image_gallery_legacy_created_at;
+DROP TRIGGER IF EXISTS trigger_update_image_gallery_updated_at ON image_gallery_legacy;
+
+-- 2. Partitioned table
+CREATE TABLE image_gallery (
+    image_id UUID NOT NULL,
+    user_id VARCHAR(255) NOT NULL,
+    image_url VARCHAR(1024) NOT NULL,
+    refined_prompt TEXT,
+    intent VARCHAR(100),
+    metadata JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (image_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+SELECT create_monthly_partition('image_gallery', month_start::date)
+FROM generate_series(
+    date_trunc('month', (SELECT min(created_at) FROM image_gallery_legacy)),
+    date_trunc('month', CURRENT_DATE),
+    INTERVAL '1 month'
+) AS month_start;
+
+SELECT ensure_monthly_partitions('image_gallery', 0, 3);
+
+CREATE TABLE image_gallery_default PARTITION OF image_gallery DEFAULT;
+
+CREATE INDEX idx_image_gallery_user_created ON image_gallery (user_id, created_at DESC);
+CREATE INDEX idx_image_gallery_user_deleted ON image_gallery (user_id, deleted_at);
+CREATE INDEX idx_image_gallery_deleted_at ON image_gallery (deleted_at);
+CREATE INDEX idx_image_gallery_created_at ON image_gallery (created_at DESC);
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_update_image_gallery_updated_at
+    BEFORE UPDATE ON image_gallery
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- 3. Copy rows
+INSERT INTO image_gallery (
+    image_id, user_id, image_url, refined_prompt, intent, metadata, created_at, updated_at, deleted_at
+)
+SELECT image_id, user_id, image_url, refined_prompt, intent, COALESCE(metadata, '{}'::jsonb),
+       created_at, updated_at, deleted_at
+FROM image_gallery_legacy;
+
+COMMIT;
+
+-- Verify, then drop the old heap:
+-- SELECT (SELECT count(*) FROM image_gallery) AS new_rows, (SELECT count(*) FROM image_gallery_legacy) AS old_rows;
+-- DROP TABLE image_gallery_legacy;
@@ -2,6 +2,7 @@ import re
 import uuid
 from django.db import models
 from django.utils import timezone
+from core.etag import bump_version, GALLERY_SCOPE
 
 
 def extract_uuid_from_cloudinary_url(url):
@@ -20,6 +21,11 @@ class ImageGallery(models.Model):
     """
     Stores user-generated images with metadata.
     Uses UUID extracted from Cloudinary URL as primary key.
+
+    The table itself is owned by schema.sql: it is range-partitioned by
+    created_at month with PRIMARY KEY (image_id, created_at). Django still
+    treats image_id as the primary key, which holds because image ids are
+    unique UUIDs.
     """
     image_id = models.UUIDField(
         primary_key=True,
@@ -69,6 +75,7 @@ class ImageGallery(models.Model):
 
     class Meta:
         db_table = 'image_gallery'
+        managed = False  # partitioned table, created by schema.sql / migrate_to_partitioned.sql
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user_id', '-created_at']),
@@ -78,6 +85,15 @@ class ImageGallery(models.Model):
     def __str__(self):
         return f"{self.user_id} - {self.image_id}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_version(GALLERY_SCOPE, self.user_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_version(GALLERY_SCOPE, self.user_id)
+        return result
+
     def soft_delete(self):
         """Mark image as deleted without removing from database."""
         self.deleted_at = timezone.now()
@@ -7,9 +7,12 @@
 DROP TABLE IF EXISTS image_gallery CASCADE;
 
 -- Create image_gallery table
+-- Range-partitioned by created_at month so recent-gallery queries and index
+-- maintenance only touch a few small partitions, and old months can be
+-- detached/archived cheaply. Existing deployments: see migrate_to_partitioned.sql
 CREATE TABLE image_gallery (
-    -- Primary Key: UUID extracted from Cloudinary URL
-    image_id UUID PRIMARY KEY,
+    -- UUID extracted from Cloudinary URL
+    image_id UUID NOT NULL,
     
     -- User Information
     user_id VARCHAR(255) NOT NULL,
@@ -27,13 +30,59 @@ CREATE TABLE image_gallery (
     updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     
     -- Soft Delete
-    deleted_at TIMESTAMP WITH TIME ZONE
-);
+    deleted_at TIMESTAMP WITH TIME ZONE,
+    
+    -- Primary key must include the partition key
+    PRIMARY KEY (image_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- ============================================================================
+-- Monthly Partitions
+-- ============================================================================
+
+-- Create the partition of `parent` holding the month that contains `month_start`
+-- (e.g. image_gallery_y2026m01). Idempotent.
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    from_date DATE := date_trunc('month', month_start)::date;
+    to_date DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    partition_name TEXT := format('%s_y%sm%s', parent, to_char(from_date, 'YYYY'), to_char(from_date, 'MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent, from_date, to_date
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Make sure partitions exist from `months_back` months ago to `months_ahead`
+-- months from now. Called daily by image_gallery.ensure_gallery_partitions_task.
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent TEXT, months_back INT DEFAULT 0, months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    offset_months INT;
+BEGIN
+    FOR offset_months IN -months_back..months_ahead LOOP
+        PERFORM create_monthly_partition(
+            parent,
+            (date_trunc('month', CURRENT_DATE) + make_interval(months => offset_months))::date
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_monthly_partitions('image_gallery', 0, 3);
+
+-- Safety net for rows outside every monthly partition (should stay empty)
+CREATE TABLE image_gallery_default PARTITION OF image_gallery DEFAULT;
 
 -- ============================================================================
 -- Indexes for Performance
 -- ============================================================================
 
+-- Indexes are declared on the parent and created on every partition
+
 -- Index for user queries (list user images sorted by creation date)
 CREATE INDEX idx_image_gallery_user_created 
 ON image_gallery (user_id, created_at DESC);
@@ -75,7 +124,7 @@ CREATE TRIGGER trigger_update_image_gallery_updated_at
 
 COMMENT ON TABLE image_gallery IS 'Stores user-generated images with metadata from AI PhotoFun Studio';
 
-COMMENT ON COLUMN image_gallery.image_id IS 'UUID extracted from Cloudinary image URL (primary key)';
+COMMENT ON COLUMN image_gallery.image_id IS 'UUID extracted from Cloudinary image URL (primary key with created_at)';
 COMMENT ON COLUMN image_gallery.user_id IS 'User identifier (references user system)';
 COMMENT ON COLUMN image_gallery.image_url IS 'Full Cloudinary URL of the generated image';
 COMMENT ON COLUMN image_gallery.refined_prompt IS 'AI-refined prompt used for image generation';
@@ -231,6 +280,20 @@ WHERE deleted_at IS NOT NULL
   AND deleted_at < CURRENT_TIMESTAMP - INTERVAL '30 days';
 */
 
+-- Query: Archive an old month (detach, then dump/drop the standalone table)
+/*
+ALTER TABLE image_gallery DETACH PARTITION image_gallery_y2025m01 CONCURRENTLY;
+-- pg_dump -t image_gallery_y2025m01 ... && DROP TABLE image_gallery_y2025m01;
+*/
+
+-- Query: List partitions and their sizes
+/*
+SELECT c.relname, pg_size_pretty(pg_total_relation_size(c.oid))
+FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'image_gallery'::regclass
+ORDER BY c.relname;
+*/
+
 -- Query: Get table statistics
 /*
 SELECT 
@@ -48,3 +48,27 @@ class ImageGalleryListSerializer(serializers.ModelSerializer):
             'created_at',
             'is_deleted',
         ]
+
+
+class ImageGalleryBulkActionSerializer(serializers.Serializer):
+    """Serializer for bulk delete/restore/purge requests."""
+    user_id = serializers.CharField(required=True)
+    image_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=1000,
+        help_text="Image UUIDs owned by user_id"
+    )
+
+
+class ImageGalleryStatsQuerySerializer(serializers.Serializer):
+    """Query parameters for usage stats (dates are UTC days, inclusive)."""
+    user_id = serializers.CharField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    media_type = serializers.ChoiceField(choices=['image', 'video'], required=False)
+
+    def validate(self, attrs):
+        if attrs.get('start_date') and attrs.get('end_date') and attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError("start_date must be before end_date.")
+        return attrs
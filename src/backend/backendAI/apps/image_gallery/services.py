@@ -6,12 +6,15 @@ Handles saving generated images to Supabase PostgreSQL database
 import logging
 import os
 import re
+import time
 import uuid
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Dict, List, Optional, Any
-from datetime import datetime
+from datetime import datetime, timezone
 from django.conf import settings
+from core.etag import bump_version, GALLERY_SCOPE
+from core.postgres import get_connection, get_pool
 
 
 def _load_db_config() -> Dict[str, Any]:
@@ -41,19 +44,9 @@ class ImageGalleryService:
     """Service for managing image gallery in Supabase PostgreSQL"""
     DB_CONFIG = _load_db_config()
     
-    def __init__(self):
-        """Initialize connection pool"""
-        self.connection = None
-    
-    def _get_connection(self):
-        """Get database connection"""
-        try:
-            if not self.connection or self.connection.closed:
-                self.connection = psycopg2.connect(**self.DB_CONFIG)
-            return self.connection
-        except psycopg2.Error as e:
-            logger.error(f"Database connection failed: {str(e)}")
-            raise ImageGalleryError(f"Database connection failed: {str(e)}")
+    def _connection(self):
+        """Borrow a pooled connection: `with self._connection() as conn:`"""
+        return get_connection(self.DB_CONFIG)
     
     def _extract_uuid_from_url(self, url: str) -> str:
         """
@@ -109,45 +102,61 @@ class ImageGalleryService:
                 metadata = {}
             
             # Get connection
-            conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            with self._connection() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
             
-            # Insert into database
-            query = """
-                INSERT INTO image_gallery (
-                    image_id, user_id, image_url, refined_prompt, intent, metadata
+                # Upsert by image_id. image_gallery is partitioned by created_at, so
+                # image_id alone has no unique constraint for ON CONFLICT: update the
+                # existing row if there is one, otherwise insert. The transaction lock
+                # on the image_id serializes concurrent saves of the same image (task
+                # retries, duplicate chat saves) so both cannot see "no row" and insert.
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext('image_gallery'), hashtext(%s))",
+                    (image_id,),
                 )
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (image_id) DO UPDATE SET
-                    image_url = EXCLUDED.image_url,
-                    refined_prompt = EXCLUDED.refined_prompt,
-                    intent = EXCLUDED.intent,
-                    metadata = EXCLUDED.metadata,
-                    updated_at = CURRENT_TIMESTAMP
-                RETURNING image_id, user_id, image_url, refined_prompt, intent, metadata, created_at, updated_at
-            """
+                query = """
+                    WITH updated AS (
+                        UPDATE image_gallery SET
+                            image_url = %(image_url)s,
+                            refined_prompt = %(refined_prompt)s,
+                            intent = %(intent)s,
+                            metadata = %(metadata)s,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE image_id = %(image_id)s::uuid
+                        RETURNING image_id, user_id, image_url, refined_prompt, intent, metadata, created_at, updated_at
+                    ), inserted AS (
+                        INSERT INTO image_gallery (
+                            image_id, user_id, image_url, refined_prompt, intent, metadata
+                        )
+                        SELECT %(image_id)s::uuid, %(user_id)s, %(image_url)s, %(refined_prompt)s, %(intent)s, %(metadata)s::jsonb
+                        WHERE NOT EXISTS (SELECT 1 FROM updated)
+                        RETURNING image_id, user_id, image_url, refined_prompt, intent, metadata, created_at, updated_at
+                    )
+                    SELECT * FROM updated
+                    UNION ALL
+                    SELECT * FROM inserted
+                """
             
-            cursor.execute(query, (
-                image_id,
-                user_id,
-                image_url,
-                refined_prompt,
-                intent,
-                psycopg2.extras.Json(metadata)
-            ))
+                cursor.execute(query, {
+                    "image_id": image_id,
+                    "user_id": user_id,
+                    "image_url": image_url,
+                    "refined_prompt": refined_prompt,
+                    "intent": intent,
+                    "metadata": psycopg2.extras.Json(metadata),
+                })
             
-            result = cursor.fetchone()
-            conn.commit()
-            cursor.close()
+                result = cursor.fetchone()
+                conn.commit()
+                cursor.close()
+                bump_version(GALLERY_SCOPE, user_id)
             
-            logger.info(f"Saved image {image_id} for user {user_id}")
+                logger.info(f"Saved image {image_id} for user {user_id}")
             
-            return dict(result)
+                return dict(result)
         
         except psycopg2.Error as e:
             logger.error(f"Database error: {str(e)}")
-            if self.connection:
-                self.connection.rollback()
             raise ImageGalleryError(f"Failed to save image: {str(e)}")
         
         except Exception as e:
@@ -213,32 +222,32 @@ class ImageGalleryService:
             List of image records
         """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            with self._connection() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
             
-            if intent:
-                query = """
-                    SELECT image_id, user_id, image_url, refined_prompt, intent, metadata, created_at
-                    FROM image_gallery
-                    WHERE user_id = %s AND intent = %s AND deleted_at IS NULL
-                    ORDER BY created_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(query, (user_id, intent, limit, offset))
-            else:
-                query = """
-                    SELECT image_id, user_id, image_url, refined_prompt, intent, metadata, created_at
-                    FROM image_gallery
-                    WHERE user_id = %s AND deleted_at IS NULL
-                    ORDER BY created_at DESC
-                    LIMIT %s OFFSET %s
-                """
-                cursor.execute(query, (user_id, limit, offset))
+                if intent:
+                    query = """
+                        SELECT image_id, user_id, image_url, refined_prompt, intent, metadata, created_at
+                        FROM image_gallery
+                        WHERE user_id = %s AND intent = %s AND deleted_at IS NULL
+                        ORDER BY created_at DESC
+                        LIMIT %s OFFSET %s
+                    """
+                    cursor.execute(query, (user_id, intent, limit, offset))
+                else:
+                    query = """
+                        SELECT image_id, user_id, image_url, refined_prompt, intent, metadata, created_at
+                        FROM image_gallery
+                        WHERE user_id = %s AND deleted_at IS NULL
+                        ORDER BY created_at DESC
+                        LIMIT %s OFFSET %s
+                    """
+                    cursor.execute(query, (user_id, limit, offset))
             
-            results = cursor.fetchall()
-            cursor.close()
+                results = cursor.fetchall()
+                cursor.close()
             
-            return [dict(row) for row in results]
+                return [dict(row) for row in results]
         
         except psycopg2.Error as e:
             logger.error(f"Database error: {str(e)}")
@@ -256,42 +265,383 @@ class ImageGalleryService:
             True if deleted successfully
         """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
+            with self._connection() as conn:
+                cursor = conn.cursor()
             
-            query = """
-                UPDATE image_gallery
-                SET deleted_at = CURRENT_TIMESTAMP
-                WHERE image_id = %s AND user_id = %s AND deleted_at IS NULL
-            """
+                query = """
+                    UPDATE image_gallery
+                    SET deleted_at = CURRENT_TIMESTAMP
+                    WHERE image_id = %s AND user_id = %s AND deleted_at IS NULL
+                """
             
-            cursor.execute(query, (image_id, user_id))
-            rows_affected = cursor.rowcount
-            conn.commit()
-            cursor.close()
+                cursor.execute(query, (image_id, user_id))
+                rows_affected = cursor.rowcount
+                conn.commit()
+                cursor.close()
             
-            if rows_affected > 0:
-                logger.info(f"Deleted image {image_id} for user {user_id}")
-                return True
-            else:
-                logger.warning(f"Image {image_id} not found for user {user_id}")
-                return False
+                if rows_affected > 0:
+                    bump_version(GALLERY_SCOPE, user_id)
+                    logger.info(f"Deleted image {image_id} for user {user_id}")
+                    return True
+                else:
+                    logger.warning(f"Image {image_id} not found for user {user_id}")
+                    return False
         
         except psycopg2.Error as e:
             logger.error(f"Database error: {str(e)}")
-            if self.connection:
-                self.connection.rollback()
             raise ImageGalleryError(f"Failed to delete image: {str(e)}")
+
+    # Max image ids sent to PostgreSQL in one statement
+    BULK_BATCH_SIZE = 500
+
+    # action -> (set-based SQL, status for changed rows, status for unchanged rows)
+    # Each statement resolves ownership, applies the write and reports which ids
+    # changed in a single round trip: `targets` are the ids owned by the user,
+    # `changed` are the ones actually written.
+    BULK_ACTIONS = {
+        'delete': (
+            """
+                WITH targets AS (
+                    SELECT image_id FROM image_gallery
+                    WHERE image_id = ANY(%s::uuid[]) AND user_id = %s
+                ), changed AS (
+                    UPDATE image_gallery
+                    SET deleted_at = CURRENT_TIMESTAMP
+                    WHERE image_id IN (SELECT image_id FROM targets) AND deleted_at IS NULL
+                    RETURNING image_id
+                )
+                SELECT t.image_id, (c.image_id IS NOT NULL) AS changed
+                FROM targets t LEFT JOIN changed c ON c.image_id = t.image_id
+            """,
+            'deleted',
+            'already_deleted',
+        ),
+        'restore': (
+            """
+                WITH targets AS (
+                    SELECT image_id FROM image_gallery
+                    WHERE image_id = ANY(%s::uuid[]) AND user_id = %s
+                ), changed AS (
+                    UPDATE image_gallery
+                    SET deleted_at = NULL
+                    WHERE image_id IN (SELECT image_id FROM targets) AND deleted_at IS NOT NULL
+                    RETURNING image_id
+                )
+                SELECT t.image_id, (c.image_id IS NOT NULL) AS changed
+                FROM targets t LEFT JOIN changed c ON c.image_id = t.image_id
+            """,
+            'restored',
+            'not_deleted',
+        ),
+        'purge': (
+            """
+                DELETE FROM image_gallery
+                WHERE image_id = ANY(%s::uuid[]) AND user_id = %s
+                RETURNING image_id, TRUE AS changed
+            """,
+            'purged',
+            None,
+        ),
+    }
+
+    def bulk_update(self, user_id: str, image_ids: List[str], action: str) -> Dict[str, Any]:
+        """
+        Apply a bulk gallery action with one set-based statement per batch
+
+        Args:
+            user_id: Owner of the images; ids owned by other users are reported as not_found
+            image_ids: Image UUIDs (duplicates are ignored)
+            action: One of 'delete' (soft), 'restore' or 'purge' (permanent)
+
+        Returns:
+            {
+                "requested": 2,
+                "changed": 1,
+                "results": [
+                    {"image_id": "...", "status": "deleted"},
+                    {"image_id": "...", "status": "not_found"}
+                ]
+            }
+
+        Raises:
+            ImageGalleryError: When the action is unknown or the database write fails
+        """
+        if action not in self.BULK_ACTIONS:
+            raise ImageGalleryError(f"Unknown bulk action: {action}")
+
+        query, changed_status, unchanged_status = self.BULK_ACTIONS[action]
+        ordered_ids = list(dict.fromkeys(str(image_id) for image_id in image_ids))
+        outcomes: Dict[str, str] = {}
+
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                for start in range(0, len(ordered_ids), self.BULK_BATCH_SIZE):
+                    batch = ordered_ids[start:start + self.BULK_BATCH_SIZE]
+                    cursor.execute(query, (batch, user_id))
+                    for image_id, changed in cursor.fetchall():
+                        outcomes[str(image_id)] = changed_status if changed else unchanged_status
+                    conn.commit()
+
+                cursor.close()
+
+        except psycopg2.Error as e:
+            logger.error(f"Database error: {str(e)}")
+            raise ImageGalleryError(f"Failed to {action} images: {str(e)}")
+
+        changed_count = sum(1 for status in outcomes.values() if status == changed_status)
+        if changed_count:
+            bump_version(GALLERY_SCOPE, user_id)
+        logger.info(f"Bulk {action}: {changed_count}/{len(ordered_ids)} images for user {user_id}")
+
+        return {
+            "requested": len(ordered_ids),
+            "changed": changed_count,
+            "results": [
+                {"image_id": image_id, "status": outcomes.get(image_id, 'not_found')}
+                for image_id in ordered_ids
+            ],
+        }
+
+    def purge_deleted_images(
+        self,
+        retention_days: int = 30,
+        batch_size: int = 200,
+        sleep_seconds: float = 0.5,
+        max_batches: Optional[int] = None,
+        delete_files: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Hard delete images soft-deleted more than `retention_days` ago
+
+        Works through (deleted_at, image_id) in keyset order, one short
+        transaction per batch, sleeping between batches so the purge never
+        holds long locks or floods replication. Rows locked by another
+        transaction are skipped and retried by one final pass from the start.
+
+        Args:
+            retention_days: Keep soft-deleted rows for this many days
+            batch_size: Rows deleted per transaction
+            sleep_seconds: Pause between batches
+            max_batches: Stop after this many batches (None = until done)
+            delete_files: Also delete the stored file from the file service
+
+        Returns:
+            {
+                "purged": 1200,
+                "batches": 6,
+                "files_deleted": 1198,
+                "files_failed": 2,
+                "elapsed_seconds": 4.1,
+                "rows_per_second": 292.7
+            }
+
+        Raises:
+            ImageGalleryError: When a batch fails (earlier batches stay committed)
+        """
+        from core.file_uploader import file_uploader, FileUploadError
+
+        query = """
+            WITH batch AS (
+                SELECT image_id
+                FROM image_gallery
+                WHERE deleted_at IS NOT NULL
+                  AND deleted_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+                  AND (deleted_at, image_id) > (%s, %s::uuid)
+                ORDER BY deleted_at, image_id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            DELETE FROM image_gallery g
+            USING batch b
+            WHERE g.image_id = b.image_id
+            RETURNING g.image_id, g.deleted_at, g.user_id
+        """
+
+        stats = {"purged": 0, "batches": 0, "files_deleted": 0, "files_failed": 0}
+        keyset_start = (datetime(1970, 1, 1, tzinfo=timezone.utc), '00000000-0000-0000-0000-000000000000')
+        cursor_deleted_at, cursor_image_id = keyset_start
+        final_pass = False
+        started = time.monotonic()
+
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+
+                while max_batches is None or stats["batches"] < max_batches:
+                    cursor.execute(query, (retention_days, cursor_deleted_at, cursor_image_id, batch_size))
+                    rows = cursor.fetchall()
+                    conn.commit()
+
+                    if rows:
+                        stats["batches"] += 1
+                        stats["purged"] += len(rows)
+                        cursor_deleted_at, cursor_image_id = max((row[1], str(row[0])) for row in rows)
+                        for owner_id in {row[2] for row in rows}:
+                            bump_version(GALLERY_SCOPE, owner_id)
+
+                        if delete_files:
+                            for image_id, _, _ in rows:
+                                try:
+                                    file_uploader.delete_file(str(image_id))
+                                    stats["files_deleted"] += 1
+                                except FileUploadError as e:
+                                    stats["files_failed"] += 1
+                                    logger.warning(f"Failed to delete file {image_id}: {str(e)}")
+
+                        logger.info(f"Purge batch {stats['batches']}: {len(rows)} rows (total {stats['purged']})")
+
+                    if len(rows) == batch_size:
+                        time.sleep(sleep_seconds)
+                        continue
+
+                    # End of the keyset pass. Rows that were locked (SKIP LOCKED) when the
+                    # cursor went past them are behind it: sweep once more from the start
+                    if final_pass:
+                        break
+                    final_pass = True
+                    cursor_deleted_at, cursor_image_id = keyset_start
+
+                cursor.close()
+
+        except psycopg2.Error as e:
+            logger.error(f"Database error: {str(e)}")
+            raise ImageGalleryError(f"Failed to purge images: {str(e)}")
+
+        elapsed = time.monotonic() - started
+        stats["elapsed_seconds"] = round(elapsed, 2)
+        stats["rows_per_second"] = round(stats["purged"] / elapsed, 1) if elapsed > 0 else 0.0
+
+        logger.info(
+            f"Purged {stats['purged']} soft-deleted images older than {retention_days} days "
+            f"in {stats['batches']} batches ({stats['rows_per_second']} rows/s)"
+        )
+        return stats
+
+    def get_usage_stats(
+        self,
+        start_date,
+        end_date,
+        user_id: Optional[str] = None,
+        media_type: Optional[str] = None,
+        top_users: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Read output counts from the gallery_usage_daily rollup (see usage_rollup.sql)
+        
+        Cost is proportional to the number of days/intents in range, not to the
+        number of images.
+        
+        Args:
+            start_date: First UTC day (inclusive)
+            end_date: Last UTC day (inclusive)
+            user_id: Restrict to one user; None aggregates across all users
+            media_type: 'image' or 'video' (optional)
+            top_users: When user_id is None, also return the N busiest users
+            
+        Returns:
+            {
+                "totals": {"outputs": 42, "processing_seconds": 310.5, "avg_processing_seconds": 7.4},
+                "by_intent": [{"media_type": "image", "intent": "upscale", "outputs": 12, ...}],
+                "by_day": [{"day": "2025-12-13", "outputs": 5, ...}],
+                "by_user": [{"user_id": "user123", "outputs": 30}]   # only when user_id is None
+            }
+        """
+        filters = ["day BETWEEN %s AND %s"]
+        params: List[Any] = [start_date, end_date]
+        if user_id:
+            filters.append("user_id = %s")
+            params.append(user_id)
+        if media_type:
+            filters.append("media_type = %s")
+            params.append(media_type)
+        where = " AND ".join(filters)
+
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+                cursor.execute(f"""
+                    SELECT day, media_type, intent,
+                           SUM(outputs)::int AS outputs,
+                           SUM(timed_outputs)::int AS timed_outputs,
+                           SUM(processing_seconds)::float AS processing_seconds
+                    FROM gallery_usage_daily
+                    WHERE {where}
+                    GROUP BY day, media_type, intent
+                    ORDER BY day
+                """, params)
+                rows = cursor.fetchall()
+
+                by_user = None
+                if not user_id:
+                    cursor.execute(f"""
+                        SELECT user_id, SUM(outputs)::int AS outputs
+                        FROM gallery_usage_daily
+                        WHERE {where}
+                        GROUP BY user_id
+                        ORDER BY outputs DESC
+                        LIMIT %s
+                    """, params + [top_users])
+                    by_user = [dict(row) for row in cursor.fetchall()]
+
+                cursor.close()
+
+        except psycopg2.Error as e:
+            logger.error(f"Database error: {str(e)}")
+            raise ImageGalleryError(f"Failed to fetch usage stats: {str(e)}")
+
+        def summarize(group_rows):
+            outputs = sum(r['outputs'] for r in group_rows)
+            timed = sum(r['timed_outputs'] for r in group_rows)
+            seconds = round(sum(r['processing_seconds'] for r in group_rows), 2)
+            return {
+                "outputs": outputs,
+                "processing_seconds": seconds,
+                "avg_processing_seconds": round(seconds / timed, 2) if timed else None,
+            }
+
+        by_intent: Dict[tuple, list] = {}
+        by_day: Dict[str, list] = {}
+        for row in rows:
+            by_intent.setdefault((row['media_type'], row['intent']), []).append(row)
+            by_day.setdefault(row['day'].isoformat(), []).append(row)
+
+        result = {
+            "totals": summarize(rows),
+            "by_intent": [
+                {"media_type": media, "intent": intent, **summarize(group)}
+                for (media, intent), group in sorted(by_intent.items())
+            ],
+            "by_day": [{"day": day, **summarize(group)} for day, group in by_day.items()],
+        }
+        if by_user is not None:
+            result["by_user"] = by_user
+        return result
     
-    def close(self):
-        """Close database connection"""
-        if self.connection and not self.connection.closed:
-            self.connection.close()
-            logger.info("Database connection closed")
+    def ensure_partitions(self, months_ahead: int = 3) -> None:
+        """
+        Create monthly partitions of image_gallery up to `months_ahead` months out
+        
+        Uses ensure_monthly_partitions() from schema.sql; safe to call repeatedly.
+        
+        Raises:
+            ImageGalleryError: When partition creation fails
+        """
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT ensure_monthly_partitions('image_gallery', 0, %s)", (months_ahead,))
+                conn.commit()
+                cursor.close()
+        except psycopg2.Error as e:
+            logger.error(f"Database error: {str(e)}")
+            raise ImageGalleryError(f"Failed to create partitions: {str(e)}")
     
-    def __del__(self):
-        """Cleanup on destruction"""
-        self.close()
+    def close(self):
+        """Close idle pooled connections"""
+        get_pool(self.DB_CONFIG).close()
 
 
 # Global instance
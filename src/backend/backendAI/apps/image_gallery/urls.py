@@ -5,6 +5,10 @@ from .views import (
     ImageGalleryDeletedListView,
     ImageGalleryRestoreView,
     ImageGalleryPermanentDeleteView,
+    ImageGalleryBulkDeleteView,
+    ImageGalleryBulkRestoreView,
+    ImageGalleryBulkPermanentDeleteView,
+    ImageGalleryStatsView,
 )
 
 urlpatterns = [
@@ -14,6 +18,14 @@ urlpatterns = [
     # Deleted images
     path('deleted', ImageGalleryDeletedListView.as_view(), name='image-gallery-deleted'),
     
+    # Usage stats (from the gallery_usage_daily rollup)
+    path('stats', ImageGalleryStatsView.as_view(), name='image-gallery-stats'),
+    
+    # Bulk operations (one set-based statement per batch)
+    path('bulk/delete', ImageGalleryBulkDeleteView.as_view(), name='image-gallery-bulk-delete'),
+    path('bulk/restore', ImageGalleryBulkRestoreView.as_view(), name='image-gallery-bulk-restore'),
+    path('bulk/permanent', ImageGalleryBulkPermanentDeleteView.as_view(), name='image-gallery-bulk-permanent-delete'),
+    
     # Image detail and soft delete
     path('<uuid:image_id>', ImageGalleryDetailView.as_view(), name='image-gallery-detail'),
     
@@ -0,0 +1,127 @@
+-- ============================================================================
+-- Gallery Usage Rollups
+-- PostgreSQL / Supabase
+-- ============================================================================
+--
+-- Per-user, per-day, per-intent output counts for image_gallery and
+-- video_gallery, maintained by row triggers so dashboards read O(days) rows
+-- instead of scanning the galleries. Run after both schema.sql files.
+-- Safe to re-run: the rollup is rebuilt from the galleries under a lock.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS gallery_usage_daily (
+    user_id VARCHAR(255) NOT NULL,
+    day DATE NOT NULL,                              -- UTC day of created_at
+    media_type VARCHAR(10) NOT NULL,                -- 'image' | 'video'
+    intent VARCHAR(100) NOT NULL,                   -- 'unknown' when NULL in the gallery
+    outputs INTEGER NOT NULL DEFAULT 0,             -- images/videos produced
+    timed_outputs INTEGER NOT NULL DEFAULT 0,       -- outputs with metadata.processing_time
+    processing_seconds NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, day, media_type, intent)
+);
+
+-- Cross-user dashboards filter by day only
+CREATE INDEX IF NOT EXISTS idx_gallery_usage_daily_day
+ON gallery_usage_daily (day);
+
+-- ============================================================================
+-- Incremental maintenance
+-- ============================================================================
+
+-- metadata.processing_time in seconds, NULL when absent or not a number
+CREATE OR REPLACE FUNCTION gallery_processing_time(metadata JSONB)
+RETURNS NUMERIC AS $$
+    SELECT CASE
+        WHEN jsonb_typeof(metadata -> 'processing_time') = 'number'
+        THEN (metadata ->> 'processing_time')::numeric
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION bump_gallery_usage(
+    p_user_id VARCHAR, p_created_at TIMESTAMPTZ, p_media_type VARCHAR, p_intent VARCHAR, p_processing NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO gallery_usage_daily AS u (
+        user_id, day, media_type, intent, outputs, timed_outputs, processing_seconds
+    )
+    VALUES (
+        p_user_id,
+        (p_created_at AT TIME ZONE 'UTC')::date,
+        p_media_type,
+        COALESCE(p_intent, 'unknown'),
+        1,
+        CASE WHEN p_processing IS NULL THEN 0 ELSE 1 END,
+        COALESCE(p_processing, 0)
+    )
+    ON CONFLICT (user_id, day, media_type, intent) DO UPDATE SET
+        outputs = u.outputs + 1,
+        timed_outputs = u.timed_outputs + EXCLUDED.timed_outputs,
+        processing_seconds = u.processing_seconds + EXCLUDED.processing_seconds,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Every inserted image is one output (re-saves of the same image are UPDATEs)
+CREATE OR REPLACE FUNCTION rollup_image_gallery_usage()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM bump_gallery_usage(
+        NEW.user_id, NEW.created_at, 'image', NEW.intent, gallery_processing_time(NEW.metadata)
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A video counts once, when its video_url is first set
+CREATE OR REPLACE FUNCTION rollup_video_gallery_usage()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.video_url IS NOT NULL AND (TG_OP = 'INSERT' OR OLD.video_url IS NULL) THEN
+        PERFORM bump_gallery_usage(
+            NEW.user_id, NEW.created_at, 'video', NEW.intent, gallery_processing_time(NEW.metadata)
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Block gallery writes while the triggers are installed and the rollup rebuilt
+LOCK TABLE image_gallery, video_gallery IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trigger_rollup_image_gallery_usage ON image_gallery;
+CREATE TRIGGER trigger_rollup_image_gallery_usage
+    AFTER INSERT ON image_gallery
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_image_gallery_usage();
+
+DROP TRIGGER IF EXISTS trigger_rollup_video_gallery_usage ON video_gallery;
+CREATE TRIGGER trigger_rollup_video_gallery_usage
+    AFTER INSERT OR UPDATE OF video_url ON video_gallery
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_video_gallery_usage();
+
+-- ============================================================================
+-- Backfill
+-- ============================================================================
+
+TRUNCATE gallery_usage_daily;
+
+INSERT INTO gallery_usage_daily (user_id, day, media_type, intent, outputs, timed_outputs, processing_seconds)
+SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, 'image', COALESCE(intent, 'unknown'),
+       count(*), count(gallery_processing_time(metadata)), COALESCE(sum(gallery_processing_time(metadata)), 0)
+FROM image_gallery
+GROUP BY 1, 2, 3, 4;
+
+INSERT INTO gallery_usage_daily (user_id, day, media_type, intent, outputs, timed_outputs, processing_seconds)
+SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, 'video', COALESCE(intent, 'unknown'),
+       count(*), count(gallery_processing_time(metadata)), COALESCE(sum(gallery_processing_time(metadata)), 0)
+FROM video_gallery
+WHERE video_url IS NOT NULL
+GROUP BY 1, 2, 3, 4;
+
+COMMIT;
+
+COMMENT ON TABLE gallery_usage_daily IS 'Trigger-maintained daily output counts per user, media type and intent';
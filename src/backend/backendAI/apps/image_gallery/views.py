@@ -1,13 +1,21 @@
+from datetime import timedelta
 from rest_framework.views import APIView
 from rest_framework import status
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from core import APIResponse, ResponseFormatter
+from core.auth import require_role
+from core.etag import condition_on_version, GALLERY_SCOPE
 from .models import ImageGallery
 from .serializers import (
     ImageGallerySerializer,
     ImageGalleryCreateSerializer,
-    ImageGalleryListSerializer
+    ImageGalleryListSerializer,
+    ImageGalleryBulkActionSerializer,
+    ImageGalleryStatsQuerySerializer,
 )
+from .services import image_gallery_service, ImageGalleryError
 
 
 class ImageGalleryListView(APIView):
@@ -15,6 +23,7 @@ class ImageGalleryListView(APIView):
     GET: List all images for a user (non-deleted only)
     POST: Create a new image entry
     """
+    @condition_on_version(GALLERY_SCOPE, lambda request, **kwargs: request.query_params.get('user_id'))
     def get(self, request):
         user_id = request.query_params.get('user_id')
         if not user_id:
@@ -62,6 +71,7 @@ class ImageGalleryDetailView(APIView):
 
 class ImageGalleryDeletedListView(APIView):
     """GET: List all deleted images for a user"""
+    @condition_on_version(GALLERY_SCOPE, lambda request, **kwargs: request.query_params.get('user_id'))
     def get(self, request):
         user_id = request.query_params.get('user_id')
         if not user_id:
@@ -97,3 +107,89 @@ class ImageGalleryPermanentDeleteView(APIView):
         image = get_object_or_404(ImageGallery, image_id=image_id)
         image.delete()
         return APIResponse.success(message='Image permanently deleted')
+
+
+class ImageGalleryBulkActionView(APIView):
+    """
+    POST: Apply one action to many images owned by a user
+    Body: {"user_id": "...", "image_ids": ["uuid", ...]}
+    Returns per-image outcomes plus a count of changed rows.
+    """
+    action = None
+    success_message = None
+
+    def post(self, request):
+        serializer = ImageGalleryBulkActionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse.error(message='Validation failed', result=serializer.errors)
+
+        data = serializer.validated_data
+        try:
+            result = image_gallery_service.bulk_update(
+                user_id=data['user_id'],
+                image_ids=data['image_ids'],
+                action=self.action
+            )
+        except ImageGalleryError as e:
+            return APIResponse.server_error(message=str(e))
+
+        return APIResponse.success(
+            result=result,
+            message=self.success_message
+        )
+
+
+class ImageGalleryBulkDeleteView(ImageGalleryBulkActionView):
+    """POST: Soft delete many images"""
+    action = 'delete'
+    success_message = 'Images deleted successfully'
+
+
+class ImageGalleryBulkRestoreView(ImageGalleryBulkActionView):
+    """POST: Restore many soft-deleted images"""
+    action = 'restore'
+    success_message = 'Images restored successfully'
+
+
+class ImageGalleryBulkPermanentDeleteView(ImageGalleryBulkActionView):
+    """POST: Permanently delete many images from database"""
+    action = 'purge'
+    success_message = 'Images permanently deleted'
+
+
+class ImageGalleryStatsView(APIView):
+    """
+    GET: Output counts per intent and per day from the usage rollup
+    Query: user_id (omit for all users, ADMIN only), start_date, end_date (default: last 30 days), media_type
+    """
+    def get(self, request):
+        if not request.query_params.get('user_id'):
+            return self._all_users_stats(request)
+        return self._stats(request)
+
+    @method_decorator(require_role('ADMIN'))
+    def _all_users_stats(self, request):
+        return self._stats(request)
+
+    def _stats(self, request):
+        serializer = ImageGalleryStatsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return APIResponse.error(message='Validation failed', result=serializer.errors)
+
+        params = serializer.validated_data
+        end_date = params.get('end_date') or timezone.now().date()
+        start_date = params.get('start_date') or end_date - timedelta(days=29)
+
+        try:
+            stats = image_gallery_service.get_usage_stats(
+                start_date=start_date,
+                end_date=end_date,
+                user_id=params.get('user_id'),
+                media_type=params.get('media_type')
+            )
+        except ImageGalleryError as e:
+            return APIResponse.server_error(message=str(e))
+
+        stats['start_date'] = start_date.isoformat()
+        stats['end_date'] = end_date.isoformat()
+        return APIResponse.success(result=stats)
@@ -1,6 +1,7 @@
 """
 Serializers for Image Generation feature
 """
+from django.conf import settings
 from rest_framework import serializers
 from apps.intent_router.constants import AspectRatio
 
@@ -20,3 +21,15 @@ class ImageGenerationInputSerializer(serializers.Serializer):
     style_reference_file = serializers.ImageField(required=False, help_text="Style reference file upload")
     
     user_id = serializers.CharField(required=True, max_length=255)
+
+
+class ImageGenerationBatchSerializer(serializers.Serializer):
+    """Validate input for a batch of variations of one prompt"""
+    prompt = serializers.CharField(required=True, max_length=2000)
+    count = serializers.IntegerField(required=True, min_value=1, max_value=settings.BATCH_MAX_ITEMS)
+    aspect_ratio = serializers.ChoiceField(
+        choices=AspectRatio.all(),
+        required=False,
+        default=AspectRatio.SQUARE
+    )
+    user_id = serializers.CharField(required=True, max_length=255)
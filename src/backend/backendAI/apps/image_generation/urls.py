@@ -2,11 +2,21 @@
 URL routing for Image Generation feature
 """
 from django.urls import path
-from .views import ImageGenerationView, ImageGenerationStatusView
+from .views import (
+    ImageGenerationView,
+    ImageGenerationStatusView,
+    ImageGenerationBatchView,
+    ImageGenerationBatchStatusView,
+)
+from core.cancellation import FeatureCancelView
 
 urlpatterns = [
     # Direct feature access (không qua conversation)
     path('', ImageGenerationView.as_view(), name='image-generation'),
     # Poll task status
     path('status/<str:task_id>/', ImageGenerationStatusView.as_view(), name='image-generation-status'),
+    path('cancel/<str:task_id>/', FeatureCancelView.as_view(), name='image-generation-cancel'),
+    # N variations of one prompt, aggregated status
+    path('batch/', ImageGenerationBatchView.as_view(), name='image-generation-batch'),
+    path('batch/<str:batch_id>/', ImageGenerationBatchStatusView.as_view(), name='image-generation-batch-status'),
 ]
@@ -5,14 +5,20 @@ Support both conversation flow and direct feature access
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
 from core import APIResponse
-from .serializers import ImageGenerationInputSerializer
+from .serializers import ImageGenerationInputSerializer, ImageGenerationBatchSerializer
 from .services import ImageGenerationService, ImageGenerationError
 from .celery_tasks import generate_image_task
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs, release_job_when_done, JobLimitExceeded, job_limit_response
+from core.cancellation import cancellable_status
 from core.image_input_handler import ImageInputHandler
 from apps.prompt_service.services import PromptService
 from apps.image_gallery.services import image_gallery_service
+from apps.intent_router.batch import start_batch, get_batch_status, BatchError
+from core.scheduler import request_tier
+from core.admission import is_degraded
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,6 +32,7 @@ class ImageGenerationView(APIView):
     Use case: User clicks "Generate Image" button directly, không qua chat
     """
     
+    @limit_concurrent_jobs(probe='apps.image_generation.services.provider_status')
     @track_processing_time(feature='image_generation', min_required_tokens=10)
     def post(self, request):
         """
@@ -76,7 +83,8 @@ class ImageGenerationView(APIView):
                 prompt=refined_prompt,
                 user_id=user_id,
                 aspect_ratio=validated_data.get('aspect_ratio', 'square_1_1'),
-                style_reference=style_reference_url
+                style_reference=style_reference_url,
+                resolution=settings.ADMISSION_DEGRADED_RESOLUTION if is_degraded(request) else '2k'
             )
             
             return APIResponse.success(
@@ -113,6 +121,8 @@ class ImageGenerationStatusView(APIView):
     GET /v1/features/image-generation/status/<task_id>/?user_id=xxx
     """
     
+    @release_job_when_done
+    @cancellable_status
     def get(self, request, task_id):
         """
         Get status of generation task and save to gallery if completed
@@ -171,3 +181,61 @@ class ImageGenerationStatusView(APIView):
                 result={"detail": str(e)},
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class ImageGenerationBatchView(APIView):
+    """
+    Generate several variations of one prompt
+    POST /v1/features/image-generation/batch/
+    
+    The prompt is refined once and tokens are reserved once for the whole
+    batch (see apps/intent_router/batch.py).
+    """
+    
+    def post(self, request):
+        """
+        Request body:
+        {
+            "prompt": "A sunset over mountains",
+            "count": 4,
+            "aspect_ratio": "square_1_1",  # optional
+            "user_id": "user123"
+        }
+        """
+        serializer = ImageGenerationBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse.error(message="Validation failed", result=serializer.errors)
+        
+        validated_data = serializer.validated_data
+        try:
+            result = start_batch(
+                user_id=validated_data['user_id'],
+                intent='image_generation',
+                inputs=[None] * validated_data['count'],
+                prompt=validated_data['prompt'],
+                params={'aspect_ratio': validated_data['aspect_ratio']},
+                tier=request_tier(request)
+            )
+        except BatchError as e:
+            return APIResponse.error(message=str(e), result=e.detail, status_code=e.status_code)
+        except JobLimitExceeded as e:
+            return job_limit_response(e)
+        
+        return APIResponse.success(
+            result=result,
+            message="Batch started. Use batch_id to poll status.",
+            status_code=status.HTTP_202_ACCEPTED
+        )
+
+
+class ImageGenerationBatchStatusView(APIView):
+    """
+    Aggregated status of a generation batch with per-item results
+    GET /v1/features/image-generation/batch/<batch_id>/
+    """
+    
+    def get(self, request, batch_id):
+        result = get_batch_status(batch_id, intent='image_generation')
+        if result is None:
+            return APIResponse.not_found(message="Batch not found or expired")
+        return APIResponse.success(result=result, message="Batch status retrieved")
@@ -1,6 +1,6 @@
 import logging
 import uuid
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from core.file_uploader import FileUploadError, file_uploader
 from core.image_input_handler import ImageInputHandler
@@ -136,3 +136,9 @@ class ImageToVideoService:
             "video_url": None,
             "video_id": str(record.get("video_id")),
         }
+
+
+def provider_status(task_id: str) -> Optional[str]:
+    """Model Studio status of `task_id`, without uploading results (job permit watcher, core/job_limiter.py)"""
+    status, _ = ModelStudioVideoClient().get_task_status(task_id)
+    return status
@@ -1,8 +1,11 @@
 from django.urls import path
 
+from core.cancellation import FeatureCancelView
+
 from .views import ImageToVideoStatusView, ImageToVideoView
 
 urlpatterns = [
     path("", ImageToVideoView.as_view(), name="image-to-video"),
     path("status/<str:task_id>/", ImageToVideoStatusView.as_view(), name="image-to-video-status"),
+    path("cancel/<str:task_id>/", FeatureCancelView.as_view(), name="image-to-video-cancel"),
 ]
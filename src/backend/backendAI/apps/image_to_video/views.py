@@ -6,6 +6,8 @@ from django.utils.decorators import method_decorator
 
 from core import APIResponse
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs, release_job_when_done
+from core.cancellation import cancellable_status
 from core.auth import require_role
 from .serializers import ImageToVideoRequestSerializer
 from .services import ModelStudioVideoError, ImageToVideoService
@@ -21,6 +23,7 @@ class ImageToVideoView(APIView):
     Requires: ADMIN or PREMIUM role
     """
 
+    @limit_concurrent_jobs(probe='apps.image_to_video.services.provider_status')
     @track_processing_time(feature='image_to_video', min_required_tokens=20)
     def post(self, request):
         serializer = ImageToVideoRequestSerializer(data=request.data)
@@ -71,6 +74,8 @@ class ImageToVideoStatusView(APIView):
     Requires: ADMIN or PREMIUM role
     """
 
+    @release_job_when_done
+    @cancellable_status
     def get(self, request, task_id):
         user_id = request.query_params.get("user_id")
         if not user_id:
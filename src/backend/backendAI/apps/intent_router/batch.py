@@ -0,0 +1,365 @@
+"""
+Batch feature requests
+
+"4 variations of this prompt" or "upscale these 10 images" arrive as one
+request. The batch fans out as a Celery chord:
+
+    refine (once, generation only) -> chord(lanes) -> finish
+
+Items run on BATCH_MAX_CONCURRENCY lanes: each lane is a chain of items, so
+one batch never holds more than that many submit slots however large it is.
+Every item is the same feature call the chat flow makes
+(`_route_to_ai_feature`), polled to completion on its lane. The whole chord
+goes through the fair-share scheduler (core/scheduler.py) holding one slot
+per lane.
+
+Tokens are reserved once for the whole batch (min_deduction per item) before
+anything is dispatched; `finish` charges the time-based remainder, if any,
+in one more deduction. Items are not charged individually.
+
+State lives in the cache: `batch:{id}` holds the request and the refined
+prompt, `batch:{id}:item:{n}` each item's result. `get_batch_status` is the
+aggregated status resource served by the feature batch status endpoints.
+"""
+
+import logging
+import time
+import uuid
+
+from celery import chain, chord
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core import ResponseCode
+from core.exceptions import InsufficientTokensError, TokenServiceError
+from core.scheduler import submit, release, DEFAULT_TIER
+from core.job_limiter import acquire_job, release_job
+from core.token_client import token_client
+from core.token_config import TokenConfig
+
+from .constants import IntentType
+
+logger = logging.getLogger(__name__)
+
+BATCH_INTENTS = (IntentType.image_generation, IntentType.UPSCALE)
+
+
+class BatchError(Exception):
+    """Batch rejected before dispatch; `status_code` is the HTTP status to return."""
+
+    def __init__(self, message, status_code=400, detail=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail or {}
+
+
+def _batch_key(batch_id):
+    return f"batch:{batch_id}"
+
+
+def _item_key(batch_id, index):
+    return f"batch:{batch_id}:item:{index}"
+
+
+def _save_batch(batch):
+    cache.set(_batch_key(batch["batch_id"]), batch, settings.BATCH_STATE_TTL_SECONDS)
+
+
+def get_batch(batch_id):
+    return cache.get(_batch_key(batch_id))
+
+
+def reserve_tokens(user_id, intent, count):
+    """
+    Check the balance for `count` items and deduct the reservation in one call
+
+    Returns:
+        Reserved token amount
+
+    Raises:
+        BatchError: 402 when the balance is too low, 503 when the token service is down
+    """
+    config = TokenConfig.get_config(intent)
+    reserved = config['min_deduction'] * count
+    try:
+        balance = token_client.get_cached_user_tokens(user_id)
+        if balance < max(config['estimated_tokens'] * count, reserved, TokenConfig.MIN_TOKEN_REQUIRED):
+            raise InsufficientTokensError(
+                f"{config['display_name']} x{count} requires {reserved} tokens, you have {balance}"
+            )
+        token_client.deduct_tokens(
+            user_id=user_id,
+            amount=reserved,
+            reason=f"{config['display_name']} batch x{count} (reservation)",
+            metadata={'feature': intent, 'items': count, 'reservation': True},
+        )
+    except InsufficientTokensError as e:
+        raise BatchError("Insufficient tokens", status_code=402, detail={
+            "detail": str(e), "required_tokens": reserved,
+        })
+    except TokenServiceError as e:
+        logger.error(f"[Batch] Token service unavailable: {e}")
+        raise BatchError("Token service is currently unavailable", status_code=503)
+    return reserved
+
+
+def start_batch(user_id, intent, inputs, prompt=None, params=None, tier=DEFAULT_TIER):
+    """
+    Reserve tokens, store the batch state and submit the chord to the scheduler
+
+    Args:
+        intent: One of BATCH_INTENTS
+        inputs: One entry per item: None for generation variants, else the input image URL
+        prompt: Prompt shared by every item (refined once)
+        params: Feature params shared by every item
+        tier: Scheduler tier of the user (core/scheduler.py)
+
+    Returns:
+        Batch status (see get_batch_status)
+
+    Raises:
+        BatchError: Invalid batch, tokens not reserved, or dispatch failed (reservation refunded)
+        JobLimitExceeded: The user already has USER_JOB_LIMITS jobs in flight
+    """
+    from .celery_tasks import refine_batch_prompt_task, run_batch_item_task, finish_batch_task
+
+    if intent not in BATCH_INTENTS:
+        raise BatchError(f"Batches are not supported for {intent}")
+    if not 1 <= len(inputs) <= settings.BATCH_MAX_ITEMS:
+        raise BatchError(f"A batch takes 1 to {settings.BATCH_MAX_ITEMS} items")
+
+    # A batch holds one of the user's job permits (raises JobLimitExceeded) until finish_batch
+    batch_id = uuid.uuid4().hex
+    acquire_job(user_id, batch_id, tier)
+    try:
+        reserved = reserve_tokens(user_id, intent, len(inputs))
+    except BatchError:
+        release_job(batch_id)
+        raise
+
+    batch = {
+        "batch_id": batch_id,
+        "user_id": user_id,
+        "intent": intent,
+        "status": "PROCESSING",
+        "prompt": prompt,
+        "refined_prompt": None,
+        "params": params or {},
+        "inputs": inputs,
+        "reserved_tokens": reserved,
+        "created_at": timezone.now().isoformat(),
+    }
+
+    # Item n runs on lane n % lanes; lanes run in parallel, items in a lane one after another
+    lanes = min(len(inputs), settings.BATCH_MAX_CONCURRENCY)
+    header = [
+        chain(*[run_batch_item_task.si(batch_id, index) for index in range(lane, len(inputs), lanes)])
+        for lane in range(lanes)
+    ]
+    # The errback closes the batch if the chord fails anyway (unclosed items count as failed)
+    workflow = chord(header, finish_batch_task.si(batch_id))
+    workflow.link_error(finish_batch_task.si(batch_id))
+    if prompt:
+        workflow = refine_batch_prompt_task.si(batch_id) | workflow
+    # One scheduler slot per lane, released by finish_batch
+    try:
+        _save_batch(batch)
+        submit(user_id, tier, workflow, job_id=batch_id, cost=lanes)
+    except Exception as e:
+        logger.error(f"[Batch] {batch_id}: failed to start: {e}")
+        _abort_batch(batch, "Failed to start processing.")
+        raise BatchError("Failed to start the batch", status_code=503, detail={"batch_id": batch_id})
+
+    logger.info(f"[Batch] {batch_id}: {len(inputs)} x {intent} for user {user_id} on {lanes} lanes")
+    return get_batch_status(batch_id)
+
+
+def _abort_batch(batch, error):
+    """Undo a batch that could not be dispatched: refund the reservation, free the permit, mark it FAILED."""
+    batch_id = batch["batch_id"]
+    try:
+        token_client.refund_tokens(
+            user_id=batch["user_id"],
+            amount=batch["reserved_tokens"],
+            reason=f"{TokenConfig.get_config(batch['intent'])['display_name']} batch x{len(batch['inputs'])} (refund)",
+            metadata={'feature': batch["intent"], 'batch_id': batch_id, 'refund': True},
+        )
+        batch["charged_tokens"] = 0
+    except Exception as e:
+        logger.error(f"[Batch] {batch_id}: failed to refund {batch['reserved_tokens']} reserved tokens: {e}")
+    release_job(batch_id)
+    batch["status"] = "FAILED"
+    batch["error"] = error
+    batch["finished_at"] = timezone.now().isoformat()
+    try:
+        _save_batch(batch)
+    except Exception as e:
+        logger.error(f"[Batch] {batch_id}: failed to store FAILED state: {e}")
+
+
+def refine_batch_prompt(batch_id):
+    """Refine the shared prompt once for every item; items fall back to the raw prompt on failure."""
+    from apps.prompt_service.services import PromptService
+
+    batch = get_batch(batch_id)
+    if batch is None:
+        return
+    try:
+        batch["refined_prompt"] = PromptService.refine_only(batch["prompt"])
+    except Exception as e:
+        logger.warning(f"[Batch] {batch_id}: prompt refinement failed, using the raw prompt: {e}")
+        batch["refined_prompt"] = batch["prompt"]
+    _save_batch(batch)
+
+
+def run_item(task, batch_id, index):
+    """
+    Run item `index` to completion and record its result
+
+    Never raises: a failing item would stop the rest of its lane and the chord
+    callback, leaving the batch PROCESSING with its slots, permit and tokens held.
+    """
+    try:
+        return _run_item(task, batch_id, index)
+    except Exception as e:
+        logger.error(f"[Batch] {batch_id}: item {index} failed: {e}", exc_info=True)
+        try:
+            cache.set(_item_key(batch_id, index), {
+                "index": index, "status": "FAILED", "uploaded_urls": [], "error": "Processing error",
+            }, settings.BATCH_STATE_TTL_SECONDS)
+        except Exception:
+            pass
+        return {"index": index, "status": "FAILED"}
+
+
+def _run_item(task, batch_id, index):
+    from .celery_tasks import _route_to_ai_feature
+
+    batch = get_batch(batch_id)
+    if batch is None:
+        logger.warning(f"[Batch] {batch_id}: state expired, item {index} skipped")
+        return {"index": index, "status": "FAILED"}
+
+    cache.set(_item_key(batch_id, index), {"index": index, "status": "PROCESSING"}, settings.BATCH_STATE_TTL_SECONDS)
+
+    image_url = batch["inputs"][index]
+    prompt = batch["refined_prompt"] or batch["prompt"] or ""
+    start = time.time()
+    _, feature_result = _route_to_ai_feature(task, {
+        "prompt": prompt,
+        "intent": batch["intent"],
+        "extracted_params": batch["params"],
+        "metadata": {"batch_id": batch_id},
+        # user_id instead of session_id: gallery owner, and no per-item charge
+        "context": {
+            "user_id": batch["user_id"],
+            "batch_id": batch_id,
+            "images": [image_url] if image_url else [],
+            "image_url": image_url,
+        },
+    })
+    processing_time = time.time() - start
+
+    uploaded_urls = (feature_result.get("result") or {}).get("uploaded_urls") or []
+    completed = feature_result.get("code") != ResponseCode.ERROR and bool(uploaded_urls)
+    item = {
+        "index": index,
+        "status": "COMPLETED" if completed else "FAILED",
+        "input": image_url,
+        "uploaded_urls": uploaded_urls,
+        "error": None if completed else feature_result.get("message"),
+        "processing_time": round(processing_time, 2),
+    }
+    cache.set(_item_key(batch_id, index), item, settings.BATCH_STATE_TTL_SECONDS)
+
+    # Generation results are queued for the gallery by the router itself
+    if completed and batch["intent"] != IntentType.image_generation:
+        from apps.image_gallery.celery_tasks import save_images_task
+        save_images_task.delay(
+            user_id=batch["user_id"],
+            image_urls=uploaded_urls,
+            intent=batch["intent"],
+            metadata={"batch_id": batch_id, "original_image": image_url, **batch["params"]},
+        )
+    return {"index": index, "status": item["status"]}
+
+
+def finish_batch(batch_id):
+    """Chord callback (and its errback): settle tokens against the reservation and close the batch."""
+    batch = get_batch(batch_id)
+    if batch is None:
+        logger.warning(f"[Batch] {batch_id}: state expired before it finished")
+        release(batch_id)
+        release_job(batch_id)
+        return
+    if batch["status"] != "PROCESSING":
+        return
+
+    items = _get_items(batch_id, len(batch["inputs"]))
+    completed = sum(1 for item in items if item["status"] == "COMPLETED")
+    batch["status"] = "COMPLETED" if completed == len(items) else "PARTIAL" if completed else "FAILED"
+    batch["finished_at"] = timezone.now().isoformat()
+
+    # Same rule as single requests: max(time * rate, min_deduction) per item
+    cost = sum(TokenConfig.calculate_cost(batch["intent"], item.get("processing_time") or 0) for item in items)
+    extra = cost - batch["reserved_tokens"]
+    if extra > 0:
+        try:
+            token_client.deduct_tokens(
+                user_id=batch["user_id"],
+                amount=extra,
+                reason=f"{TokenConfig.get_config(batch['intent'])['display_name']} batch x{len(items)}",
+                metadata={'feature': batch["intent"], 'batch_id': batch_id, 'items': len(items)},
+            )
+        except Exception as e:
+            logger.error(f"[Batch] {batch_id}: failed to charge {extra} extra tokens: {e}")
+    batch["charged_tokens"] = batch["reserved_tokens"] + max(extra, 0)
+
+    _save_batch(batch)
+    release(batch_id)
+    release_job(batch_id)
+    logger.info(f"[Batch] {batch_id} {batch['status']}: {completed}/{len(items)} items, {batch['charged_tokens']} tokens")
+
+
+def _get_items(batch_id, total):
+    stored = cache.get_many([_item_key(batch_id, index) for index in range(total)])
+    return [
+        stored.get(_item_key(batch_id, index)) or {"index": index, "status": "PENDING"}
+        for index in range(total)
+    ]
+
+
+def get_batch_status(batch_id, intent=None):
+    """
+    Aggregated batch status with per-item results, or None if unknown/expired
+
+    Returns:
+        {"batch_id", "intent", "status", "total", "completed", "failed", "pending",
+         "refined_prompt", "reserved_tokens", "charged_tokens", "items": [...]}
+    """
+    batch = get_batch(batch_id)
+    if batch is None or (intent and batch["intent"] != intent):
+        return None
+
+    items = _get_items(batch_id, len(batch["inputs"]))
+    counts = {"COMPLETED": 0, "FAILED": 0}
+    for item in items:
+        if item["status"] in counts:
+            counts[item["status"]] += 1
+    return {
+        "batch_id": batch_id,
+        "intent": batch["intent"],
+        "status": batch["status"],
+        "total": len(items),
+        "completed": counts["COMPLETED"],
+        "failed": counts["FAILED"],
+        "pending": len(items) - counts["COMPLETED"] - counts["FAILED"],
+        "refined_prompt": batch["refined_prompt"],
+        "reserved_tokens": batch["reserved_tokens"],
+        "charged_tokens": batch.get("charged_tokens"),
+        "created_at": batch["created_at"],
+        "finished_at": batch.get("finished_at"),
+        "error": batch.get("error"),
+        "items": items,
+    }
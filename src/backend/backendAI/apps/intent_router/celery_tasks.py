@@ -3,7 +3,10 @@ Celery tasks for Intent Router
 Routes to appropriate AI features based on detected intent
 """
 from celery import shared_task
+from django.conf import settings
 from core import ResponseFormatter, ResponseCode
+from core.claim_check import check_in, claim, ClaimCheckError
+from core.cancellation import is_cancelled, CANCELED
 import logging
 import time
 
@@ -27,7 +30,7 @@ def merge_parameters(extracted_params: dict, user_params: dict) -> dict:
     return merged
 
 
-def poll_for_completion(service, task_id: str, max_attempts: int = 30, delay: int = 3) -> dict:
+def poll_for_completion(service, task_id: str, max_attempts: int = 30, delay: int = 3, cancel_id: str = None) -> dict:
     """
     Generic polling function for async Freepik API tasks
     
@@ -36,6 +39,7 @@ def poll_for_completion(service, task_id: str, max_attempts: int = 30, delay: in
         task_id: Task UUID to poll
         max_attempts: Maximum polling attempts (default 30 = 90s)
         delay: Seconds between polls (default 3s)
+        cancel_id: Job whose cancel flag stops polling (core/cancellation.py)
         
     Returns:
         dict with status and uploaded_urls
@@ -45,6 +49,11 @@ def poll_for_completion(service, task_id: str, max_attempts: int = 30, delay: in
     for attempt in range(max_attempts):
         time.sleep(delay)
         
+        # Checked before each poll: a completed poll uploads the result
+        if is_cancelled(cancel_id):
+            logger.warning(f"[Polling] Job {cancel_id} canceled, stopped polling task {task_id}")
+            return {'status': CANCELED, 'uploaded_urls': []}
+        
         status_result = service.poll_task_status(task_id)
         status = status_result.get('status')
         logger.warning(f"[Polling] Attempt {attempt+1}/{max_attempts}: status={status}")
@@ -61,18 +70,98 @@ def poll_for_completion(service, task_id: str, max_attempts: int = 30, delay: in
     return {'status': 'TIMEOUT', 'uploaded_urls': []}
 
 
-@shared_task(name="intent_router.route_to_ai_feature_task", bind=True)
+# Result only feeds finalize_conversation_task: not stored in the result backend
+@shared_task(name="intent_router.route_to_ai_feature_task", bind=True, ignore_result=True)
 def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
     """
     Route to appropriate AI feature based on intent with full parameter support
     
     Args:
-        refined_prompt_result: Raw dict from prompt service with:
+        refined_prompt_result: Raw dict from prompt service (or its claim-check reference) with:
             { prompt: str, intent: str, metadata: dict, context: dict }
             
     Returns:
-        Tuple of (wrapped_refined_prompt, feature_result_dict)
+        Tuple of (wrapped_refined_prompt, feature_result_dict), by reference if large
+    """
+    try:
+        refined_prompt_result = claim(refined_prompt_result)
+    except ClaimCheckError as e:
+        logger.error(f"[IntentRouter] {e}")
+        return ResponseFormatter.error(message=str(e)), ResponseFormatter.error(message="Request expired before processing")
+    if refined_prompt_result.get('code') == ResponseCode.ERROR:
+        # process_prompt_task could not run (e.g. its payload expired)
+        return refined_prompt_result, ResponseFormatter.error(message=refined_prompt_result.get('message'))
+
+    operations = refined_prompt_result.get('operations') or []
+    if len(operations) > 1:
+        # Multi-step request: finalize_conversation_task starts the pipeline for its message
+        logger.info(f"[IntentRouter] Multi-step request: {[step['intent'] for step in operations]}")
+        return check_in((
+            ResponseFormatter.success(result=refined_prompt_result),
+            ResponseFormatter.success(result={'operations': operations}),
+        ))
+    return check_in(_route_to_ai_feature(self, refined_prompt_result))
+
+
+@shared_task(name="intent_router.run_pipeline_step_task", bind=True, ignore_result=True)
+def run_pipeline_step_task(self, parent_output, step: dict, pipeline: dict) -> dict:
     """
+    One step of a multi-step pipeline (see apps/intent_router/pipeline.py)
+    
+    Args:
+        parent_output: Output of the step this one edits, None for root steps
+        step: {"id", "intent", "prompt", "params", "input"}
+        pipeline: Shared pipeline state (session, message ids, context)
+        
+    Returns:
+        {"step_id", "status", "uploaded_urls"} for the dependent steps
+    """
+    from .pipeline import run_step
+    return run_step(self, parent_output, step, pipeline)
+
+
+@shared_task(name="intent_router.refine_batch_prompt_task", ignore_result=True)
+def refine_batch_prompt_task(batch_id: str):
+    """Refine a batch's shared prompt once, before its items run (see apps/intent_router/batch.py)"""
+    from .batch import refine_batch_prompt
+    refine_batch_prompt(batch_id)
+
+
+# Chord header: the result is stored so the chord knows when every lane is done
+@shared_task(name="intent_router.run_batch_item_task", bind=True)
+def run_batch_item_task(self, batch_id: str, index: int) -> dict:
+    """
+    One item of a batch request
+    
+    Returns:
+        {"index", "status"}; the full result is in the batch state
+    """
+    from .batch import run_item
+    return run_item(self, batch_id, index)
+
+
+@shared_task(name="intent_router.finish_batch_task", ignore_result=True)
+def finish_batch_task(batch_id: str):
+    """Chord callback: settle the batch's tokens and mark it finished"""
+    from .batch import finish_batch
+    finish_batch(batch_id)
+
+
+@shared_task(name="intent_router.dispatch_scheduled_jobs_task", ignore_result=True)
+def dispatch_scheduled_jobs_task():
+    """Dispatch waiting jobs whose slots were freed by expired leases (Celery beat, see core/scheduler.py)"""
+    from core.scheduler import dispatch
+    dispatch()
+
+
+@shared_task(name="intent_router.watch_feature_job_task", ignore_result=True)
+def watch_feature_job_task(task_id, probe, started_at):
+    """Release a direct feature's job permit once its provider task is done (see core/job_limiter.py)"""
+    from core.job_limiter import watch_feature_job
+    watch_feature_job(task_id, probe, started_at)
+
+
+def _route_to_ai_feature(task, refined_prompt_result: dict) -> tuple:
     import time
     from core.token_client import token_client
     from core.exceptions import TokenServiceError
@@ -82,7 +171,7 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
     
     try:
         logger.warning("="*80)
-        logger.warning(f"[IntentRouter] TASK CALLED! Task ID: {self.request.id}")
+        logger.warning(f"[IntentRouter] TASK CALLED! Task ID: {task.request.id}")
         logger.warning(f"[IntentRouter] Input type: {type(refined_prompt_result)}")
         logger.warning(f"[IntentRouter] Input keys: {refined_prompt_result.keys() if isinstance(refined_prompt_result, dict) else 'NOT A DICT'}")
         logger.warning(f"[IntentRouter] Full input: {refined_prompt_result}")
@@ -111,7 +200,8 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
     user_feature_params = context.get('feature_params', {})  # From user (explicit)
     feature_params = merge_parameters(extracted_params, user_feature_params)
     
-    user_id = context.get('session_id', 'system')  # Use session_id as user_id
+    # Use session_id as user_id; batch items carry the real user_id
+    user_id = context.get('user_id') or context.get('session_id', 'system')
     
     logger.warning(f"[IntentRouter] ✓ Extracted - Intent: {intent} | Prompt: {prompt[:50]}...")
     if extracted_params:
@@ -124,6 +214,12 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
     if reference_image:
         logger.warning(f"[IntentRouter] ✓ Reference image: {reference_image[:100]}...")
     
+    # Chat jobs carry their message_id: cancelled while queued, nothing is submitted or charged
+    cancel_id = context.get('job_id')
+    if is_cancelled(cancel_id):
+        logger.warning(f"[IntentRouter] Job {cancel_id} canceled before routing")
+        return wrapped_refined_prompt, ResponseFormatter.error(message="Canceled", result={'status': CANCELED})
+    
     try:
         # Route based on intent
         if intent == 'image_generation':
@@ -133,7 +229,9 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
             result = service.generate_image(
                 prompt=prompt,
                 user_id=user_id,
-                aspect_ratio=feature_params.get('aspect_ratio', 'square_1_1')
+                aspect_ratio=feature_params.get('aspect_ratio', 'square_1_1'),
+                # Admitted under load (core/admission.py): cheaper, faster output
+                resolution=settings.ADMISSION_DEGRADED_RESOLUTION if context.get('degraded') else '2k'
             )
             
             logger.warning(f"[IntentRouter] Generation result: task_id={result.get('task_id')}, status={result.get('status')}")
@@ -141,14 +239,14 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
             # Poll if task_id exists and no URLs yet
             uploaded_urls = result.get('uploaded_urls', [])
             if not uploaded_urls and result.get('task_id'):
-                poll_result = poll_for_completion(service, result['task_id'])
+                poll_result = poll_for_completion(service, result['task_id'], cancel_id=cancel_id)
                 uploaded_urls = poll_result.get('uploaded_urls', [])
                 
-                # Save to gallery after polling completes
-                if uploaded_urls:
+                # Save to gallery after polling completes (persistence queue), unless canceled meanwhile
+                if uploaded_urls and not is_cancelled(cancel_id):
                     try:
-                        from apps.image_gallery.services import image_gallery_service
-                        image_gallery_service.save_multiple_images(
+                        from apps.image_gallery.celery_tasks import save_images_task
+                        save_images_task.delay(
                             user_id=user_id,
                             image_urls=uploaded_urls,
                             refined_prompt=prompt,
@@ -158,9 +256,9 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
                                 'aspect_ratio': result.get('aspect_ratio', 'square_1_1')
                             }
                         )
-                        logger.info(f"[IntentRouter] Saved {len(uploaded_urls)} images to gallery")
+                        logger.info(f"[IntentRouter] Queued {len(uploaded_urls)} images for gallery save")
                     except Exception as e:
-                        logger.error(f"[IntentRouter] Failed to save to gallery: {e}")
+                        logger.error(f"[IntentRouter] Failed to queue gallery save: {e}")
             
             if not uploaded_urls:
                 logger.error("[IntentRouter] Image generation failed - no URLs")
@@ -196,7 +294,7 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
             uploaded_urls = result.get('uploaded_urls', [])
             # Only poll if task is NOT already completed
             if not uploaded_urls and result.get('task_id') and result.get('status') != 'COMPLETED':
-                poll_result = poll_for_completion(service, result['task_id'])
+                poll_result = poll_for_completion(service, result['task_id'], cancel_id=cancel_id)
                 uploaded_urls = poll_result.get('uploaded_urls', [])
             
             if not uploaded_urls:
@@ -266,7 +364,7 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
             uploaded_urls = result.get('uploaded_urls', [])
             # Only poll if task is NOT already completed (avoid 404 on synchronous completion)
             if not uploaded_urls and result.get('task_id') and result.get('status') != 'COMPLETED':
-                poll_result = poll_for_completion(service, result['task_id'])
+                poll_result = poll_for_completion(service, result['task_id'], cancel_id=cancel_id)
                 uploaded_urls = poll_result.get('uploaded_urls', [])
             
             if not uploaded_urls:
@@ -305,7 +403,7 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
             uploaded_urls = result.get('uploaded_urls', [])
             # Only poll if task is NOT already completed
             if not uploaded_urls and result.get('task_id') and result.get('status') != 'COMPLETED':
-                poll_result = poll_for_completion(service, result['task_id'])
+                poll_result = poll_for_completion(service, result['task_id'], cancel_id=cancel_id)
                 uploaded_urls = poll_result.get('uploaded_urls', [])
             
             if not uploaded_urls:
@@ -350,7 +448,7 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
             uploaded_urls = result.get('uploaded_urls', [])
             # Only poll if task is NOT already completed
             if not uploaded_urls and result.get('task_id') and result.get('status') != 'COMPLETED':
-                poll_result = poll_for_completion(service, result['task_id'])
+                poll_result = poll_for_completion(service, result['task_id'], cancel_id=cancel_id)
                 uploaded_urls = poll_result.get('uploaded_urls', [])
             
             if not uploaded_urls:
@@ -391,7 +489,7 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
             uploaded_urls = result.get('uploaded_urls', [])
             # Only poll if task is NOT already completed
             if not uploaded_urls and result.get('task_id') and result.get('status') != 'COMPLETED':
-                poll_result = poll_for_completion(service, result['task_id'])
+                poll_result = poll_for_completion(service, result['task_id'], cancel_id=cancel_id)
                 uploaded_urls = poll_result.get('uploaded_urls', [])
             
             if not uploaded_urls:
@@ -459,6 +557,8 @@ def route_to_ai_feature_task(self, refined_prompt_result: dict) -> tuple:
                         logger.warning(f"[IntentRouter] No user_id in conversation {session_id}")
                 else:
                     logger.warning(f"[IntentRouter] Conversation {session_id} not found")
+            elif context.get('batch_id'):
+                pass  # Batches are charged once for all items (see batch.py)
             else:
                 logger.warning("[IntentRouter] No session_id in context, skipping token deduction")
         except TokenServiceError as e:
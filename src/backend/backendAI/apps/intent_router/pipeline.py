@@ -0,0 +1,250 @@
+"""
+Multi-step edit pipelines
+
+"Generate a cat, then upscale it and remove the background" arrives from the
+prompt service as `operations`: steps that each name the step whose output
+image they edit (`input`), or "context" / None. The steps form a tree, run
+as a Celery canvas: every step is chained to the step it depends on, and
+siblings (e.g. two style variants of the same image) run as a group. A step
+therefore starts as soon as its input image exists, and independent branches
+run in parallel on the submit queue.
+
+Every step has its own system message. The messages are created up front as
+PROCESSING and each step completes its own, so intermediate results stream
+into the conversation (SSE / delta sync) as they finish. The request's
+placeholder message completes with the outputs of the final steps once the
+last step is done.
+"""
+
+import logging
+import uuid
+
+from celery import group
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core import ResponseCode, ResponseFormatter
+from core.scheduler import release
+from core.job_limiter import release_job
+from core.cancellation import CANCELED, is_cancelled
+
+logger = logging.getLogger(__name__)
+
+# Context keys a step may read (job_id: the request's cancel flag); the user's explicit
+# feature_params only apply to single-step requests
+STEP_CONTEXT_KEYS = ("session_id", "images", "image_url", "reference_image", "job_id")
+
+
+def _remaining_key(pipeline_id):
+    return f"pipeline:{pipeline_id}:remaining"
+
+
+def _step_signature(step, pipeline, children_of):
+    from .celery_tasks import run_pipeline_step_task
+
+    # Roots get parent_output=None; chained steps receive their parent's output
+    if step["input"] in (None, "context"):
+        signature = run_pipeline_step_task.s(None, step=step, pipeline=pipeline)
+    else:
+        signature = run_pipeline_step_task.s(step=step, pipeline=pipeline)
+
+    children = [_step_signature(child, pipeline, children_of) for child in children_of.get(step["id"], [])]
+    if not children:
+        return signature
+    return signature | (children[0] if len(children) == 1 else group(children))
+
+
+def build_canvas(operations, pipeline):
+    """Celery canvas running `operations` as a dependency tree."""
+    children_of = {}
+    for step in operations:
+        if step["input"] not in (None, "context"):
+            children_of.setdefault(step["input"], []).append(step)
+
+    roots = [_step_signature(step, pipeline, children_of) for step in operations if step["input"] in (None, "context")]
+    return roots[0] if len(roots) == 1 else group(roots)
+
+
+def start_pipeline(session_id, message_id, refined, operations):
+    """
+    Create the step messages and dispatch the pipeline for placeholder `message_id`
+
+    Args:
+        refined: Prompt service result (prompt, intent, metadata, context)
+        operations: Validated steps (see prompt_service.services.normalize_operations)
+
+    Returns:
+        {"pipeline_id": "...", "steps": [{"step_id", "intent", "input", "message_id"}]}
+    """
+    from apps.conversation.service import add_messages, update_message_by_message_id
+
+    pipeline_id = uuid.uuid4().hex
+    step_messages = {step["id"]: str(uuid.uuid4()) for step in operations}
+    parents = {step["input"] for step in operations}
+    context = refined.get("context", {})
+
+    now = timezone.now()
+    add_messages(session_id, [
+        {
+            "message_id": step_messages[step["id"]],
+            "role": "system",
+            "status": "PROCESSING",
+            "created_at": now,
+            "pipeline_id": pipeline_id,
+            "step_id": step["id"],
+        }
+        for step in operations
+    ])
+
+    plan = {
+        "pipeline_id": pipeline_id,
+        "steps": [
+            {"step_id": step["id"], "intent": step["intent"], "input": step["input"], "message_id": step_messages[step["id"]]}
+            for step in operations
+        ],
+    }
+    # Placeholder stays PROCESSING until the last step finishes
+    update_message_by_message_id(session_id, message_id, {
+        "status": "PROCESSING",
+        "refined_prompt": {
+            "prompt": refined.get("prompt", ""),
+            "intent": refined.get("intent", ""),
+            "metadata": refined.get("metadata", {}),
+        },
+        "pipeline": plan,
+    })
+
+    pipeline = {
+        "pipeline_id": pipeline_id,
+        "session_id": session_id,
+        "message_id": message_id,
+        "step_messages": step_messages,
+        "leaves": [step["id"] for step in operations if step["id"] not in parents],
+        "metadata": refined.get("metadata", {}),
+        "context": {key: context[key] for key in STEP_CONTEXT_KEYS if key in context},
+    }
+    cache.set(_remaining_key(pipeline_id), len(operations), settings.PIPELINE_STATE_TTL_SECONDS)
+    build_canvas(operations, pipeline).apply_async()
+
+    logger.info(f"[Pipeline] {pipeline_id}: {len(operations)} steps for session {session_id}")
+    return plan
+
+
+def run_step(task, parent_output, step, pipeline):
+    """Run one step, complete its message and hand its output to the dependent steps.
+
+    Never raises: a failing step is recorded as FAILED and still counted, so
+    its dependents skip and the placeholder message is completed.
+    """
+    uploaded_urls = []
+    completed = False
+    try:
+        uploaded_urls, completed = _run_step(task, parent_output, step, pipeline)
+    except Exception as e:
+        logger.error(f"[Pipeline] {pipeline['pipeline_id']}: step {step['id']} failed: {str(e)}", exc_info=True)
+        _fail_step_message(pipeline, step)
+    finally:
+        _step_done(pipeline)
+    return {"step_id": step["id"], "status": "COMPLETED" if completed else "FAILED", "uploaded_urls": uploaded_urls}
+
+
+def _run_step(task, parent_output, step, pipeline):
+    from apps.conversation.celery_tasks import finalize_conversation_task
+    from .celery_tasks import _route_to_ai_feature
+
+    if is_cancelled(pipeline["message_id"]):
+        result_tuple = (
+            ResponseFormatter.success(result={}),
+            ResponseFormatter.error(message="Canceled", result={"status": CANCELED}),
+        )
+    elif parent_output is not None and parent_output.get("status") != "COMPLETED":
+        result_tuple = (
+            ResponseFormatter.success(result={}),
+            ResponseFormatter.error(message=f"Skipped: step {step['input']} did not produce an image"),
+        )
+    else:
+        context = dict(pipeline["context"])
+        if parent_output is not None:
+            urls = parent_output["uploaded_urls"]
+            context["image_url"] = urls[0]
+            context["images"] = urls[:1] + (context.get("images") or [])[1:]
+        result_tuple = _route_to_ai_feature(task, {
+            "prompt": step["prompt"],
+            "intent": step["intent"],
+            "extracted_params": step["params"],
+            "metadata": pipeline["metadata"],
+            "context": context,
+        })
+
+    # Same persistence as a single-step request, on this step's own message
+    finalize_conversation_task(
+        result_tuple,
+        session_id=pipeline["session_id"],
+        message_id=pipeline["step_messages"][step["id"]],
+    )
+
+    feature_result = result_tuple[1]
+    uploaded_urls = (feature_result.get("result") or {}).get("uploaded_urls") or []
+    completed = feature_result.get("code") != ResponseCode.ERROR and bool(uploaded_urls)
+    return uploaded_urls, completed
+
+
+def _fail_step_message(pipeline, step):
+    """Mark a step's message FAILED after an unexpected error. Never raises."""
+    from apps.conversation.service import NOT_CANCELED, update_message_by_message_id
+
+    error_message = "Processing error"
+    try:
+        update_message_by_message_id(pipeline["session_id"], pipeline["step_messages"][step["id"]], {
+            "status": "FAILED",
+            "content": error_message,
+            "error": {"message": error_message, "refined_code": None, "image_code": ResponseCode.ERROR},
+        }, where=NOT_CANCELED)
+    except Exception as e:
+        logger.error(f"[Pipeline] {pipeline['pipeline_id']}: failed to mark step {step['id']} FAILED: {str(e)}")
+
+
+def _step_done(pipeline):
+    """Count a finished step; the last one completes the placeholder message."""
+    from apps.conversation.message_schema import expand_message
+    from apps.conversation.service import NOT_CANCELED, get_messages_by_ids, update_message_by_message_id
+
+    try:
+        remaining = cache.decr(_remaining_key(pipeline["pipeline_id"]))
+    except ValueError:
+        logger.warning(f"[Pipeline] {pipeline['pipeline_id']}: state expired, placeholder left as is")
+        return
+    if remaining > 0:
+        return
+
+    session_id = pipeline["session_id"]
+    if is_cancelled(pipeline["message_id"]):
+        # cancel_message already marked the placeholder CANCELED
+        cache.delete(_remaining_key(pipeline["pipeline_id"]))
+        release(pipeline["message_id"])
+        release_job(pipeline["message_id"])
+        logger.info(f"[Pipeline] {pipeline['pipeline_id']} canceled")
+        return
+
+    leaf_messages = get_messages_by_ids(session_id, [pipeline["step_messages"][step_id] for step_id in pipeline["leaves"]])
+    urls = [url for message in leaf_messages for url in (expand_message(message).get("uploaded_urls") or [])]
+
+    if urls:
+        update_message_by_message_id(session_id, pipeline["message_id"], {
+            "status": "COMPLETED",
+            "image": {"image_url": urls[0], "metadata": {"pipeline_id": pipeline["pipeline_id"]}},
+            "image_url": urls[0],
+            "uploaded_urls": urls,
+        }, where=NOT_CANCELED)
+    else:
+        error_message = "All pipeline steps failed."
+        update_message_by_message_id(session_id, pipeline["message_id"], {
+            "status": "FAILED",
+            "content": error_message,
+            "error": {"message": error_message, "refined_code": None, "image_code": ResponseCode.ERROR},
+        }, where=NOT_CANCELED)
+    cache.delete(_remaining_key(pipeline["pipeline_id"]))
+    release(pipeline["message_id"])
+    release_job(pipeline["message_id"])
+    logger.info(f"[Pipeline] {pipeline['pipeline_id']} finished with {len(urls)} output image(s)")
@@ -1,7 +1,24 @@
+import logging
+
 from celery import shared_task
+from core import ResponseFormatter
+from core.cancellation import is_cancelled
+from core.claim_check import check_in, claim, ClaimCheckError
 from .services import refine_prompt
 
+logger = logging.getLogger(__name__)
+
 
-@shared_task(name="prompt_service.process_prompt_task")
+# Result only feeds the next chain task: not stored in the result backend
+@shared_task(name="prompt_service.process_prompt_task", ignore_result=True)
 def process_prompt_task(payload: dict) -> dict:
-    return refine_prompt(payload)
+    try:
+        payload = claim(payload)
+    except ClaimCheckError as e:
+        # Error-shaped result: route_to_ai_feature_task passes it on and finalize marks the message FAILED
+        logger.error(f"[PromptService] {e}")
+        return ResponseFormatter.error(message="Request expired before processing")
+    if is_cancelled((payload.get("context") or {}).get("job_id")):
+        # Canceled while queued: finalize sees the flag and keeps the message CANCELED
+        return ResponseFormatter.error(message="Canceled")
+    return check_in(refine_prompt(payload))
@@ -0,0 +1,234 @@
+"""
+Local fast path for obvious edit intents
+
+"xóa nền", "upscale ảnh này", "mở rộng ảnh sang trái" need neither prompt
+refinement nor a Gemini round trip: intent and parameters are in the words.
+`classify_intent` resolves them locally and returns None whenever it is not
+sure, in which case the caller falls back to Gemini.
+
+Two signals must agree:
+    1. a keyword rule (matched on accent-stripped text, so "xoa nen" counts)
+       proposes an intent;
+    2. a nearest-centroid model over character n-grams (the rec_prompt
+       HashingVectorizer) ranks that intent first with at least
+       FAST_INTENT_MIN_SCORE cosine similarity and FAST_INTENT_MIN_MARGIN over
+       the runner-up, where the runner-up may be "other".
+Long or compound prompts ("... rồi ...", "... and ...") always go to Gemini.
+
+Measure agreement with Gemini before changing rules or thresholds:
+    python manage.py evaluate_intent_classifier --limit 500
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+import numpy as np
+from django.conf import settings
+from sklearn.preprocessing import normalize
+
+from apps.rec_prompt.services import canon_text, make_char_vectorizer
+
+N_FEATURES = 2 ** 16
+
+# English prompt sent to the feature for each fast-path intent
+CANONICAL_PROMPTS = {
+    "upscale": "Upscale this image with enhanced details",
+    "remove_background": "Remove the background and keep the main subject",
+    "image_expand": "Expand the image borders with matching content",
+}
+
+# Keyword rules, accent-stripped and lower-case
+KEYWORDS = {
+    "remove_background": [
+        "xoa nen", "tach nen", "bo nen", "xoa phong nen", "xoa background", "xoa bg",
+        "tach background", "remove background", "remove bg", "background removal",
+        "delete background", "nen trong suot", "transparent background",
+    ],
+    "upscale": [
+        "upscale", "lam net", "lam ro", "tang do phan giai", "tang chat luong",
+        "nang cap anh", "nang do phan giai", "lam sac net", "enhance resolution",
+        "increase resolution", "higher resolution", "sharpen",
+    ],
+    "image_expand": [
+        "mo rong anh", "mo rong khung", "mo rong bien", "keo dan anh", "expand",
+        "outpaint", "extend the image", "extend image",
+    ],
+}
+
+# Labelled examples per class for the n-gram centroids; "other" holds prompts
+# that must stay with Gemini (generation, creative edits, chit-chat).
+SEED_EXAMPLES = {
+    "remove_background": [
+        "xóa nền", "xoá nền ảnh này", "tách nền ảnh", "bỏ nền đi", "xóa background",
+        "xoa nen anh nay", "remove background", "remove the background please",
+        "tách nền cho tấm ảnh", "làm nền trong suốt",
+    ],
+    "upscale": [
+        "upscale ảnh này", "làm nét ảnh", "làm rõ ảnh này", "tăng độ phân giải",
+        "tăng chất lượng ảnh", "upscale", "upscale this photo", "nâng cấp ảnh lên 4k",
+        "lam ro anh", "làm sắc nét bức tranh",
+    ],
+    "image_expand": [
+        "mở rộng ảnh sang trái", "mở rộng ảnh sang 2 bên", "expand ảnh về mọi phía",
+        "mở rộng khung ảnh", "expand the image to the right", "mo rong anh len tren",
+        "mở rộng ảnh xuống dưới", "kéo dãn ảnh sang phải",
+    ],
+    "other": [
+        "tạo ảnh một con mèo", "vẽ một bức tranh hoàng hôn", "tạo ảnh con rồng bay",
+        "biến thành tranh vẽ nước", "chuyển sang phong cách anime", "thêm ánh sáng dramatic",
+        "áp dụng style từ ảnh tham khảo", "xin chào", "bạn là ai", "generate a cat",
+        "make it look like an oil painting", "tạo ảnh phong cảnh núi tuyết",
+        "làm ảnh sáng hơn", "đổi màu nền thành xanh", "thay nền bằng bãi biển",
+    ],
+}
+
+# Words that signal several operations in one prompt (accent-stripped)
+COMPOUND_MARKERS = {"roi", "sau", "then", "and", "va", "voi", "cung", "them", "nhung", "but"}
+
+# Swapping the background is a generation task, not a removal
+NEGATIVE_PATTERNS = ["thay nen", "doi nen", "doi mau nen", "nen moi", "replace background", "change background"]
+
+EXPAND_DIRECTIONS = [
+    (["moi phia", "4 phia", "bon phia", "tat ca", "all sides", "every side", "all directions"], ("left", "right", "top", "bottom")),
+    (["2 ben", "hai ben", "both sides"], ("left", "right")),
+    (["trai", "left"], ("left",)),
+    (["phai", "right"], ("right",)),
+    (["tren", "top", "up"], ("top",)),
+    (["duoi", "bottom", "down"], ("bottom",)),
+]
+EXPAND_PIXELS = 512
+
+# (accent-stripped phrases, accented phrases, flavor). Words whose stripped
+# form is a common word ("tối"/"tôi" -> "toi", "vẽ"/"về" -> "ve") only match accented.
+UPSCALE_FLAVORS = [
+    (["nhieu", "noise", "noisy", "grain", "dark", "low light"], ["tối", "thiếu sáng"], "photo_denoiser"),
+    (["tranh", "artwork", "illustration", "painting", "drawing"], ["vẽ"], "sublime"),
+    (["anh chup", "photo", "photograph"], [], "photo"),
+]
+
+
+def strip_accents(text: str) -> str:
+    text = unicodedata.normalize("NFD", text.replace("đ", "d").replace("Đ", "D"))
+    return "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+
+
+def _plain(text: str) -> str:
+    """Lower-case, accent-stripped, punctuation-free, single-spaced."""
+    return " ".join(re.sub(r"[^\w\s]", " ", strip_accents(text.lower())).split())
+
+
+def _words(text: str) -> str:
+    """Lower-case, punctuation-free, single-spaced; accents kept (NFC)."""
+    return " ".join(re.sub(r"[^\w\s]", " ", unicodedata.normalize("NFC", text.lower())).split())
+
+
+def _contains(plain: str, phrases) -> bool:
+    padded = f" {plain} "
+    return any(f" {phrase} " in padded for phrase in phrases)
+
+
+class IntentClassifier:
+    """Keyword rules confirmed by a char n-gram nearest-centroid model."""
+
+    def __init__(self, examples=None):
+        self.hv = make_char_vectorizer(N_FEATURES)
+        examples = examples or SEED_EXAMPLES
+        self.labels = list(examples)
+        centroids = [
+            np.asarray(normalize(self._vectorize(texts)).mean(axis=0)).ravel()
+            for texts in examples.values()
+        ]
+        self.centroids = normalize(np.vstack(centroids))
+
+    def _vectorize(self, texts):
+        # Both spellings, so accented and unaccented prompts share n-grams
+        return self.hv.transform([f"{canon_text(t)} {_plain(t)}" for t in texts])
+
+    def scores(self, prompt: str) -> Dict[str, float]:
+        vector = normalize(self._vectorize([prompt]))
+        similarities = vector @ self.centroids.T
+        return dict(zip(self.labels, np.asarray(similarities).ravel().tolist()))
+
+    def keyword_intent(self, plain: str) -> Optional[str]:
+        if _contains(plain, NEGATIVE_PATTERNS):
+            return None
+        hits = [intent for intent, phrases in KEYWORDS.items() if _contains(plain, phrases)]
+        return hits[0] if len(hits) == 1 else None
+
+    def extract_params(self, intent: str, plain: str, words: str = "") -> Optional[Dict[str, Any]]:
+        """Feature params read from the words (`plain` stripped, `words` accented); None when a required one is missing."""
+        if intent == "image_expand":
+            for phrases, sides in EXPAND_DIRECTIONS:
+                if _contains(plain, phrases):
+                    return {side: EXPAND_PIXELS for side in sides}
+            return None
+        if intent == "upscale":
+            for phrases, accented, flavor in UPSCALE_FLAVORS:
+                if _contains(plain, phrases) or _contains(words, accented):
+                    return {"flavor": flavor}
+        return {}
+
+    def classify(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve an obvious edit intent locally
+
+        Returns:
+            {"intent", "refined_prompt", "extracted_params", "score", "margin"}
+            or None when Gemini should decide.
+        """
+        plain = _plain(prompt or "")
+        words = plain.split()
+        if not words or len(words) > settings.FAST_INTENT_MAX_WORDS or COMPOUND_MARKERS & set(words):
+            return None
+
+        intent = self.keyword_intent(plain)
+        if intent is None:
+            return None
+
+        ranked = sorted(self.scores(prompt).items(), key=lambda item: item[1], reverse=True)
+        (best, score), (_, runner_up) = ranked[0], ranked[1]
+        if best != intent or score < settings.FAST_INTENT_MIN_SCORE or score - runner_up < settings.FAST_INTENT_MIN_MARGIN:
+            return None
+
+        params = self.extract_params(intent, plain, _words(prompt or ""))
+        if params is None:
+            return None
+
+        return {
+            "intent": intent,
+            "refined_prompt": CANONICAL_PROMPTS[intent],
+            "extracted_params": params,
+            "score": round(score, 3),
+            "margin": round(score - runner_up, 3),
+        }
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> IntentClassifier:
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier()
+    return _classifier
+
+
+def classify_intent(prompt: str) -> Optional[Dict[str, Any]]:
+    """Fast-path result for `prompt` (see IntentClassifier.classify), or None; never raises."""
+    if not settings.FAST_INTENT_ENABLED:
+        return None
+    start = time.perf_counter()
+    try:
+        result = get_classifier().classify(prompt)
+    except Exception:
+        return None
+    if result is not None:
+        result["processing_time"] = time.perf_counter() - start
+    return result
+
@@ -0,0 +1,122 @@
+"""
+Measure the local intent classifier against Gemini on logged chat prompts.
+
+Every prompt the classifier resolves is also sent to Gemini; the report shows
+how often they agree per intent, how many prompts the fast path covers and
+the disagreements to fix (rules, seed examples or thresholds). With --all,
+unresolved prompts are sent too, to see which edit prompts the fast path
+misses. Costs one Gemini call per evaluated prompt.
+
+Usage:
+    python manage.py evaluate_intent_classifier --limit 500
+    python manage.py evaluate_intent_classifier --file prompts.txt --all
+"""
+
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.conversation.models import get_messages_collection
+from apps.prompt_service.intent_classifier import get_classifier
+from apps.prompt_service.services import PromptService
+
+
+class Command(BaseCommand):
+    help = "Compare the local intent classifier with Gemini on logged user prompts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500,
+                            help="Most recent distinct user prompts to read from the messages collection")
+        parser.add_argument('--file', default=None,
+                            help="Read prompts from a text file (one per line) instead of MongoDB")
+        parser.add_argument('--all', action='store_true',
+                            help="Also ask Gemini about prompts the classifier leaves to it")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between Gemini calls")
+        parser.add_argument('--show', type=int, default=20,
+                            help="Disagreements to print")
+
+    def handle(self, *args, **options):
+        prompts = self._load_prompts(options['file'], options['limit'])
+        if not prompts:
+            raise CommandError("No prompts to evaluate")
+
+        classifier = get_classifier()
+        resolved, latencies = {}, []
+        for prompt in prompts:
+            start = time.perf_counter()
+            result = classifier.classify(prompt)
+            latencies.append(time.perf_counter() - start)
+            if result:
+                resolved[prompt] = result
+
+        agree, total, missed = Counter(), Counter(), Counter()
+        disagreements, failed = [], 0
+        for prompt in prompts:
+            fast = resolved.get(prompt)
+            if fast is None and not options['all']:
+                continue
+            try:
+                gemini_intent = PromptService.refine_and_detect_intent(prompt)["intent"]
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Gemini failed for {prompt!r}: {e}")
+                continue
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+            if fast is None:
+                missed[gemini_intent] += 1
+                continue
+            total[fast["intent"]] += 1
+            if fast["intent"] == gemini_intent:
+                agree[fast["intent"]] += 1
+            else:
+                disagreements.append((prompt, fast["intent"], gemini_intent, fast["score"], fast["margin"]))
+
+        latencies.sort()
+        self.stdout.write(
+            f"Prompts: {len(prompts)}, resolved locally: {len(resolved)} "
+            f"({100 * len(resolved) / len(prompts):.1f}%), Gemini failures: {failed}"
+        )
+        self.stdout.write(
+            f"Classifier latency: p50 {latencies[len(latencies) // 2] * 1e6:.0f}us, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f}us"
+        )
+        for intent in sorted(total):
+            self.stdout.write(f"  {intent:<20} agreement {agree[intent]}/{total[intent]} "
+                              f"({100 * agree[intent] / total[intent]:.1f}%)")
+        if total:
+            overall = sum(agree.values()) / sum(total.values())
+            style = self.style.SUCCESS if overall >= 0.98 else self.style.WARNING
+            self.stdout.write(style(f"Overall agreement: {100 * overall:.1f}%"))
+        if missed:
+            self.stdout.write("Left to Gemini, by Gemini intent: " + ", ".join(
+                f"{intent} {count}" for intent, count in missed.most_common()
+            ))
+        for prompt, fast_intent, gemini_intent, score, margin in disagreements[:options['show']]:
+            self.stdout.write(f"  {prompt!r}: local {fast_intent} (score {score}, margin {margin}), Gemini {gemini_intent}")
+
+    def _load_prompts(self, path, limit):
+        if path:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    lines = [line.strip() for line in f]
+            except OSError as e:
+                raise CommandError(str(e))
+            return list(dict.fromkeys(line for line in lines if line))
+
+        # User prompts, newest first; v2 documents keep the text in "txt", v1 in "prompt"
+        cursor = get_messages_collection().find(
+            {"role": "user", "deleted": {"$ne": True}},
+            {"txt": 1, "prompt": 1},
+        ).sort("created_at", -1)
+        prompts = {}
+        for doc in cursor:
+            text = (doc.get("txt") or doc.get("prompt") or "").strip()
+            if text:
+                prompts[text] = None
+            if len(prompts) >= limit:
+                break
+        return list(prompts)
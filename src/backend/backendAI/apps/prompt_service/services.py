@@ -1,7 +1,10 @@
 import os
 from typing import Dict, Any, List, Optional
+from django.conf import settings
 from core import ResponseFormatter
+from .intent_classifier import classify_intent
 from google import genai
+import itertools
 import time
 import json
 import logging
@@ -24,19 +27,23 @@ if not GEMINI_API_KEYS:
 else:
     logger.info(f"[PromptService] Loaded {len(GEMINI_API_KEYS)} Gemini API keys")
 
-# Track current key index (rotates through keys)
-_current_key_index = 0
+# Round-robin over keys. next() on itertools.count is atomic, so concurrent
+# threads/greenlets never read the same index and skip the increment.
+_key_counter = itertools.count()
+# One client per key, reused across calls (keeps its HTTP connection pool)
+_clients = {}
 
 def get_next_gemini_client():
     """
     Get next Gemini client with rotating API key
     Rotates through API keys to avoid rate limits
     """
-    global _current_key_index
-    api_key = GEMINI_API_KEYS[_current_key_index]
-    _current_key_index = (_current_key_index + 1) % len(GEMINI_API_KEYS)
-    logger.info(f"[PromptService] Using API key #{_current_key_index + 1}/{len(GEMINI_API_KEYS)}")
-    return genai.Client(api_key=api_key)
+    key_index = next(_key_counter) % len(GEMINI_API_KEYS)
+    client = _clients.get(key_index)
+    if client is None:
+        client = _clients.setdefault(key_index, genai.Client(api_key=GEMINI_API_KEYS[key_index]))
+    logger.info(f"[PromptService] Using API key #{key_index + 1}/{len(GEMINI_API_KEYS)}")
+    return client
 
 def call_gemini_with_retry(model: str, contents: str, max_retries: int = 3) -> str:
     """
@@ -90,6 +97,54 @@ def call_gemini_with_retry(model: str, contents: str, max_retries: int = 3) -> s
 
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
+# Intents a pipeline step may use (everything except "other")
+PIPELINE_INTENTS = {
+    "image_generation", "upscale", "remove_background", "reimagine",
+    "relight", "style_transfer", "image_expand",
+}
+
+
+def normalize_operations(raw_operations) -> List[Dict[str, Any]]:
+    """
+    Validate the "operations" Gemini returned for a multi-step request
+    
+    Returns:
+        [{"id": "s1", "intent": "...", "prompt": "...", "params": {...}, "input": None | "context" | "<step id>"}]
+        or [] when the request is single-step or the steps are not a valid plan
+        (unknown intent, duplicate id, input naming a later/unknown step).
+    """
+    if not isinstance(raw_operations, list):
+        return []
+
+    steps = []
+    seen = set()
+    for index, operation in enumerate(raw_operations[:settings.PIPELINE_MAX_STEPS]):
+        if not isinstance(operation, dict) or operation.get("intent") not in PIPELINE_INTENTS:
+            return []
+        step_id = str(operation.get("id") or f"s{index + 1}")
+        if step_id in seen or step_id == "context":
+            return []
+
+        source = operation.get("input")
+        if operation["intent"] == "image_generation":
+            source = None
+        elif source is None:
+            source = "context"
+        elif source != "context" and source not in seen:
+            return []
+
+        params = operation.get("extracted_params")
+        steps.append({
+            "id": step_id,
+            "intent": operation["intent"],
+            "prompt": str(operation.get("refined_prompt") or ""),
+            "params": params if isinstance(params, dict) else {},
+            "input": source,
+        })
+        seen.add(step_id)
+
+    return steps if len(steps) > 1 else []
+
 
 class PromptService:
     """
@@ -161,6 +216,7 @@ class PromptService:
                 "refined_prompt": str,
                 "intent": str,
                 "extracted_params": dict,  # NEW: Extracted feature parameters
+                "operations": list,        # Pipeline steps of a multi-step request, else []
                 "metadata": dict
             }
         
@@ -224,12 +280,24 @@ class PromptService:
         8. other:
            - No parameters needed, return empty dict
 
+        **Multi-step requests:**
+        If the user asks for SEVERAL operations in one message (e.g. "tạo ảnh con mèo rồi upscale và xóa nền",
+        "làm 2 phiên bản anime và watercolor của ảnh này"), ALSO output "operations": the list of steps in order.
+        Each step: {{"id": "s1", "intent": "...", "refined_prompt": "...", "extracted_params": {{...}}, "input": ...}}
+        - "input" is the id of the EARLIER step whose output image this step edits, "context" for the image already
+          in the conversation, or null for image_generation.
+        - Independent variants of the same image share the same "input" (they run in parallel).
+        - The top-level refined_prompt/intent/extracted_params describe the first step.
+        - For a single operation, DO NOT output "operations".
+        - Example: "tạo ảnh con mèo rồi upscale và xóa nền" → {{"refined_prompt": "A cute cat sitting on a sofa", "intent": "image_generation", "extracted_params": {{}}, "operations": [{{"id": "s1", "intent": "image_generation", "refined_prompt": "A cute cat sitting on a sofa", "extracted_params": {{}}, "input": null}}, {{"id": "s2", "intent": "upscale", "refined_prompt": "Upscale the cat image", "extracted_params": {{"flavor": "photo"}}, "input": "s1"}}, {{"id": "s3", "intent": "remove_background", "refined_prompt": "Remove the background", "extracted_params": {{}}, "input": "s2"}}]}}
+
         **Output Format:**
-        Output JSON ONLY, with exactly this schema:
+        Output JSON ONLY, with exactly this schema ("operations" only for multi-step requests):
         {{
         "refined_prompt": "...",
         "intent": "...",
-        "extracted_params": {{...}}
+        "extracted_params": {{...}},
+        "operations": [...]
         }}
 
         **Examples:**
@@ -284,6 +352,7 @@ class PromptService:
             "refined_prompt": parsed_response.get("refined_prompt", "") or prompt,
             "intent": parsed_response.get("intent", "image_generation"),
             "extracted_params": parsed_response.get("extracted_params", {}),  # NEW: Extract parameters
+            "operations": normalize_operations(parsed_response.get("operations")),
             "metadata": {
                 "model": GEMINI_MODEL,
                 "processing_time": processing_time,
@@ -312,6 +381,23 @@ def refine_prompt(payload: Dict[str, Any]) -> Dict[str, Any]:
         "topic": payload.get("topic"),
     }
     
+    fast = classify_intent(raw_prompt)
+    if fast:
+        # Obvious edit intent: skip the Gemini round trip
+        logger.info(f"[PromptService] Fast path {fast['intent']} (score {fast['score']}): {raw_prompt}")
+        return {
+            "prompt": fast["refined_prompt"],
+            "intent": fast["intent"],
+            "extracted_params": fast["extracted_params"],
+            "operations": [],
+            "metadata": {
+                "model": "local-intent-classifier",
+                "processing_time": fast["processing_time"],
+                "score": fast["score"],
+            },
+            "context": conversation_context,
+        }
+
     result = PromptService.refine_and_detect_intent(raw_prompt, context)
     
     # Return raw dict for Celery chain (no ResponseFormatter wrapper)
@@ -319,6 +405,7 @@ def refine_prompt(payload: Dict[str, Any]) -> Dict[str, Any]:
         "prompt": result["refined_prompt"],  # Legacy key name
         "intent": result["intent"],
         "extracted_params": result.get("extracted_params", {}),  # NEW: Pass through extracted params
+        "operations": result.get("operations", []),
         "metadata": result["metadata"],
         "context": conversation_context,  # Pass through conversation context
     }
@@ -199,3 +199,9 @@ class PromptToVideoService:
             "video_url": None,
             "video_id": str(record.get("video_id")),
         }
+
+
+def provider_status(task_id: str) -> Optional[str]:
+    """Model Studio status of `task_id`, without uploading results (job permit watcher, core/job_limiter.py)"""
+    status, _ = ModelStudioVideoClient().get_task_status(task_id)
+    return status
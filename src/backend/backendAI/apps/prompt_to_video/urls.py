@@ -1,8 +1,11 @@
 from django.urls import path
 
+from core.cancellation import FeatureCancelView
+
 from .views import PromptToVideoStatusView, PromptToVideoView
 
 urlpatterns = [
     path("", PromptToVideoView.as_view(), name="prompt-to-video"),
     path("status/<str:task_id>/", PromptToVideoStatusView.as_view(), name="prompt-to-video-status"),
+    path("cancel/<str:task_id>/", FeatureCancelView.as_view(), name="prompt-to-video-cancel"),
 ]
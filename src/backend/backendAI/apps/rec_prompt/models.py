@@ -1,6 +1,6 @@
 """Mongo collections helpers for prompt recommendations."""
 
-from .mongo_client import get_collection
+from core.mongo import get_collection
 
 
 def get_prompts_collection():
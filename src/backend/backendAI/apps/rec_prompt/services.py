@@ -7,7 +7,7 @@ from typing import Optional
 
 import numpy as np
 from bson.binary import Binary
-from pymongo import ReturnDocument
+from pymongo import ReadPreference, ReturnDocument
 from pymongo.errors import DuplicateKeyError
 from scipy.sparse import csr_matrix, vstack
 from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
@@ -53,9 +53,23 @@ def canon_text(s: str) -> str:
     return " ".join(toks)
 
 
+def make_char_vectorizer(n_features: int = DEFAULT_N_FEATURES) -> HashingVectorizer:
+    """Character n-gram (3-5, word-bounded) term counts; stateless, so no fitting needed."""
+    return HashingVectorizer(
+        analyzer="char_wb",
+        ngram_range=(3, 5),
+        n_features=int(n_features),
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32,
+    )
+
+
 class MongoStore:
     def __init__(self):
         self.prompts = get_prompts_collection()
+        # rec_prompts reads go to secondaries; lookups that decide a write must see the latest one
+        self.prompts_primary = self.prompts.with_options(read_preference=ReadPreference.PRIMARY)
         self.user_profiles = get_user_profiles_collection()
         self.counters = get_counters_collection()
         self._ensure_indexes()
@@ -67,7 +81,7 @@ class MongoStore:
         self.user_profiles.create_index("user_id", unique=True)
 
     def _ensure_counter(self):
-        max_doc = self.prompts.find_one(sort=[("prompt_id", -1)], projection={"prompt_id": 1})
+        max_doc = self.prompts_primary.find_one(sort=[("prompt_id", -1)], projection={"prompt_id": 1})
         max_id = int(max_doc["prompt_id"]) if max_doc else 0
         doc = self.counters.find_one({"_id": COUNTER_KEY})
         if doc is None:
@@ -115,7 +129,7 @@ class MongoStore:
         if not text:
             raise ValueError("Empty prompt")
 
-        existing = self.prompts.find_one({"text": text}, projection={"prompt_id": 1})
+        existing = self.prompts_primary.find_one({"text": text}, projection={"prompt_id": 1})
         if existing:
             return int(existing["prompt_id"]), False
 
@@ -131,7 +145,7 @@ class MongoStore:
             self.prompts.insert_one(doc)
             return prompt_id, True
         except DuplicateKeyError:
-            existing = self.prompts.find_one({"text": text}, projection={"prompt_id": 1})
+            existing = self.prompts_primary.find_one({"text": text}, projection={"prompt_id": 1})
             if existing:
                 return int(existing["prompt_id"]), False
             raise
@@ -223,14 +237,7 @@ class SuggestEngine:
         self.store = store
         self.n_features = int(n_features)
 
-        self.hv = HashingVectorizer(
-            analyzer="char_wb",
-            ngram_range=(3, 5),
-            n_features=self.n_features,
-            alternate_sign=False,
-            norm=None,
-            dtype=np.float32,
-        )
+        self.hv = make_char_vectorizer(self.n_features)
         self.tfidf = TfidfTransformer(norm="l2", use_idf=True, smooth_idf=True)
 
         self.last_id = 0
@@ -4,6 +4,7 @@ Celery Tasks for Image Reimagination
 
 import logging
 from celery import shared_task
+from core.cancellation import is_cancelled, CANCELED
 from .services import ReimagineService, ReimagineError
 
 logger = logging.getLogger(__name__)
@@ -33,6 +34,10 @@ def reimagine_image_task(self, image_url: str, user_id: str, **kwargs):
 @shared_task(bind=True, max_retries=10)
 def poll_reimagine_status_task(self, task_id: str):
     """Poll reimagine task status"""
+    if is_cancelled(task_id):
+        logger.info(f"Task {task_id} canceled, polling stopped")
+        return {"task_id": task_id, "status": CANCELED}
+
     try:
         service = ReimagineService()
         result = service.poll_task_status(task_id)
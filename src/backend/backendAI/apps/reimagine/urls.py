@@ -3,8 +3,10 @@ URL routing for Reimagine feature
 """
 from django.urls import path
 from .views import ReimagineView, ReimagineStatusView
+from core.cancellation import FeatureCancelView
 
 urlpatterns = [
     path('', ReimagineView.as_view(), name='reimagine'),
     path('status/<str:task_id>/', ReimagineStatusView.as_view(), name='reimagine-status'),
+    path('cancel/<str:task_id>/', FeatureCancelView.as_view(), name='reimagine-cancel'),
 ]
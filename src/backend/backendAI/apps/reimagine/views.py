@@ -7,6 +7,8 @@ from core import APIResponse
 from .serializers import ReimagineInputSerializer
 from .services import ReimagineService, ReimagineError
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs, release_job_when_done
+from core.cancellation import cancellable_status
 from core.image_input_handler import ImageInputHandler
 import logging
 
@@ -16,6 +18,7 @@ logger = logging.getLogger(__name__)
 class ReimagineView(APIView):
     """Reimagine image - POST /v1/features/reimagine/"""
     
+    @limit_concurrent_jobs(probe='apps.reimagine.services.provider_status')
     @track_processing_time(feature='reimagine', min_required_tokens=15)
     def post(self, request):
         serializer = ReimagineInputSerializer(data=request.data)
@@ -72,6 +75,8 @@ class ReimagineView(APIView):
 class ReimagineStatusView(APIView):
     """Poll reimagine status - GET /v1/features/reimagine/status/<task_id>/"""
     
+    @release_job_when_done
+    @cancellable_status
     def get(self, request, task_id):
         try:
             service = ReimagineService()
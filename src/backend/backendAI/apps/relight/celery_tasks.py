@@ -4,6 +4,7 @@ Celery Tasks for Image Relighting
 
 import logging
 from celery import shared_task
+from core.cancellation import is_cancelled, CANCELED
 from .services import RelightService, RelightError
 
 logger = logging.getLogger(__name__)
@@ -38,6 +39,10 @@ def relight_image_task(self, image_url: str, prompt: str, user_id: str, **kwargs
 @shared_task(bind=True, max_retries=10)
 def poll_relight_status_task(self, task_id: str):
     """Poll relight task status"""
+    if is_cancelled(task_id):
+        logger.info(f"Task {task_id} canceled, polling stopped")
+        return {"task_id": task_id, "status": CANCELED}
+
     try:
         service = RelightService()
         result = service.poll_task_status(task_id)
@@ -192,3 +192,9 @@ class RelightService:
         except Exception as e:
             logger.error(f"Failed to save to gallery: {str(e)}")
             # Don't fail the request if gallery save fails
+
+
+def provider_status(task_id: str) -> Optional[str]:
+    """Freepik status of `task_id`, without uploading results (job permit watcher, core/job_limiter.py)"""
+    result = freepik_client.get_task_status(task_id, endpoint='image-relight')
+    return result.get('data', result).get('status')
@@ -3,8 +3,10 @@ URL routing for Relight feature
 """
 from django.urls import path
 from .views import RelightView, RelightStatusView
+from core.cancellation import FeatureCancelView
 
 urlpatterns = [
     path('', RelightView.as_view(), name='relight'),
     path('status/<str:task_id>/', RelightStatusView.as_view(), name='relight-status'),
+    path('cancel/<str:task_id>/', FeatureCancelView.as_view(), name='relight-cancel'),
 ]
@@ -7,6 +7,8 @@ from core import APIResponse
 from .serializers import RelightInputSerializer
 from .services import RelightService, RelightError
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs, release_job_when_done
+from core.cancellation import cancellable_status
 from core.image_input_handler import ImageInputHandler
 import logging
 
@@ -16,6 +18,7 @@ logger = logging.getLogger(__name__)
 class RelightView(APIView):
     """Relight image - POST /v1/features/relight/"""
     
+    @limit_concurrent_jobs(probe='apps.relight.services.provider_status')
     @track_processing_time(feature='relight', min_required_tokens=8)
     def post(self, request):
         serializer = RelightInputSerializer(data=request.data)
@@ -79,6 +82,8 @@ class RelightView(APIView):
 class RelightStatusView(APIView):
     """Poll relight status - GET /v1/features/relight/status/<task_id>/"""
     
+    @release_job_when_done
+    @cancellable_status
     def get(self, request, task_id):
         try:
             # Get user_id from query params for gallery save
@@ -7,6 +7,7 @@ from core import APIResponse
 from .serializers import RemoveBackgroundInputSerializer
 from .services import RemoveBackgroundService, RemoveBackgroundError
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs
 from core.image_input_handler import ImageInputHandler
 import logging
 
@@ -19,6 +20,7 @@ class RemoveBackgroundView(APIView):
     POST /v1/features/remove-background/
     """
     
+    @limit_concurrent_jobs
     @track_processing_time(feature='remove_background', min_required_tokens=3)
     def post(self, request):
         """
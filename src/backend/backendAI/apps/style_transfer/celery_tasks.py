@@ -4,6 +4,7 @@ Celery Tasks for Style Transfer
 
 import logging
 from celery import shared_task
+from core.cancellation import is_cancelled, CANCELED
 from .services import StyleTransferService, StyleTransferError
 
 logger = logging.getLogger(__name__)
@@ -34,6 +35,10 @@ def style_transfer_task(self, image_url: str, reference_image: str, user_id: str
 @shared_task(bind=True, max_retries=10)
 def poll_style_transfer_status_task(self, task_id: str):
     """Poll style transfer task status"""
+    if is_cancelled(task_id):
+        logger.info(f"Task {task_id} canceled, polling stopped")
+        return {"task_id": task_id, "status": CANCELED}
+
     try:
         service = StyleTransferService()
         result = service.poll_task_status(task_id)
@@ -3,8 +3,10 @@ URL routing for Style Transfer feature
 """
 from django.urls import path
 from .views import StyleTransferView, StyleTransferStatusView
+from core.cancellation import FeatureCancelView
 
 urlpatterns = [
     path('', StyleTransferView.as_view(), name='style-transfer'),
     path('status/<str:task_id>/', StyleTransferStatusView.as_view(), name='style-transfer-status'),
+    path('cancel/<str:task_id>/', FeatureCancelView.as_view(), name='style-transfer-cancel'),
 ]
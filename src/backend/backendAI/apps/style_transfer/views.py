@@ -7,6 +7,8 @@ from core import APIResponse
 from .serializers import StyleTransferInputSerializer
 from .services import StyleTransferService, StyleTransferError
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs, release_job_when_done
+from core.cancellation import cancellable_status
 from core.image_input_handler import ImageInputHandler
 import logging
 
@@ -16,6 +18,7 @@ logger = logging.getLogger(__name__)
 class StyleTransferView(APIView):
     """Style transfer - POST /v1/features/style-transfer/"""
     
+    @limit_concurrent_jobs(probe='apps.style_transfer.services.provider_status')
     @track_processing_time(feature='style_transfer', min_required_tokens=12)
     def post(self, request):
         serializer = StyleTransferInputSerializer(data=request.data)
@@ -77,6 +80,8 @@ class StyleTransferView(APIView):
 class StyleTransferStatusView(APIView):
     """Poll style transfer status - GET /v1/features/style-transfer/status/<task_id>/"""
     
+    @release_job_when_done
+    @cancellable_status
     def get(self, request, task_id):
         try:
             service = StyleTransferService()
@@ -5,6 +5,7 @@ Async processing for upscale workflow
 
 import logging
 from celery import shared_task
+from core.cancellation import is_cancelled, CANCELED
 from .services import UpscaleService, UpscaleError
 
 logger = logging.getLogger(__name__)
@@ -70,6 +71,10 @@ def poll_upscale_status_task(self, task_id: str):
     Returns:
         Task status dict
     """
+    if is_cancelled(task_id):
+        logger.info(f"Task {task_id} canceled, polling stopped")
+        return {"task_id": task_id, "status": CANCELED}
+
     try:
         logger.info(f"Polling upscale status for task {task_id}")
         
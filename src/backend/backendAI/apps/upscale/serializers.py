@@ -1,6 +1,7 @@
 """
 Serializers for Upscale feature
 """
+from django.conf import settings
 from rest_framework import serializers
 from apps.intent_router.constants import UpscaleFlavor
 
@@ -43,3 +44,19 @@ class UpscaleInputSerializer(serializers.Serializer):
                 "Must provide one of: image_data (base64), image_url, or image_file"
             )
         return data
+
+
+class UpscaleBatchSerializer(serializers.Serializer):
+    """Validate input for upscaling several images with the same settings"""
+    image_urls = serializers.ListField(
+        child=serializers.URLField(),
+        min_length=1,
+        max_length=settings.BATCH_MAX_ITEMS,
+        help_text="URLs of the images to upscale"
+    )
+    flavor = serializers.ChoiceField(
+        choices=UpscaleFlavor.all(),
+        required=True,
+        help_text="sublime, photo, or photo_denoiser"
+    )
+    user_id = serializers.CharField(required=True, max_length=255)
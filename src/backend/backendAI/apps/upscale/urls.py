@@ -2,9 +2,13 @@
 URL routing for Upscale feature
 """
 from django.urls import path
-from .views import UpscaleView, UpscaleStatusView
+from .views import UpscaleView, UpscaleStatusView, UpscaleBatchView, UpscaleBatchStatusView
+from core.cancellation import FeatureCancelView
 
 urlpatterns = [
     path('', UpscaleView.as_view(), name='upscale'),
     path('status/<str:task_id>/', UpscaleStatusView.as_view(), name='upscale-status'),
+    path('cancel/<str:task_id>/', FeatureCancelView.as_view(), name='upscale-cancel'),
+    path('batch/', UpscaleBatchView.as_view(), name='upscale-batch'),
+    path('batch/<str:batch_id>/', UpscaleBatchStatusView.as_view(), name='upscale-batch-status'),
 ]
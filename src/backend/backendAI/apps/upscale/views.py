@@ -4,10 +4,14 @@ Direct API endpoints for Upscale
 from rest_framework.views import APIView
 from rest_framework import status
 from core import APIResponse
-from .serializers import UpscaleInputSerializer
+from .serializers import UpscaleInputSerializer, UpscaleBatchSerializer
 from .services import UpscaleService, UpscaleError
 from core.token_decorators import track_processing_time
+from core.job_limiter import limit_concurrent_jobs, release_job_when_done, JobLimitExceeded, job_limit_response
+from core.cancellation import cancellable_status
 from core.image_input_handler import ImageInputHandler
+from apps.intent_router.batch import start_batch, get_batch_status, BatchError
+from core.scheduler import request_tier
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +28,7 @@ class UpscaleView(APIView):
     3. Multipart form-data: files={'image_file': file}
     """
     
+    @limit_concurrent_jobs(probe='apps.upscale.services.provider_status')
     @track_processing_time(feature='upscale', min_required_tokens=5)
     def post(self, request):
         """
@@ -109,6 +114,8 @@ class UpscaleStatusView(APIView):
     GET /v1/features/upscale/status/<task_id>/
     """
     
+    @release_job_when_done
+    @cancellable_status
     def get(self, request, task_id):
         """Get upscale task status"""
         try:
@@ -142,3 +149,58 @@ class UpscaleStatusView(APIView):
                 result={"detail": str(e)},
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class UpscaleBatchView(APIView):
+    """
+    Upscale several images with the same settings
+    POST /v1/features/upscale/batch/
+    
+    Tokens are reserved once for the whole batch (see apps/intent_router/batch.py).
+    """
+    
+    def post(self, request):
+        """
+        Request body:
+        {
+            "image_urls": ["https://...", "https://..."],
+            "flavor": "photo",
+            "user_id": "user123"
+        }
+        """
+        serializer = UpscaleBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return APIResponse.error(message="Validation failed", result=serializer.errors)
+        
+        validated_data = serializer.validated_data
+        try:
+            result = start_batch(
+                user_id=validated_data['user_id'],
+                intent='upscale',
+                inputs=list(validated_data['image_urls']),
+                params={'flavor': validated_data['flavor']},
+                tier=request_tier(request)
+            )
+        except BatchError as e:
+            return APIResponse.error(message=str(e), result=e.detail, status_code=e.status_code)
+        except JobLimitExceeded as e:
+            return job_limit_response(e)
+        
+        return APIResponse.success(
+            result=result,
+            message="Batch started. Use batch_id to poll status.",
+            status_code=status.HTTP_202_ACCEPTED
+        )
+
+
+class UpscaleBatchStatusView(APIView):
+    """
+    Aggregated status of an upscale batch with per-item results
+    GET /v1/features/upscale/batch/<batch_id>/
+    """
+    
+    def get(self, request, batch_id):
+        result = get_batch_status(batch_id, intent='upscale')
+        if result is None:
+            return APIResponse.not_found(message="Batch not found or expired")
+        return APIResponse.success(result=result, message="Batch status retrieved")
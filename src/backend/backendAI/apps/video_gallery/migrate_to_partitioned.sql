@@ -0,0 +1,109 @@
+-- ============================================================================
+-- Migrate video_gallery to a partitioned table (one-off, existing deployments)
+-- PostgreSQL 13+ / Supabase
+-- ============================================================================
+--
+-- Fresh installs should just run schema.sql. Same procedure as
+-- apps/image_gallery/migrate_to_partitioned.sql. The UNIQUE constraint on
+-- task_id cannot exist on a table partitioned by created_at; uniqueness per
+-- task is kept by VideoGalleryService.create_task_record.
+-- Drop video_gallery_legacy once the row counts have been checked.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    from_date DATE := date_trunc('month', month_start)::date;
+    to_date DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    partition_name TEXT := format('%s_y%sm%s', parent, to_char(from_date, 'YYYY'), to_char(from_date, 'MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent, from_date, to_date
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent TEXT, months_back INT DEFAULT 0, months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    offset_months INT;
+BEGIN
+    FOR offset_months IN -months_back..months_ahead LOOP
+        PERFORM create_monthly_partition(
+            parent,
+            (date_trunc('month', CURRENT_DATE) + make_interval(months => offset_months))::date
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+LOCK TABLE video_gallery IN ACCESS EXCLUSIVE MODE;
+ALTER TABLE video_gallery RENAME TO video_gallery_legacy;
+ALTER TABLE video_gallery_legacy RENAME CONSTRAINT video_gallery_pkey TO video_gallery_legacy_pkey;
+ALTER TABLE video_gallery_legacy DROP CONSTRAINT IF EXISTS video_gallery_task_id_key;
+ALTER INDEX IF EXISTS idx_video_gallery_user_created RENAME TO idx_video_gallery_legacy_user_created;
+ALTER INDEX IF EXISTS idx_video_gallery_user_deleted RENAME TO idx_video_gallery_legacy_user_deleted;
+ALTER INDEX IF EXISTS idx_video_gallery_deleted_at RENAME TO idx_video_gallery_legacy_deleted_at;
+ALTER INDEX IF EXISTS idx_video_gallery_task_id RENAME TO idx_video_gallery_legacy_task_id;
+DROP TRIGGER IF EXISTS trigger_update_video_gallery_updated_at ON video_gallery_legacy;
+
+CREATE TABLE video_gallery (
+    video_id UUID NOT NULL,
+    user_id VARCHAR(255) NOT NULL,
+    video_url VARCHAR(1024),
+    prompt TEXT,
+    intent VARCHAR(100),
+    model VARCHAR(100),
+    task_id VARCHAR(255),
+    status VARCHAR(50) DEFAULT 'PROCESSING',
+    metadata JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (video_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+SELECT create_monthly_partition('video_gallery', month_start::date)
+FROM generate_series(
+    date_trunc('month', (SELECT min(created_at) FROM video_gallery_legacy)),
+    date_trunc('month', CURRENT_DATE),
+    INTERVAL '1 month'
+) AS month_start;
+
+SELECT ensure_monthly_partitions('video_gallery', 0, 3);
+
+CREATE TABLE video_gallery_default PARTITION OF video_gallery DEFAULT;
+
+CREATE INDEX idx_video_gallery_user_created ON video_gallery (user_id, created_at DESC);
+CREATE INDEX idx_video_gallery_user_deleted ON video_gallery (user_id, deleted_at);
+CREATE INDEX idx_video_gallery_deleted_at ON video_gallery (deleted_at);
+CREATE INDEX idx_video_gallery_task_id ON video_gallery (task_id);
+
+CREATE OR REPLACE FUNCTION update_video_gallery_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_update_video_gallery_updated_at
+    BEFORE UPDATE ON video_gallery
+    FOR EACH ROW
+    EXECUTE FUNCTION update_video_gallery_updated_at_column();
+
+INSERT INTO video_gallery (
+    video_id, user_id, video_url, prompt, intent, model, task_id, status, metadata,
+    created_at, updated_at, deleted_at
+)
+SELECT video_id, user_id, video_url, prompt, intent, model, task_id, status, COALESCE(metadata, '{}'::jsonb),
+       created_at, updated_at, deleted_at
+FROM video_gallery_legacy;
+
+COMMIT;
+
+-- Verify, then drop the old heap:
+-- SELECT (SELECT count(*) FROM video_gallery) AS new_rows, (SELECT count(*) FROM video_gallery_legacy) AS old_rows;
+-- DROP TABLE video_gallery_legacy;
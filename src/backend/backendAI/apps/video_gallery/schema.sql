@@ -7,9 +7,11 @@
 DROP TABLE IF EXISTS video_gallery CASCADE;
 
 -- Create video_gallery table
+-- Range-partitioned by created_at month, like image_gallery.
+-- Existing deployments: see migrate_to_partitioned.sql
 CREATE TABLE video_gallery (
-    -- Primary Key: UUID assigned before upload
-    video_id UUID PRIMARY KEY,
+    -- UUID assigned before upload
+    video_id UUID NOT NULL,
 
     -- User Information
     user_id VARCHAR(255) NOT NULL,
@@ -19,7 +21,7 @@ CREATE TABLE video_gallery (
     prompt TEXT,
     intent VARCHAR(100),
     model VARCHAR(100),
-    task_id VARCHAR(255) UNIQUE,
+    task_id VARCHAR(255),
     status VARCHAR(50) DEFAULT 'PROCESSING',
 
     -- Metadata (JSON for flexible storage)
@@ -30,8 +32,49 @@ CREATE TABLE video_gallery (
     updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
 
     -- Soft Delete
-    deleted_at TIMESTAMP WITH TIME ZONE
-);
+    deleted_at TIMESTAMP WITH TIME ZONE,
+
+    -- Primary key must include the partition key
+    PRIMARY KEY (video_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- ============================================================================
+-- Monthly Partitions
+-- ============================================================================
+
+-- create_monthly_partition / ensure_monthly_partitions are shared with
+-- image_gallery; CREATE OR REPLACE keeps this file runnable on its own.
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, month_start DATE)
+RETURNS VOID AS $$
+DECLARE
+    from_date DATE := date_trunc('month', month_start)::date;
+    to_date DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    partition_name TEXT := format('%s_y%sm%s', parent, to_char(from_date, 'YYYY'), to_char(from_date, 'MM'));
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent, from_date, to_date
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent TEXT, months_back INT DEFAULT 0, months_ahead INT DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    offset_months INT;
+BEGIN
+    FOR offset_months IN -months_back..months_ahead LOOP
+        PERFORM create_monthly_partition(
+            parent,
+            (date_trunc('month', CURRENT_DATE) + make_interval(months => offset_months))::date
+        );
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_monthly_partitions('video_gallery', 0, 3);
+
+CREATE TABLE video_gallery_default PARTITION OF video_gallery DEFAULT;
 
 -- ============================================================================
 -- Indexes for Performance
@@ -72,13 +115,13 @@ CREATE TRIGGER trigger_update_video_gallery_updated_at
 
 COMMENT ON TABLE video_gallery IS 'Stores user-generated videos with metadata from AI PhotoFun Studio';
 
-COMMENT ON COLUMN video_gallery.video_id IS 'UUID assigned before video upload (primary key)';
+COMMENT ON COLUMN video_gallery.video_id IS 'UUID assigned before video upload (primary key with created_at)';
 COMMENT ON COLUMN video_gallery.user_id IS 'User identifier (references user system)';
 COMMENT ON COLUMN video_gallery.video_url IS 'Uploaded video URL from file service';
 COMMENT ON COLUMN video_gallery.prompt IS 'Prompt used for video generation';
 COMMENT ON COLUMN video_gallery.intent IS 'Generation intent (prompt_to_video, image_to_video)';
 COMMENT ON COLUMN video_gallery.model IS 'Video generation model name';
-COMMENT ON COLUMN video_gallery.task_id IS 'Model Studio task identifier';
+COMMENT ON COLUMN video_gallery.task_id IS 'Model Studio task identifier (unique per task, enforced by the service upsert)';
 COMMENT ON COLUMN video_gallery.status IS 'Task status (PROCESSING, SUCCEEDED, FAILED, etc.)';
 COMMENT ON COLUMN video_gallery.metadata IS 'Flexible JSON storage for extra attributes (duration, input_image_url, raw_video_url, etc.)';
 COMMENT ON COLUMN video_gallery.created_at IS 'Timestamp when video record was created';
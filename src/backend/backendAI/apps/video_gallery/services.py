@@ -84,35 +84,51 @@ class VideoGalleryService:
                 metadata = {}
 
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                # Upsert by task_id. video_gallery is partitioned by created_at, so
+                # task_id cannot carry a UNIQUE constraint for ON CONFLICT; the
+                # transaction lock on the task_id keeps concurrent upserts from both inserting.
+                cursor.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext('video_gallery'), hashtext(%s))",
+                    (task_id,),
+                )
                 query = """
-                    INSERT INTO video_gallery (
-                        video_id, user_id, video_url, prompt, intent, model, task_id, status, metadata
+                    WITH updated AS (
+                        UPDATE video_gallery SET
+                            user_id = %(user_id)s,
+                            prompt = %(prompt)s,
+                            intent = %(intent)s,
+                            model = %(model)s,
+                            status = %(status)s,
+                            metadata = %(metadata)s,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE task_id = %(task_id)s
+                        RETURNING video_id, user_id, video_url, prompt, intent, model, task_id, status, metadata, created_at
+                    ), inserted AS (
+                        INSERT INTO video_gallery (
+                            video_id, user_id, video_url, prompt, intent, model, task_id, status, metadata
+                        )
+                        SELECT %(video_id)s::uuid, %(user_id)s, NULL, %(prompt)s, %(intent)s, %(model)s,
+                               %(task_id)s, %(status)s, %(metadata)s::jsonb
+                        WHERE NOT EXISTS (SELECT 1 FROM updated)
+                        RETURNING video_id, user_id, video_url, prompt, intent, model, task_id, status, metadata, created_at
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (task_id) DO UPDATE SET
-                        user_id = EXCLUDED.user_id,
-                        prompt = EXCLUDED.prompt,
-                        intent = EXCLUDED.intent,
-                        model = EXCLUDED.model,
-                        status = EXCLUDED.status,
-                        metadata = EXCLUDED.metadata,
-                        updated_at = CURRENT_TIMESTAMP
-                    RETURNING video_id, user_id, video_url, prompt, intent, model, task_id, status, metadata, created_at
+                    SELECT * FROM updated
+                    UNION ALL
+                    SELECT * FROM inserted
                 """
 
                 cursor.execute(
                     query,
-                    (
-                        video_id,
-                        user_id,
-                        None,
-                        prompt,
-                        intent,
-                        model,
-                        task_id,
-                        status,
-                        psycopg2.extras.Json(metadata),
-                    ),
+                    {
+                        "video_id": video_id,
+                        "user_id": user_id,
+                        "prompt": prompt,
+                        "intent": intent,
+                        "model": model,
+                        "task_id": task_id,
+                        "status": status,
+                        "metadata": psycopg2.extras.Json(metadata),
+                    },
                 )
 
                 result = cursor.fetchone()
@@ -169,6 +185,20 @@ class VideoGalleryService:
         finally:
             conn.close()
 
+    def ensure_partitions(self, months_ahead: int = 3) -> None:
+        """Create monthly partitions of video_gallery up to `months_ahead` months out."""
+        conn = self._get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT ensure_monthly_partitions('video_gallery', 0, %s)", (months_ahead,))
+            conn.commit()
+        except psycopg2.Error as exc:
+            logger.error("Database error: %s", str(exc))
+            conn.rollback()
+            raise VideoGalleryError(f"Failed to create partitions: {str(exc)}")
+        finally:
+            conn.close()
+
     def close(self):
         return
 
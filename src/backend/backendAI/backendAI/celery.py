@@ -1,5 +1,8 @@
 import os
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import celeryd_init, task_postrun, worker_init
+from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backendAI.settings')
@@ -28,6 +31,101 @@ app.conf.update(
     worker_max_tasks_per_child=1000,
 )
 
+# ----------------------------------------------------------------------------
+# Queues per pipeline stage
+#
+# Each stage has its own queue so slow upstream work never delays the
+# millisecond-long persistence writes queued behind it. Run one worker per
+# queue (see docker-compose.yml):
+#     celery -A backendAI worker -Q llm
+# A worker consuming exactly one of these queues gets that queue's
+# concurrency unless --concurrency is passed. Names and concurrency are
+# overridable with CELERY_QUEUE_<STAGE> / CELERY_<STAGE>_CONCURRENCY.
+# ----------------------------------------------------------------------------
+
+def _queue(stage, concurrency):
+    return {
+        'name': os.environ.get(f'CELERY_QUEUE_{stage.upper()}', stage),
+        'concurrency': int(os.environ.get(f'CELERY_{stage.upper()}_CONCURRENCY', concurrency)),
+    }
+
+
+QUEUES = {
+    'llm': _queue('llm', 8),                  # Gemini prompt refinement
+    'submit': _queue('submit', 16),           # Freepik submit (chat routing waits for the result)
+    'polling': _queue('polling', 16),         # Freepik status polls
+    'upload': _queue('upload', 8),            # File service uploads
+    'persistence': _queue('persistence', 4),  # Mongo / gallery writes
+    'maintenance': _queue('maintenance', 1),  # Beat jobs (purge, partitions, archive)
+}
+
+# Matched in order; unnamed tasks are called apps.<app>.celery_tasks.<func>
+TASK_ROUTES = {
+    'prompt_service.*': 'llm',
+    'conversation.finalize_conversation_task': 'persistence',
+    'conversation.archive_inactive_sessions_task': 'maintenance',
+    'image_gallery.purge_deleted_images_task': 'maintenance',
+    'image_gallery.ensure_gallery_partitions_task': 'maintenance',
+    'image_gallery.*': 'persistence',
+    'apps.*.celery_tasks.save_*': 'persistence',
+    'apps.*.celery_tasks.poll_*': 'polling',
+    '*.upload_*': 'upload',
+    'intent_router.refine_batch_prompt_task': 'llm',
+    'intent_router.finish_batch_task': 'persistence',
+    'intent_router.dispatch_scheduled_jobs_task': 'persistence',
+    'intent_router.watch_feature_job_task': 'polling',
+    'intent_router.*': 'submit',
+    'image_service.*': 'submit',
+    'apps.*.celery_tasks.*': 'submit',
+}
+
+app.conf.task_routes = {
+    pattern: {'queue': QUEUES[stage]['name']} for pattern, stage in TASK_ROUTES.items()
+}
+app.conf.task_default_queue = QUEUES['persistence']['name']
+# A worker started without -Q (local dev, solo/eventlet) consumes every queue
+app.conf.task_queues = [Queue(queue['name']) for queue in QUEUES.values()]
+
+# Task priorities (core/scheduler.py tiers). The Redis transport keeps one list
+# per priority step and serves 0 first; tasks of a chain/chord inherit the
+# priority the scheduler gave the job.
+app.conf.broker_transport_options = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+app.conf.task_default_priority = 5
+app.conf.task_inherit_parent_priority = True
+
+
+@celeryd_init.connect
+def configure_queue_concurrency(sender=None, conf=None, options=None, **kwargs):
+    """Apply QUEUES concurrency to a worker started with -Q <one queue>."""
+    queues = (options or {}).get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    if len(queues) != 1 or (options or {}).get('concurrency'):
+        return
+    for queue in QUEUES.values():
+        if queue['name'] == queues[0]:
+            conf.worker_concurrency = queue['concurrency']
+
+
+@worker_init.connect
+def configure_green_drivers(**kwargs):
+    """Make psycopg2 cooperative when the worker runs a gevent/eventlet pool (no-op otherwise)."""
+    from core.postgres import make_psycopg_green
+    make_psycopg_green()
+
+
+@task_postrun.connect
+def record_task_completion(sender=None, **kwargs):
+    """Feed the per-queue completion rate used by admission control (core/admission.py)."""
+    from core.admission import record_completion
+    delivery_info = getattr(sender.request, 'delivery_info', None) or {}
+    record_completion(delivery_info.get('routing_key'))
+
+
 # Autodiscover tasks from all apps
 app.autodiscover_tasks([
     'apps.conversation',
@@ -41,8 +139,29 @@ app.autodiscover_tasks([
     'apps.style_transfer',
     'apps.reimagine',
     'apps.image_expand',
+    'apps.image_gallery',
 ])
 
+# Periodic maintenance (run with: celery -A backendAI beat)
+app.conf.beat_schedule = {
+    'purge-deleted-gallery-images': {
+        'task': 'image_gallery.purge_deleted_images_task',
+        'schedule': crontab(minute=0, hour=int(os.environ.get('GALLERY_PURGE_HOUR_UTC', 3))),
+    },
+    'ensure-gallery-partitions': {
+        'task': 'image_gallery.ensure_gallery_partitions_task',
+        'schedule': crontab(minute=30, hour=0),
+    },
+    'dispatch-scheduled-jobs': {
+        'task': 'intent_router.dispatch_scheduled_jobs_task',
+        'schedule': 10.0,
+    },
+    'archive-inactive-conversations': {
+        'task': 'conversation.archive_inactive_sessions_task',
+        'schedule': crontab(minute=0, hour=int(os.environ.get('CONVERSATION_ARCHIVE_HOUR_UTC', 4))),
+    },
+}
+
 
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
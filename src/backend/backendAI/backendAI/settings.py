@@ -67,6 +67,8 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "core.middleware.IdempotencyMiddleware",
+    "core.middleware.AdmissionControlMiddleware",
     "core.middleware.RequestLoggingMiddleware",
 ]
 
@@ -113,6 +115,19 @@ DATABASES = {
 # MongoDB Configuration (for conversation app)
 MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
 MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'ai_photofun_studio')
+# One pooled client per process (core/mongo.py)
+MONGO_MAX_POOL_SIZE = env_int('MONGO_MAX_POOL_SIZE', 50)
+MONGO_MIN_POOL_SIZE = env_int('MONGO_MIN_POOL_SIZE', 0)
+MONGO_MAX_IDLE_TIME_MS = env_int('MONGO_MAX_IDLE_TIME_MS', 60000)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)
+MONGO_CONNECT_TIMEOUT_MS = env_int('MONGO_CONNECT_TIMEOUT_MS', 5000)
+MONGO_SOCKET_TIMEOUT_MS = env_int('MONGO_SOCKET_TIMEOUT_MS', 20000)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)
+
+# Supabase PostgreSQL pool per process for the gallery services (core/postgres.py).
+# Callers wait up to PG_POOL_TIMEOUT_SECONDS when all connections are busy.
+PG_POOL_MAX_CONNECTIONS = env_int('PG_POOL_MAX_CONNECTIONS', 10)
+PG_POOL_TIMEOUT_SECONDS = env_int('PG_POOL_TIMEOUT_SECONDS', 10)
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -202,12 +217,17 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
+    'if-none-match',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
 
+# Lets pollers read the ETag used for conditional GETs (core/etag.py)
+CORS_EXPOSE_HEADERS = ['etag', 'idempotent-replayed', 'retry-after', 'admission-degraded']
+
 
 # ============================================================================
 # MEDIA FILES CONFIGURATION
@@ -296,6 +316,8 @@ TOKEN_SERVICE_URL = os.environ.get('TOKEN_SERVICE_URL', '')
 TOKEN_API_KEY_1 = os.environ.get('TOKEN_API_KEY_1', '')
 TOKEN_API_KEY_2 = os.environ.get('TOKEN_API_KEY_2', '')
 TOKEN_SERVICE_TIMEOUT = env_int('TOKEN_SERVICE_TIMEOUT', 10)
+# Balance used by pre-request checks is cached this long (dropped on deduction)
+TOKEN_BALANCE_CACHE_SECONDS = env_int('TOKEN_BALANCE_CACHE_SECONDS', 30)
 
 # Video Generation Mock Mode
 # MOCK_VIDEO_GENERATION removed - using real API
@@ -323,17 +345,125 @@ CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
 
+# ============================================================================
+# IMAGE GALLERY MAINTENANCE
+# ============================================================================
+
+# Soft-deleted gallery rows are hard-deleted after this many days
+GALLERY_PURGE_RETENTION_DAYS = env_int('GALLERY_PURGE_RETENTION_DAYS', 30)
+GALLERY_PURGE_BATCH_SIZE = env_int('GALLERY_PURGE_BATCH_SIZE', 200)
+GALLERY_PURGE_SLEEP_SECONDS = float(os.environ.get('GALLERY_PURGE_SLEEP_SECONDS', 0.5))
+GALLERY_PURGE_MAX_BATCHES = env_int('GALLERY_PURGE_MAX_BATCHES', 0)  # 0 = no limit
+GALLERY_PURGE_DELETE_FILES = env_bool('GALLERY_PURGE_DELETE_FILES', False)
+GALLERY_PURGE_HOUR_UTC = env_int('GALLERY_PURGE_HOUR_UTC', 3)
+
+# image_gallery / video_gallery are partitioned by created_at month; keep this
+# many future months created ahead of time
+GALLERY_PARTITION_MONTHS_AHEAD = env_int('GALLERY_PARTITION_MONTHS_AHEAD', 3)
+
+# ============================================================================
+# CONVERSATION ARCHIVAL
+# ============================================================================
+
+# Sessions with no message activity for this many days move to compressed cold storage
+CONVERSATION_ARCHIVE_AFTER_DAYS = env_int('CONVERSATION_ARCHIVE_AFTER_DAYS', 90)
+CONVERSATION_ARCHIVE_BATCH_SIZE = env_int('CONVERSATION_ARCHIVE_BATCH_SIZE', 100)
+CONVERSATION_ARCHIVE_SLEEP_SECONDS = float(os.environ.get('CONVERSATION_ARCHIVE_SLEEP_SECONDS', 0.5))
+CONVERSATION_ARCHIVE_MAX_SESSIONS = env_int('CONVERSATION_ARCHIVE_MAX_SESSIONS', 0)  # 0 = no limit
+CONVERSATION_ARCHIVE_ZSTD_LEVEL = env_int('CONVERSATION_ARCHIVE_ZSTD_LEVEL', 10)
+CONVERSATION_ARCHIVE_HOUR_UTC = env_int('CONVERSATION_ARCHIVE_HOUR_UTC', 4)
+
+# Conditional GET: lifetime of per-user gallery / per-session version tokens
+# (an expired token just costs clients one full response)
+RESOURCE_VERSION_TTL = env_int('RESOURCE_VERSION_TTL', 7 * 24 * 3600)
+
 # ============================================================================
 # CACHE
 # ============================================================================
 
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/1')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/1'),
+        'LOCATION': REDIS_URL,
     }
 }
 
+# Server-Sent Events for chat message updates (Redis pub/sub per session)
+SSE_KEEPALIVE_SECONDS = env_int('SSE_KEEPALIVE_SECONDS', 15)
+SSE_MAX_STREAM_SECONDS = env_int('SSE_MAX_STREAM_SECONDS', 300)  # clients reconnect after this
+# Open streams per server process; keep below the worker's threads (GUNICORN_THREADS) so API requests still get one
+SSE_MAX_STREAMS_PER_PROCESS = env_int('SSE_MAX_STREAMS_PER_PROCESS', 16)
+
+# Chat sync cursors skip writes newer than this (> MONGO_SOCKET_TIMEOUT_MS), see conversation.service.sync_messages
+SYNC_SETTLE_SECONDS = env_int('SYNC_SETTLE_SECONDS', 30)
+
+# Idempotency-Key replay for POSTs that start AI work (core.middleware.IdempotencyMiddleware)
+IDEMPOTENCY_ENABLED = env_bool('IDEMPOTENCY_ENABLED', True)
+IDEMPOTENCY_TTL_SECONDS = env_int('IDEMPOTENCY_TTL_SECONDS', 24 * 3600)
+IDEMPOTENCY_LOCK_SECONDS = env_int('IDEMPOTENCY_LOCK_SECONDS', 120)
+IDEMPOTENCY_PATHS = ['/v1/features/', '/api/v1/chat/sessions/', '/sessions/']
+
+# Celery chain payloads larger than this travel by reference (core/claim_check.py);
+# the stored copy outlives the longest pipeline
+CLAIM_CHECK_THRESHOLD_BYTES = env_int('CLAIM_CHECK_THRESHOLD_BYTES', 16 * 1024)
+CLAIM_CHECK_TTL_SECONDS = env_int('CLAIM_CHECK_TTL_SECONDS', 2 * 3600)
+
+# Multi-step chat requests ("generate, then upscale") run as a Celery DAG (apps/intent_router/pipeline.py)
+PIPELINE_MAX_STEPS = env_int('PIPELINE_MAX_STEPS', 6)
+PIPELINE_STATE_TTL_SECONDS = env_int('PIPELINE_STATE_TTL_SECONDS', 6 * 3600)
+
+# Fair-share scheduler for chat and batch jobs (core/scheduler.py): job slots running at once,
+# DRR quantum per turn (x tier weight), lease after which a job that never finished frees its slots
+SCHEDULER_ENABLED = env_bool('SCHEDULER_ENABLED', True)
+SCHEDULER_MAX_IN_FLIGHT = env_int('SCHEDULER_MAX_IN_FLIGHT', 64)
+SCHEDULER_QUANTUM = env_int('SCHEDULER_QUANTUM', 1)
+SCHEDULER_JOB_LEASE_SECONDS = env_int('SCHEDULER_JOB_LEASE_SECONDS', 15 * 60)
+
+# AI jobs in flight per user (core/job_limiter.py), by scheduler tier; a permit not released
+# within the lease is dropped. The default duration seeds the Retry-After estimate, the watch
+# interval is how often a direct feature's provider task is checked to release its permit.
+USER_JOB_LIMIT_ENABLED = env_bool('USER_JOB_LIMIT_ENABLED', True)
+USER_JOB_LIMITS = {
+    'ADMIN': env_int('USER_JOB_LIMIT_ADMIN', 20),
+    'PREMIUM': env_int('USER_JOB_LIMIT_PREMIUM', 6),
+    'USER': env_int('USER_JOB_LIMIT_USER', 3),
+}
+USER_JOB_LEASE_SECONDS = env_int('USER_JOB_LEASE_SECONDS', 10 * 60)
+USER_JOB_DEFAULT_DURATION_SECONDS = env_int('USER_JOB_DEFAULT_DURATION_SECONDS', 30)
+USER_JOB_WATCH_INTERVAL_SECONDS = env_int('USER_JOB_WATCH_INTERVAL_SECONDS', 5)
+
+# Admission control for new AI jobs (core/admission.py): estimated queueing delay above which
+# chat messages and feature POSTs are rejected (503) or degraded, and how it is measured
+ADMISSION_ENABLED = env_bool('ADMISSION_ENABLED', True)
+ADMISSION_PATHS = [r'^/v1/features/(?!.*/cancel/)', r'^(/api/v1/chat)?/sessions/[^/]+/messages/?$']
+ADMISSION_MAX_DELAY_SECONDS = env_int('ADMISSION_MAX_DELAY_SECONDS', 60)
+ADMISSION_DEGRADE_DELAY_SECONDS = env_int('ADMISSION_DEGRADE_DELAY_SECONDS', 30)
+ADMISSION_DEGRADED_RESOLUTION = os.environ.get('ADMISSION_DEGRADED_RESOLUTION', '1k')
+ADMISSION_MAX_RETRY_AFTER_SECONDS = env_int('ADMISSION_MAX_RETRY_AFTER_SECONDS', 300)
+ADMISSION_STAGES = ['llm', 'submit']
+ADMISSION_RATE_WINDOW_SECONDS = env_int('ADMISSION_RATE_WINDOW_SECONDS', 60)
+ADMISSION_BUCKET_SECONDS = env_int('ADMISSION_BUCKET_SECONDS', 5)
+ADMISSION_CACHE_SECONDS = env_int('ADMISSION_CACHE_SECONDS', 2)
+
+# Cancel flags of chat messages and feature tasks (core/cancellation.py); outlives the polling window
+CANCEL_FLAG_TTL_SECONDS = env_int('CANCEL_FLAG_TTL_SECONDS', 3600)
+
+# Batch feature requests (apps/intent_router/batch.py): items per batch, items running at once per batch
+BATCH_MAX_ITEMS = env_int('BATCH_MAX_ITEMS', 16)
+BATCH_MAX_CONCURRENCY = env_int('BATCH_MAX_CONCURRENCY', 4)
+BATCH_STATE_TTL_SECONDS = env_int('BATCH_STATE_TTL_SECONDS', 24 * 3600)
+
+# Local intent classifier in front of Gemini for obvious edit prompts (apps/prompt_service/intent_classifier.py)
+FAST_INTENT_ENABLED = env_bool('FAST_INTENT_ENABLED', True)
+FAST_INTENT_MAX_WORDS = env_int('FAST_INTENT_MAX_WORDS', 10)
+FAST_INTENT_MIN_SCORE = float(os.environ.get('FAST_INTENT_MIN_SCORE', 0.35))
+FAST_INTENT_MIN_MARGIN = float(os.environ.get('FAST_INTENT_MIN_MARGIN', 0.05))
+
+# Chat session owner (user_id) cache; owners never change
+SESSION_OWNER_CACHE_SECONDS = env_int('SESSION_OWNER_CACHE_SECONDS', 24 * 3600)
+
 # ============================================================================
 # API DOCUMENTATION (Swagger)
 # ============================================================================
@@ -5,6 +5,7 @@ from django.http import JsonResponse
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from core.mongo import get_pool_metrics
 
 
 def health_check(request):
@@ -12,7 +13,8 @@ def health_check(request):
     return JsonResponse({
         'status': 'healthy',
         'service': 'backendAI',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'mongo_pool': get_pool_metrics(),
     })
 
 
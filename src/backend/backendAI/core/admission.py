@@ -0,0 +1,151 @@
+"""
+Admission control for new AI jobs (load shedding)
+
+When Freepik slows down, every chat job holds a submit worker longer and the
+Celery backlog grows without bound; jobs queued behind it start so late that
+they time out in `poll_for_completion` anyway. New jobs are therefore
+admitted against the current queueing delay:
+
+    delay = sum over ADMISSION_STAGES of waiting messages / completion rate
+
+Waiting messages are the broker list lengths of the stage's queue (every
+priority step); jobs held back by the fair-share scheduler count against the
+submit stage. The completion rate is counted by workers (task_postrun, see
+backendAI/celery.py) in ADMISSION_BUCKET_SECONDS buckets over the last
+ADMISSION_RATE_WINDOW_SECONDS. A stage with a backlog and no completions in
+the window counts as stalled.
+
+    delay > ADMISSION_MAX_DELAY_SECONDS       rejected: 503 + Retry-After
+    delay > ADMISSION_DEGRADE_DELAY_SECONDS   admitted at lower cost
+                                              (generation at ADMISSION_DEGRADED_RESOLUTION)
+
+The estimate is computed at most every ADMISSION_CACHE_SECONDS per process.
+Admission fails open when Redis is unavailable.
+
+Usage:
+    from core.admission import is_degraded
+
+    resolution = settings.ADMISSION_DEGRADED_RESOLUTION if is_degraded(request) else "2k"
+"""
+
+import logging
+import math
+import time
+
+from celery import current_app
+from django.conf import settings
+
+from core.redis_client import get_redis
+from core.scheduler import waiting_jobs
+
+logger = logging.getLogger(__name__)
+
+_estimate = {"at": 0.0, "delay": 0.0}
+
+
+def _done_key(queue, bucket):
+    return f"admission:done:{queue}:{bucket}"
+
+
+def _stage_queues():
+    from backendAI.celery import QUEUES
+    return {stage: QUEUES[stage]["name"] for stage in settings.ADMISSION_STAGES}
+
+
+def record_completion(queue):
+    """Count one finished task of `queue` (called by workers). Never raises."""
+    if not settings.ADMISSION_ENABLED or not queue:
+        return
+    bucket = int(time.time()) // settings.ADMISSION_BUCKET_SECONDS
+    key = _done_key(queue, bucket)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, settings.ADMISSION_RATE_WINDOW_SECONDS + settings.ADMISSION_BUCKET_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"[Admission] Failed to record completion on {queue}: {e}")
+
+
+def completion_rate(queue) -> float:
+    """Tasks of `queue` finished per second over the last window (current bucket excluded)."""
+    step = settings.ADMISSION_BUCKET_SECONDS
+    current = int(time.time()) // step
+    buckets = max(1, settings.ADMISSION_RATE_WINDOW_SECONDS // step)
+    counts = get_redis().mget([_done_key(queue, current - n) for n in range(1, buckets + 1)])
+    return sum(int(count or 0) for count in counts) / (buckets * step)
+
+
+def queue_depth(queues) -> dict:
+    """Messages waiting in the broker per queue, summed over the Redis transport's priority lists."""
+    options = current_app.conf.broker_transport_options
+    sep = options.get("sep", "\x06\x16")
+    steps = [step for step in options.get("priority_steps", [0]) if step]
+    with current_app.connection_for_read() as conn:
+        client = conn.default_channel.client
+        pipe = client.pipeline()
+        for queue in queues:
+            pipe.llen(queue)
+            for step in steps:
+                pipe.llen(f"{queue}{sep}{step}")
+        lengths = pipe.execute()
+    per_queue = len(steps) + 1
+    return {
+        queue: sum(lengths[i * per_queue:(i + 1) * per_queue])
+        for i, queue in enumerate(queues)
+    }
+
+
+def estimate_delay() -> float:
+    """Seconds a job submitted now waits before its Freepik call (inf when a stage is stalled)."""
+    stages = _stage_queues()
+    depths = queue_depth(list(stages.values()))
+    if "submit" in stages:
+        depths[stages["submit"]] += waiting_jobs()
+
+    delay = 0.0
+    for stage, queue in stages.items():
+        depth = depths[queue]
+        if not depth:
+            continue
+        rate = completion_rate(queue)
+        if not rate:
+            logger.warning(f"[Admission] {stage}: {depth} waiting, no completions in the last window")
+            return math.inf
+        delay += depth / rate
+    return delay
+
+
+def current_delay() -> float:
+    """estimate_delay(), reused for ADMISSION_CACHE_SECONDS; 0 when Redis is unavailable."""
+    now = time.time()
+    if now - _estimate["at"] >= settings.ADMISSION_CACHE_SECONDS:
+        try:
+            _estimate["delay"] = estimate_delay()
+        except Exception as e:
+            logger.warning(f"[Admission] Queue delay unavailable, admitting: {e}")
+            _estimate["delay"] = 0.0
+        _estimate["at"] = now
+    return _estimate["delay"]
+
+
+def retry_after_for(delay) -> int:
+    """Seconds until the backlog is expected to be back under the budget."""
+    if math.isinf(delay):
+        return settings.ADMISSION_MAX_RETRY_AFTER_SECONDS
+    excess = math.ceil(delay - settings.ADMISSION_MAX_DELAY_SECONDS)
+    return max(1, min(excess, settings.ADMISSION_MAX_RETRY_AFTER_SECONDS))
+
+
+def is_degraded(request) -> bool:
+    """
+    Whether AdmissionControlMiddleware admitted this request at lower cost
+
+    Call it only where the lower cost is applied: a True answer marks the
+    request so the middleware adds the Admission-Degraded response header.
+    """
+    degraded = getattr(request, "admission_degraded", False)
+    if degraded:
+        # DRF's Request wraps the HttpRequest the middleware sees
+        getattr(request, "_request", request).admission_degraded_applied = True
+    return degraded
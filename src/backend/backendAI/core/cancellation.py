@@ -0,0 +1,106 @@
+"""
+Cancellation of in-flight AI jobs
+
+Cancelling sets a flag (`cancel:{job_id}`, CANCEL_FLAG_TTL_SECONDS) that the
+long-running parts of a job check before each step:
+
+    chat message    job_id = message_id. Also dropped from the scheduler queue
+                    if not dispatched yet. A dispatched chain skips the prompt
+                    refinement and the feature call, or stops at its next poll
+                    attempt, skips the upload and gallery save; finalize
+                    keeps the message CANCELED and frees the job's slot and
+                    permit.
+    direct feature  job_id = provider task_id. The status endpoint and the
+                    poll_* Celery tasks report CANCELED without polling the
+                    provider again, so nothing is uploaded or saved. Only the
+                    user holding the task's job permit can cancel it, and
+                    only while it runs (see FeatureCancelView).
+
+The provider job itself cannot be stopped; a cancelled job is no longer
+waited for, uploaded or stored. Flag checks fail open (not cancelled) when
+Redis is unavailable.
+
+Usage:
+    from core.cancellation import is_cancelled
+
+    if is_cancelled(job_id):
+        return {"status": CANCELED}
+"""
+
+import logging
+from functools import wraps
+
+from django.conf import settings
+from rest_framework.views import APIView
+
+from core.job_limiter import job_owner, job_user_id, release_job
+from core.redis_client import get_redis
+from core.response_utils import APIResponse
+
+logger = logging.getLogger(__name__)
+
+CANCELED = "CANCELED"
+
+
+def _cancel_key(job_id):
+    return f"cancel:{job_id}"
+
+
+def request_cancel(job_id):
+    """Flag `job_id` as cancelled."""
+    get_redis().set(_cancel_key(job_id), 1, ex=settings.CANCEL_FLAG_TTL_SECONDS)
+
+
+def is_cancelled(job_id) -> bool:
+    """Whether `job_id` was cancelled. Never raises."""
+    if not job_id:
+        return False
+    try:
+        return bool(get_redis().exists(_cancel_key(job_id)))
+    except Exception as e:
+        logger.warning(f"[Cancel] Flag check failed for {job_id}: {e}")
+        return False
+
+
+def cancellable_status(view_func):
+    """Answer a feature status GET with CANCELED, without polling the provider, once `task_id` is cancelled."""
+    @wraps(view_func)
+    def wrapped_view(self, request, task_id, *args, **kwargs):
+        if is_cancelled(task_id):
+            return APIResponse.success(
+                result={"task_id": task_id, "status": CANCELED, "image_url": None},
+                message="Task canceled"
+            )
+        return view_func(self, request, task_id, *args, **kwargs)
+    return wrapped_view
+
+
+class FeatureCancelView(APIView):
+    """
+    Cancel a direct feature task
+    POST /v1/features/<feature>/cancel/<task_id>/ {user_id}
+
+    The owner is the user of the task's job permit (core/job_limiter.py,
+    identified like the POST that started it, see job_user_id):
+    404 for unknown tasks and tasks of other users, 409 once the task has
+    reported a final status, so a finished result is never hidden.
+    """
+
+    def post(self, request, task_id):
+        user_id = job_user_id(request)
+        if not user_id:
+            return APIResponse.error(message="user_id is required")
+
+        try:
+            owner, finished = job_owner(task_id)
+            if owner != user_id:
+                return APIResponse.not_found(message="Task not found")
+            if finished:
+                return APIResponse.error(message="Task already finished", status_code=409)
+            request_cancel(task_id)
+        except Exception as e:
+            logger.error(f"[Cancel] Failed to cancel task {task_id}: {e}")
+            return APIResponse.error(message="Failed to cancel task", status_code=503)
+        release_job(task_id)
+        logger.info(f"[Cancel] Feature task {task_id} canceled by {user_id}")
+        return APIResponse.success(result={"task_id": task_id, "status": CANCELED}, message="Task canceled")
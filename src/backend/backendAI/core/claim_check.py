@@ -0,0 +1,66 @@
+"""
+Claim-check for large Celery payloads
+
+Chain hand-offs (contexts with image lists or base64 data, full feature
+results) go through the broker on every hop. Payloads above
+CLAIM_CHECK_THRESHOLD_BYTES are stored once in the cache (Redis) for
+CLAIM_CHECK_TTL_SECONDS and only a small reference travels through Celery.
+
+Usage:
+    from core.claim_check import check_in, claim
+
+    task.s(check_in(payload))          # producer: pass by reference if large
+    payload = claim(payload)           # consumer: first line of the task
+    return check_in(result)            # task result handed to the next task
+
+Values are serialized with kombu's JSON, i.e. exactly what Celery would have
+sent (tuples come back as lists). References are not deleted on read, so a
+redelivered task (acks_late) can still claim its payload; the TTL cleans up.
+"""
+
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from kombu.utils.json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+CLAIM_KEY = "__claim__"
+KEY_PREFIX = "claim_check"
+
+
+class ClaimCheckError(Exception):
+    """Referenced payload expired or was never stored."""
+
+
+def is_claim(value) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and CLAIM_KEY in value
+
+
+def check_in(payload, threshold=None):
+    """Return `payload` unchanged if small, else a reference to its stored copy."""
+    if is_claim(payload):
+        return payload
+    threshold = settings.CLAIM_CHECK_THRESHOLD_BYTES if threshold is None else threshold
+    data = dumps(payload)
+    # The threshold is in bytes; non-ASCII text (Vietnamese prompts) takes several per character
+    size = len(data.encode("utf-8") if isinstance(data, str) else data)
+    if size <= threshold:
+        return payload
+
+    key = f"{KEY_PREFIX}:{uuid.uuid4().hex}"
+    cache.set(key, data, settings.CLAIM_CHECK_TTL_SECONDS)
+    logger.info(f"[ClaimCheck] Stored {size} bytes as {key}")
+    return {CLAIM_KEY: key}
+
+
+def claim(value):
+    """Resolve a reference produced by check_in; other values pass through."""
+    if not is_claim(value):
+        return value
+    data = cache.get(value[CLAIM_KEY])
+    if data is None:
+        raise ClaimCheckError(f"Claim-check payload {value[CLAIM_KEY]} expired or missing")
+    return loads(data)
@@ -0,0 +1,113 @@
+"""
+Conditional GET support based on per-resource version tokens in Redis
+
+Every write to a user's gallery or a chat session replaces a random version
+token in the Django cache. Read endpoints derive a strong ETag from that token
+(plus the request path/query) and answer 304 on a matching If-None-Match,
+so an unchanged poll costs one cache lookup and no database read.
+
+Usage:
+    from core.etag import condition_on_version, bump_version, SESSION_SCOPE
+
+    class ChatSessionDetailView(APIView):
+        @condition_on_version(SESSION_SCOPE, lambda request, session_id, **kw: session_id)
+        def get(self, request, session_id):
+            ...
+
+    bump_version(SESSION_SCOPE, session_id)   # after every write
+"""
+
+import hashlib
+import logging
+import uuid
+from functools import wraps
+from typing import Callable, Optional
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+GALLERY_SCOPE = 'gallery'   # keyed by user_id
+SESSION_SCOPE = 'session'   # keyed by session_id
+
+
+def _version_key(scope: str, key: str) -> str:
+    return f"resource_version:{scope}:{key}"
+
+
+def get_version(scope: str, key: str) -> str:
+    """
+    Current version token of a resource, creating one if missing
+
+    Tokens are random rather than counters, so a token lost to eviction can
+    never be re-issued and match a stale client ETag.
+    """
+    cache_key = _version_key(scope, key)
+    version = cache.get(cache_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(cache_key, version, timeout=settings.RESOURCE_VERSION_TTL):
+            version = cache.get(cache_key) or version
+    return version
+
+
+def bump_version(scope: str, key: Optional[str]) -> None:
+    """Invalidate every ETag issued for a resource. Never raises."""
+    if not key:
+        return
+    try:
+        cache.set(_version_key(scope, key), uuid.uuid4().hex, timeout=settings.RESOURCE_VERSION_TTL)
+    except Exception as e:
+        logger.warning(f"[ETag] Failed to bump {scope} version for {key}: {str(e)}")
+
+
+def build_etag(scope: str, key: str, variant: str) -> str:
+    """Strong ETag for one representation (variant = path + query string)."""
+    digest = hashlib.sha1(f"{scope}:{key}:{get_version(scope, key)}:{variant}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(request, etag: str) -> bool:
+    header = request.headers.get('If-None-Match', '')
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(',')]
+    return etag in candidates or '*' in candidates
+
+
+def condition_on_version(scope: str, key_func: Callable[..., Optional[str]]):
+    """
+    Decorator for APIView GET methods
+
+    Args:
+        scope: Version scope (GALLERY_SCOPE, SESSION_SCOPE)
+        key_func: (request, **view_kwargs) -> resource key, or None to skip
+            conditional handling for this request
+
+    The version is read before the view builds its body, so a concurrent
+    write can only make the ETag older than the body (next poll gets a 200),
+    never newer.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = key_func(request, **kwargs)
+            etag = None
+            if key:
+                try:
+                    etag = build_etag(scope, str(key), request.get_full_path())
+                except Exception as e:
+                    logger.warning(f"[ETag] Version lookup failed, serving full response: {str(e)}")
+
+            if etag and _etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+            response = view_method(self, request, *args, **kwargs)
+            if etag and 200 <= response.status_code < 300:
+                response['ETag'] = etag
+                response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
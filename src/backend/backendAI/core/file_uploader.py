@@ -41,6 +41,7 @@ class FileUploader:
     
     UPLOAD_URL = "https://file-service-cdal.onrender.com/api/v1/file/uploads"
     UPLOAD_VIDEO_URL = "https://file-service-cdal.onrender.com/api/v1/file/uploads-video"
+    DELETE_URL = "https://file-service-cdal.onrender.com/api/v1/file/delete/{file_id}"
     
     def __init__(self):
         self.timeout = getattr(settings, 'FILE_UPLOAD_TIMEOUT', 120)  # 2 minutes for large images/slow networks
@@ -252,6 +253,37 @@ class FileUploader:
             logger.error(f"Failed to decode/upload base64 image: {str(e)}")
             raise FileUploadError(f"Base64 upload failed: {str(e)}")
     
+    def delete_file(self, file_id: str) -> bool:
+        """
+        Delete a stored file by the id it was uploaded with
+        
+        Args:
+            file_id: File UUID (same as the gallery image_id)
+            
+        Returns:
+            True if the file service confirmed the deletion
+            
+        Raises:
+            FileUploadError: When the request fails
+        """
+        try:
+            response = requests.delete(
+                self.DELETE_URL.format(file_id=file_id),
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            logger.info(f"File deleted successfully: {file_id}")
+            return True
+            
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"File delete HTTP error: {e.response.status_code} - {e.response.text}")
+            raise FileUploadError(f"File delete failed: {e.response.status_code}")
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"File delete request failed: {str(e)}")
+            raise FileUploadError(f"File service unavailable: {str(e)}")
+    
     def _detect_extension(self, url: str, content_type: Optional[str]) -> str:
         """
         Detect file extension from URL or content-type
@@ -0,0 +1,347 @@
+"""
+Per-user limit on AI jobs in flight (distributed semaphore in Redis)
+
+Request rate limits (RateLimitMiddleware) do not bound how many expensive
+jobs a user keeps running. Every AI job holds one permit of its user's
+semaphore from submission until it finishes:
+
+    chat message    acquired in process_message, released by finalize (or the
+                    last pipeline step)
+    batch           acquired in start_batch, released by the batch callback
+    direct feature  acquired by @limit_concurrent_jobs on the POST view,
+                    released when watch_feature_job sees the provider task
+                    finish, fail or outlive its lease, or earlier when the
+                    status endpoint reports a final status (synchronous
+                    features release right away)
+
+A permit is a member of `jobsem:user:{user_id}` (score = start time) and
+expires after USER_JOB_LEASE_SECONDS, so a job that dies without releasing
+cannot lock its user out. A submission over the limit is rejected with 429
+and a Retry-After estimated from the oldest running job and the observed
+average job duration.
+
+Usage:
+    from core.job_limiter import acquire_job, release_job, JobLimitExceeded
+
+    acquire_job(user_id, job_id, tier)   # raises JobLimitExceeded
+    release_job(job_id)                  # never raises
+"""
+
+import logging
+import math
+import time
+import uuid
+from functools import wraps
+
+from celery import current_app
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+from core.auth import extract_token_from_header, verify_jwt_token
+from core.constants import ResponseCode
+from core.redis_client import get_redis
+from core.scheduler import DEFAULT_TIER, request_tier
+
+logger = logging.getLogger(__name__)
+
+AVG_DURATION_KEY = "jobsem:avg_duration"
+WATCH_TASK = "intent_router.watch_feature_job_task"
+FINAL_STATUSES = {"COMPLETED", "SUCCEEDED", "FAILED", "ERROR", "CANCELED", "CANCELLED", "TIMEOUT"}
+
+# KEYS: user set, job -> user key, average duration
+# ARGV: now, lease, limit, job_id, user_id
+ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if redis.call('ZSCORE', KEYS[1], ARGV[4]) then
+    return {1, '', ''}
+end
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    redis.call('SET', KEYS[2], ARGV[5], 'EX', ARGV[2])
+    return {1, '', ''}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, oldest[2], redis.call('GET', KEYS[3]) or ''}
+"""
+
+# KEYS: job -> user key, finished job -> user key; ARGV: job_id, lease.
+# Returns the job's start time, or false
+RELEASE_SCRIPT = """
+local user = redis.call('GET', KEYS[1])
+if not user then
+    return false
+end
+local zkey = 'jobsem:user:' .. user
+local started = redis.call('ZSCORE', zkey, ARGV[1])
+redis.call('ZREM', zkey, ARGV[1])
+redis.call('DEL', KEYS[1])
+redis.call('SET', KEYS[2], user, 'EX', ARGV[2])
+return started
+"""
+
+# KEYS: old job -> user key, new job -> user key; ARGV: old id, new id, lease
+REBIND_SCRIPT = """
+local user = redis.call('GET', KEYS[1])
+if not user then
+    return 0
+end
+local zkey = 'jobsem:user:' .. user
+local started = redis.call('ZSCORE', zkey, ARGV[1])
+redis.call('ZREM', zkey, ARGV[1])
+redis.call('DEL', KEYS[1])
+if not started then
+    return 0
+end
+redis.call('ZADD', zkey, started, ARGV[2])
+redis.call('SET', KEYS[2], user, 'EX', ARGV[3])
+return 1
+"""
+
+
+class JobLimitExceeded(Exception):
+    """User already has `limit` jobs in flight; retry after `retry_after` seconds."""
+
+    def __init__(self, user_id, limit, retry_after):
+        super().__init__(f"Too many jobs in progress: at most {limit} at a time")
+        self.user_id = user_id
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def _user_key(user_id):
+    return f"jobsem:user:{user_id}"
+
+
+def _job_key(job_id):
+    return f"jobsem:job:{job_id}"
+
+
+def _done_key(job_id):
+    return f"jobsem:done:{job_id}"
+
+
+def job_limit_for(tier) -> int:
+    return settings.USER_JOB_LIMITS.get(tier, settings.USER_JOB_LIMITS[DEFAULT_TIER])
+
+
+def acquire_job(user_id, job_id, tier=DEFAULT_TIER):
+    """
+    Take one of `user_id`'s job permits for `job_id` (idempotent per job_id)
+
+    Fails open when Redis is unavailable.
+
+    Raises:
+        JobLimitExceeded: All permits are held
+    """
+    if not settings.USER_JOB_LIMIT_ENABLED:
+        return
+    now = time.time()
+    lease = settings.USER_JOB_LEASE_SECONDS
+    limit = job_limit_for(tier)
+    try:
+        acquired, oldest, avg = get_redis().eval(
+            ACQUIRE_SCRIPT, 3, _user_key(user_id), _job_key(job_id), AVG_DURATION_KEY,
+            now, lease, limit, job_id, user_id,
+        )
+    except Exception as e:
+        logger.warning(f"[JobLimiter] Redis unavailable, not limiting {user_id}: {e}")
+        return
+    if acquired:
+        return
+
+    # The oldest job is expected to finish after the average duration, at the latest when its lease ends
+    oldest = float(oldest)
+    avg = float(avg) if avg else settings.USER_JOB_DEFAULT_DURATION_SECONDS
+    retry_after = min(oldest + avg, oldest + lease) - now
+    retry_after = max(1, math.ceil(retry_after))
+    logger.info(f"[JobLimiter] {user_id} at {limit} jobs ({tier}), retry after {retry_after}s")
+    raise JobLimitExceeded(user_id, limit, retry_after)
+
+
+def release_job(job_id):
+    """Return the permit held by `job_id` (no-op if none). Never raises."""
+    if not settings.USER_JOB_LIMIT_ENABLED or not job_id:
+        return
+    try:
+        r = get_redis()
+        started = r.eval(
+            RELEASE_SCRIPT, 2, _job_key(job_id), _done_key(job_id),
+            job_id, settings.USER_JOB_LEASE_SECONDS,
+        )
+        if started:
+            # Moving average of job durations feeds the Retry-After estimate (races only blur it)
+            duration = time.time() - float(started)
+            avg = r.get(AVG_DURATION_KEY)
+            avg = duration if avg is None else 0.8 * float(avg) + 0.2 * duration
+            r.set(AVG_DURATION_KEY, avg)
+    except Exception as e:
+        logger.warning(f"[JobLimiter] Failed to release job {job_id}: {e}")
+
+
+def job_owner(job_id):
+    """
+    Owner of a job as recorded by its permit
+
+    Returns:
+        (user_id, finished): user_id is None for unknown jobs (and jobs whose
+        permit expired); finished is True once the job released its permit.
+        Released jobs are remembered for USER_JOB_LEASE_SECONDS.
+
+    Raises:
+        redis.RedisError: Redis unavailable
+    """
+    running, done = get_redis().mget(_job_key(job_id), _done_key(job_id))
+    if running:
+        return running.decode(), False
+    if done:
+        return done.decode(), True
+    return None, False
+
+
+def rebind_job(job_id, new_job_id):
+    """Move a permit to a new id (e.g. the provider task_id known after submit). Never raises."""
+    try:
+        get_redis().eval(
+            REBIND_SCRIPT, 2, _job_key(job_id), _job_key(new_job_id),
+            job_id, new_job_id, settings.USER_JOB_LEASE_SECONDS,
+        )
+    except Exception as e:
+        logger.warning(f"[JobLimiter] Failed to rebind job {job_id} to {new_job_id}: {e}")
+
+
+def job_limit_response(exc):
+    """429 response with Retry-After for a JobLimitExceeded."""
+    response = JsonResponse(
+        {
+            'code': ResponseCode.ERROR,
+            'message': str(exc),
+            'result': {'limit': exc.limit, 'retry_after': exc.retry_after},
+        },
+        status=429
+    )
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def job_user_id(request):
+    """
+    User whose permits a request uses: the JWT subject when the request
+    carries a valid token, else the user_id of the body or query string.
+    None when there is neither. Never raises.
+    """
+    try:
+        token = extract_token_from_header(request)
+        if token:
+            user_id = verify_jwt_token(token).get('sub')
+            if user_id:
+                return str(user_id)
+    except Exception:
+        pass
+    data = getattr(request, 'data', None) or {}
+    return data.get('user_id') or request.query_params.get('user_id')
+
+
+def watch_feature_job(task_id, probe, started_at):
+    """
+    One round of the permit watcher of a direct feature task
+
+    Releases the permit once `probe` (dotted path of `fn(task_id) -> status`,
+    the provider status without fetching results) reports a final status,
+    or once the task is older than USER_JOB_LEASE_SECONDS; otherwise checks
+    again after USER_JOB_WATCH_INTERVAL_SECONDS. Stops when the permit is
+    gone (released by the status endpoint or a cancel).
+    """
+    try:
+        owner, finished = job_owner(task_id)
+        if not owner or finished:
+            return
+    except Exception as e:
+        logger.warning(f"[JobLimiter] Watcher of {task_id} could not read its permit: {e}")
+
+    if time.time() - started_at >= settings.USER_JOB_LEASE_SECONDS:
+        logger.info(f"[JobLimiter] Task {task_id} timed out, releasing its permit")
+        release_job(task_id)
+        return
+    try:
+        status = import_string(probe)(task_id)
+    except Exception as e:
+        logger.warning(f"[JobLimiter] Status of {task_id} unavailable: {e}")
+        status = None
+    if str(status or '').upper() in FINAL_STATUSES:
+        release_job(task_id)
+        return
+    _schedule_watch(task_id, probe, started_at)
+
+
+def _schedule_watch(task_id, probe, started_at):
+    try:
+        current_app.send_task(
+            WATCH_TASK, args=[task_id, probe, started_at],
+            countdown=settings.USER_JOB_WATCH_INTERVAL_SECONDS,
+        )
+    except Exception as e:
+        # The lease still frees the permit
+        logger.warning(f"[JobLimiter] Failed to schedule watcher of {task_id}: {e}")
+
+
+def limit_concurrent_jobs(view_func=None, *, probe=None):
+    """
+    Hold a job permit from a direct feature POST until the job is done
+
+    Apply outside the token decorator so rejected requests cost nothing.
+    Requests without a user are rejected (400). The permit is released when
+    the view fails or finishes synchronously, and otherwise moved to the
+    returned task_id and watched through `probe` (see watch_feature_job).
+
+    Usage:
+        @limit_concurrent_jobs                                    # synchronous
+        @limit_concurrent_jobs(probe='apps.upscale.services.provider_status')
+    """
+    if view_func is None:
+        return lambda func: limit_concurrent_jobs(func, probe=probe)
+
+    @wraps(view_func)
+    def wrapped_view(self, request, *args, **kwargs):
+        user_id = job_user_id(request)
+        if not user_id:
+            return JsonResponse(
+                {'code': ResponseCode.ERROR, 'message': 'user_id is required', 'result': None},
+                status=400
+            )
+
+        job_id = f"request:{uuid.uuid4().hex}"
+        try:
+            acquire_job(user_id, job_id, request_tier(request))
+        except JobLimitExceeded as e:
+            return job_limit_response(e)
+
+        try:
+            response = view_func(self, request, *args, **kwargs)
+        except Exception:
+            release_job(job_id)
+            raise
+
+        result = (getattr(response, 'data', None) or {}).get('result') or {}
+        task_id = result.get('task_id') if isinstance(result, dict) else None
+        if 200 <= response.status_code < 300 and task_id and result.get('status') not in FINAL_STATUSES:
+            rebind_job(job_id, task_id)
+            if probe and settings.USER_JOB_LIMIT_ENABLED:
+                _schedule_watch(task_id, probe, time.time())
+        else:
+            release_job(job_id)
+        return response
+    return wrapped_view
+
+
+def release_job_when_done(view_func):
+    """Release the permit of `task_id` as soon as its status endpoint reports a final status."""
+    @wraps(view_func)
+    def wrapped_view(self, request, task_id, *args, **kwargs):
+        response = view_func(self, request, task_id, *args, **kwargs)
+        result = (getattr(response, 'data', None) or {}).get('result') or {}
+        if isinstance(result, dict) and result.get('status') in FINAL_STATUSES:
+            release_job(task_id)
+        return response
+    return wrapped_view
@@ -1,10 +1,12 @@
 """
 Custom middleware for the backend AI application
 """
+import hashlib
 import logging
+import re
 import time
 from django.utils.deprecation import MiddlewareMixin
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.core.cache import cache
 from django.conf import settings
 
@@ -317,6 +319,182 @@ class InputSanitizationMiddleware(MiddlewareMixin):
         return None
 
 
+class IdempotencyMiddleware(MiddlewareMixin):
+    """
+    Idempotency-Key support for POSTs that start AI work
+
+    A client retrying a POST (timeout, flaky network) with the same
+    Idempotency-Key header gets the original response (message_id / task_id)
+    back instead of starting a second job and being charged twice.
+
+    The key is claimed atomically (cache.add = Redis SET NX) together with a
+    hash of the request; the 2xx response replaces the claim for
+    IDEMPOTENCY_TTL_SECONDS. Non-2xx responses release the key so the request
+    can be retried. A key reused with a different body gets 422, a duplicate
+    arriving while the first request is still running gets 409.
+
+    Configuration in settings.py:
+        IDEMPOTENCY_ENABLED = True
+        IDEMPOTENCY_TTL_SECONDS = 86400   # replay window
+        IDEMPOTENCY_LOCK_SECONDS = 120    # claim lifetime if a request never finishes
+        IDEMPOTENCY_PATHS = ['/v1/features/', '/api/v1/chat/sessions/', '/sessions/']
+    """
+
+    HEADER = 'HTTP_IDEMPOTENCY_KEY'
+    MAX_KEY_LENGTH = 255
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'IDEMPOTENCY_ENABLED', True)
+        self.ttl = getattr(settings, 'IDEMPOTENCY_TTL_SECONDS', 24 * 3600)
+        self.lock_seconds = getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 120)
+        self.paths = tuple(getattr(settings, 'IDEMPOTENCY_PATHS', ['/v1/features/', '/api/v1/chat/sessions/', '/sessions/']))
+
+    def get_request_hash(self, request):
+        """Hash of what the request asks for; multipart uploads are hashed by fields and file contents"""
+        digest = hashlib.sha256(f"{request.method} {request.path}".encode())
+        if request.content_type == 'multipart/form-data':
+            # request.body would load the whole upload into memory; DRF reuses the parsed POST/FILES
+            for key in sorted(request.POST.keys()):
+                digest.update(f"{key}={request.POST.getlist(key)}".encode())
+            for key in sorted(request.FILES.keys()):
+                for upload in request.FILES.getlist(key):
+                    digest.update(f"{key}:{upload.name}:{upload.size}:".encode())
+                    # Read in chunks (large uploads are temp files) and rewind for the view
+                    upload.seek(0)
+                    for chunk in upload.chunks():
+                        digest.update(chunk)
+                    upload.seek(0)
+        else:
+            digest.update(request.body)
+        return digest.hexdigest()
+
+    def get_cache_key(self, request, idempotency_key):
+        # Keys are client-chosen: scope them to the caller so they cannot replay someone else's response
+        caller = request.META.get('HTTP_AUTHORIZATION') or request.META.get('REMOTE_ADDR', '')
+        scope = hashlib.sha256(f"{caller}|{request.path}|{idempotency_key}".encode()).hexdigest()
+        return f"idempotency:{scope}"
+
+    def error(self, status, message, retry_after=None):
+        response = JsonResponse(
+            {
+                'code': 9999,
+                'message': message,
+                'result': {'retry_after': retry_after} if retry_after else None
+            },
+            status=status
+        )
+        if retry_after:
+            response['Retry-After'] = str(retry_after)
+        return response
+
+    def process_request(self, request):
+        if not self.enabled or request.method != 'POST' or not request.path.startswith(self.paths):
+            return None
+
+        idempotency_key = request.META.get(self.HEADER, '').strip()
+        if not idempotency_key:
+            return None
+        if len(idempotency_key) > self.MAX_KEY_LENGTH:
+            return self.error(400, f'Idempotency-Key must be at most {self.MAX_KEY_LENGTH} characters')
+
+        cache_key = self.get_cache_key(request, idempotency_key)
+        request_hash = self.get_request_hash(request)
+
+        if cache.add(cache_key, {'state': 'pending', 'hash': request_hash}, self.lock_seconds):
+            request._idempotency = (cache_key, request_hash)
+            return None
+
+        record = cache.get(cache_key)
+        if record is None:
+            # Claim expired or was released between add and get; let the client retry
+            return self.error(409, 'A request with this Idempotency-Key is being processed', retry_after=1)
+        if record['hash'] != request_hash:
+            return self.error(422, 'Idempotency-Key was already used for a different request')
+        if record['state'] == 'pending':
+            return self.error(409, 'A request with this Idempotency-Key is being processed', retry_after=1)
+
+        logger.info(f"Idempotent replay: {request.method} {request.path}")
+        response = HttpResponse(record['content'], status=record['status'], content_type=record['content_type'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def process_response(self, request, response):
+        claim = getattr(request, '_idempotency', None)
+        if claim is None:
+            return response
+
+        cache_key, request_hash = claim
+        if 200 <= response.status_code < 300 and not response.streaming:
+            cache.set(cache_key, {
+                'state': 'done',
+                'hash': request_hash,
+                'status': response.status_code,
+                'content_type': response.get('Content-Type', 'application/json'),
+                'content': response.content,
+            }, self.ttl)
+        else:
+            cache.delete(cache_key)
+        return response
+
+
+class AdmissionControlMiddleware(MiddlewareMixin):
+    """
+    Shed new AI jobs while the Celery backlog is too long to finish them in time
+
+    POSTs matching ADMISSION_PATHS (chat messages, /v1/features/) are checked
+    against the estimated queueing delay (core/admission.py): above
+    ADMISSION_MAX_DELAY_SECONDS they get 503 with Retry-After and nothing is
+    enqueued; above ADMISSION_DEGRADE_DELAY_SECONDS they are admitted with
+    `request.admission_degraded` set. Views that honour it (image generation,
+    chat) lower the output resolution through core.admission.is_degraded, and
+    only their responses carry an Admission-Degraded header.
+
+    Configuration in settings.py:
+        ADMISSION_ENABLED = True
+        ADMISSION_MAX_DELAY_SECONDS = 60
+        ADMISSION_DEGRADE_DELAY_SECONDS = 30   # 0 disables degrading
+        ADMISSION_PATHS = [r'^/v1/features/(?!.*/cancel/)', r'^(/api/v1/chat)?/sessions/[^/]+/messages/?$']
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'ADMISSION_ENABLED', True)
+        self.paths = [re.compile(pattern) for pattern in getattr(settings, 'ADMISSION_PATHS', [])]
+
+    def process_request(self, request):
+        if not self.enabled or request.method != 'POST':
+            return None
+        if not any(pattern.match(request.path) for pattern in self.paths):
+            return None
+
+        from core.admission import current_delay, retry_after_for
+        delay = current_delay()
+        if delay > settings.ADMISSION_MAX_DELAY_SECONDS:
+            retry_after = retry_after_for(delay)
+            logger.warning(f"Admission: rejected {request.path}, estimated queue delay {delay:.0f}s")
+            response = JsonResponse(
+                {
+                    'code': 9999,
+                    'message': 'The service is overloaded, please retry later',
+                    'result': {'retry_after': retry_after}
+                },
+                status=503
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+
+        degrade_after = settings.ADMISSION_DEGRADE_DELAY_SECONDS
+        if degrade_after and delay > degrade_after:
+            request.admission_degraded = True
+        return None
+
+    def process_response(self, request, response):
+        if getattr(request, 'admission_degraded_applied', False):
+            response['Admission-Degraded'] = settings.ADMISSION_DEGRADED_RESOLUTION
+        return response
+
+
 class RequestLoggingMiddleware(MiddlewareMixin):
     """Middleware to log all requests"""
     
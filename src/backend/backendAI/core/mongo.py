@@ -0,0 +1,185 @@
+"""
+Shared MongoDB access - one tuned client per process
+
+Every app gets its collections from here, so a process holds a single
+connection pool sized by the MONGO_* settings instead of one default pool
+per app. Collections are returned with the read preference and write
+concern of their tier (COLLECTION_TIERS, overridable via settings).
+
+Usage:
+    from core.mongo import get_collection, get_async_collection, get_pool_metrics
+
+    messages = get_collection('messages')
+    doc = await get_async_collection('messages').find_one({...})   # ASGI views, needs motor
+"""
+
+import os
+import threading
+from typing import Any, Dict
+
+from django.conf import settings
+from pymongo import MongoClient, ReadPreference
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.write_concern import WriteConcern
+
+# tier -> (write concern, read preference)
+TIERS = {
+    # Data that must survive a primary failover (archives, id counters)
+    'critical': (WriteConcern(w='majority', wtimeout=5000), ReadPreference.PRIMARY),
+    # Hot chat traffic: acknowledged by the primary only
+    'standard': (WriteConcern(w=1), ReadPreference.PRIMARY),
+    # Read-mostly reference data that tolerates replica lag
+    'reference': (WriteConcern(w=1), ReadPreference.SECONDARY_PREFERRED),
+}
+
+COLLECTION_TIERS = {
+    'conversations': 'standard',
+    'conversation_archives': 'critical',
+    'messages': 'standard',
+    'rec_prompts': 'reference',
+    'rec_user_profiles': 'standard',
+    'rec_counters': 'critical',
+}
+
+DEFAULT_TIER = 'standard'
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """Counts pool events; read with get_pool_metrics()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'checked_out': 0,
+            'checked_in': 0,
+            'checkout_failed': 0,
+            'pools_cleared': 0,
+        }
+
+    def _incr(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incr('pools_cleared')
+
+    def connection_created(self, event):
+        self._incr('connections_created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incr('connections_closed')
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incr('checkout_failed')
+
+    def connection_checked_out(self, event):
+        self._incr('checked_out')
+
+    def connection_checked_in(self, event):
+        self._incr('checked_in')
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            data = dict(self.counters)
+        data['open_connections'] = data['connections_created'] - data['connections_closed']
+        data['in_use'] = data['checked_out'] - data['checked_in']
+        return data
+
+
+_metrics = PoolMetrics()
+_client = None
+_client_pid = None
+_async_client = None
+_lock = threading.Lock()
+
+
+def _client_options() -> Dict[str, Any]:
+    return {
+        'maxPoolSize': settings.MONGO_MAX_POOL_SIZE,
+        'minPoolSize': settings.MONGO_MIN_POOL_SIZE,
+        'maxIdleTimeMS': settings.MONGO_MAX_IDLE_TIME_MS,
+        'waitQueueTimeoutMS': settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        'connectTimeoutMS': settings.MONGO_CONNECT_TIMEOUT_MS,
+        'socketTimeoutMS': settings.MONGO_SOCKET_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'retryWrites': True,
+        'appname': 'backendAI',
+    }
+
+
+def get_client() -> MongoClient:
+    """Process-wide MongoClient, recreated after fork (Celery prefork, gunicorn)."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                _metrics.reset()
+                _client = MongoClient(settings.MONGO_URI, event_listeners=[_metrics], **_client_options())
+                _client_pid = os.getpid()
+    return _client
+
+
+def get_db(name=None):
+    return get_client()[name or settings.MONGO_DB_NAME]
+
+
+def _tier_options(name: str):
+    tiers = {**COLLECTION_TIERS, **getattr(settings, 'MONGO_COLLECTION_TIERS', {})}
+    write_concern, read_preference = TIERS[tiers.get(name, DEFAULT_TIER)]
+    return {'write_concern': write_concern, 'read_preference': read_preference}
+
+
+def get_collection(name: str):
+    """Collection `name` configured for its tier."""
+    return get_db().get_collection(name, **_tier_options(name))
+
+
+def get_async_client():
+    """
+    Motor client for async (ASGI) views
+
+    Raises:
+        RuntimeError: When motor is not installed
+    """
+    global _async_client
+    if _async_client is None:
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError:
+            raise RuntimeError("motor is not installed; pip install motor to use async Mongo access")
+        _async_client = AsyncIOMotorClient(settings.MONGO_URI, **_client_options())
+    return _async_client
+
+
+def get_async_collection(name: str):
+    """Async (Motor) counterpart of get_collection."""
+    db = get_async_client()[settings.MONGO_DB_NAME]
+    return db.get_collection(name, **_tier_options(name))
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Pool counters of the sync client in this process."""
+    metrics = _metrics.snapshot()
+    metrics['max_pool_size'] = settings.MONGO_MAX_POOL_SIZE
+    metrics['pid'] = os.getpid()
+    return metrics
@@ -0,0 +1,153 @@
+"""
+Shared PostgreSQL (Supabase) connections - a bounded pool per process
+
+Callers borrow a connection for one unit of work instead of sharing a single
+long-lived connection, so concurrent threads or gevent greenlets never
+interleave statements on the same connection. When the pool is exhausted a
+caller waits (cooperatively under gevent) up to PG_POOL_TIMEOUT_SECONDS.
+
+Under a gevent/eventlet worker (celery -P gevent) psycopg2 is made
+cooperative with psycogreen, otherwise every query would block the whole
+worker.
+
+Usage:
+    from core.postgres import get_connection
+
+    with get_connection(DB_CONFIG) as conn:
+        cursor = conn.cursor()
+        cursor.execute(...)
+        conn.commit()
+"""
+
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import psycopg2
+from django.conf import settings
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became free within PG_POOL_TIMEOUT_SECONDS."""
+
+
+_green_checked = False
+
+
+def _green_driver():
+    """'gevent' / 'eventlet' when that library has patched sockets in this process."""
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched('socket'):
+            return 'gevent'
+    except ImportError:
+        pass
+    try:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('socket'):
+            return 'eventlet'
+    except ImportError:
+        pass
+    return None
+
+
+def make_psycopg_green():
+    """Install psycogreen's wait callback once if gevent/eventlet has patched this process."""
+    global _green_checked
+    if _green_checked:
+        return
+    _green_checked = True
+    driver = _green_driver()
+    if driver is None:
+        return
+    try:
+        if driver == 'gevent':
+            from psycogreen.gevent import patch_psycopg
+        else:
+            from psycogreen.eventlet import patch_psycopg
+    except ImportError:
+        logger.warning(f"[Postgres] {driver} is active but psycogreen is not installed; queries will block the worker")
+        return
+    patch_psycopg()
+    logger.info(f"[Postgres] psycopg2 switched to {driver} wait callback")
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections for one DSN."""
+
+    def __init__(self, config: Dict[str, Any], max_connections: int):
+        self.config = config
+        self.max_connections = max_connections
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _checkout(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"No PostgreSQL connection free after {timeout}s (max {self.max_connections})")
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None or conn.closed:
+            try:
+                conn = psycopg2.connect(**self.config)
+            except Exception:
+                self._slots.release()
+                raise
+        return conn
+
+    def _checkin(self, conn):
+        try:
+            if not conn.closed and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                # Read-only callers never commit; errors leave an aborted transaction
+                conn.rollback()
+            if not conn.closed:
+                with self._lock:
+                    self._idle.append(conn)
+        except psycopg2.Error:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self._checkout(settings.PG_POOL_TIMEOUT_SECONDS if timeout is None else timeout)
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools: Dict[tuple, ConnectionPool] = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_pool(config: Dict[str, Any]) -> ConnectionPool:
+    """Process-wide pool for `config`, recreated after fork (Celery prefork, gunicorn)."""
+    global _pools, _pools_pid
+    key = tuple(sorted(config.items()))
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Connections inherited from the parent must not be used by the child
+            _pools, _pools_pid = {}, os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            make_psycopg_green()
+            pool = _pools[key] = ConnectionPool(config, settings.PG_POOL_MAX_CONNECTIONS)
+    return pool
+
+
+def get_connection(config: Dict[str, Any], timeout=None):
+    """Borrow a pooled connection: `with get_connection(config) as conn: ...`"""
+    return get_pool(config).connection(timeout)
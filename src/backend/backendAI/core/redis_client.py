@@ -0,0 +1,22 @@
+"""
+Shared Redis client (REDIS_URL) for primitives the Django cache API lacks:
+pub/sub, locks, lists, sorted sets and scripts.
+
+Usage:
+    from core.redis_client import get_redis
+
+    get_redis().publish(channel, data)
+"""
+
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Lazily initialize a shared Redis client (thread-safe connection pool)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
@@ -0,0 +1,311 @@
+"""
+Fair-share scheduler for AI jobs
+
+Chat messages and batches are not sent to Celery directly. They are queued
+per user in Redis and released into Celery by deficit round-robin (DRR):
+
+    - at most SCHEDULER_MAX_IN_FLIGHT job slots run at once (a chat message
+      costs 1, a batch one slot per lane);
+    - users with waiting jobs take turns; each turn adds
+      SCHEDULER_QUANTUM x tier weight to the user's deficit, and the user
+      dispatches jobs while the deficit covers their cost;
+    - dispatched jobs carry their tier's Celery priority, so inside a queue
+      premium work is picked before free work.
+
+A user with 50 queued jobs therefore gets one slot per turn like everyone
+else, and a light user's job waits for at most one round instead of behind
+the whole backlog.
+
+Every dispatched job holds a lease (SCHEDULER_JOB_LEASE_SECONDS). `release`
+frees it when the job finishes; leases of jobs that died without finishing
+expire. `dispatch` runs on submit, on release and every few seconds from
+Celery beat.
+
+Usage:
+    from core.scheduler import submit, release, request_tier
+
+    submit(user_id, request_tier(request), workflow, job_id=message_id)
+    release(message_id)  # last task of the job
+"""
+
+import json
+import logging
+import time
+
+from celery import current_app
+from django.conf import settings
+
+from core.auth import extract_token_from_header, get_user_roles, verify_jwt_token
+from core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Highest matching JWT role wins; Redis broker priorities: 0 is served first
+TIERS = {
+    "ADMIN": {"weight": 4, "priority": 0},
+    "PREMIUM": {"weight": 2, "priority": 3},
+    "USER": {"weight": 1, "priority": 6},
+}
+DEFAULT_TIER = "USER"
+
+RING_KEY = "sched:ring"           # list: users with waiting jobs, in turn order
+CURRENT_KEY = "sched:current"     # user whose turn is in progress (quantum granted)
+DEFICIT_KEY = "sched:deficit"     # hash: user -> deficit
+INFLIGHT_KEY = "sched:inflight"   # zset: job_id -> lease expiry
+COST_KEY = "sched:cost"           # hash: job_id -> slots held
+LOCK_KEY = "sched:lock"
+DIRTY_KEY = "sched:dirty"         # set by every dispatch call, cleared by the lock holder per pass
+
+# Queue and ring changes run as scripts, so submit and cancel (which do not
+# take LOCK_KEY) never interleave with a dispatch turn. A user is in the ring
+# at most once, and only while their queue is non-empty (or their turn is in
+# progress at the head).
+
+# KEYS: user queue, ring; ARGV: job, user_id. Returns the queue length
+SUBMIT_SCRIPT = """
+local waiting = redis.call('RPUSH', KEYS[1], ARGV[1])
+if not redis.call('LPOS', KEYS[2], ARGV[2]) then
+    redis.call('RPUSH', KEYS[2], ARGV[2])
+end
+return waiting
+"""
+
+# KEYS: user queue, ring, deficit hash; ARGV: job, user_id. Returns 1 if the job was removed
+CANCEL_SCRIPT = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+    return 0
+end
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('LREM', KEYS[2], 0, ARGV[2])
+    redis.call('HDEL', KEYS[3], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: user queue; ARGV: expected head job. Pops it only if it is still the head
+TAKE_SCRIPT = """
+if redis.call('LINDEX', KEYS[1], 0) == ARGV[1] then
+    redis.call('LPOP', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+# KEYS: ring, user queue, deficit hash, current; ARGV: user_id, deficit.
+# Ends the user's turn: drops their ring entry if it is still the head, and
+# queues them at the back while they have jobs left.
+END_TURN_SCRIPT = """
+if redis.call('LINDEX', KEYS[1], 0) == ARGV[1] then
+    redis.call('LPOP', KEYS[1])
+end
+if redis.call('LLEN', KEYS[2]) > 0 then
+    redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+    if not redis.call('LPOS', KEYS[1], ARGV[1]) then
+        redis.call('RPUSH', KEYS[1], ARGV[1])
+    end
+else
+    redis.call('HDEL', KEYS[3], ARGV[1])
+end
+redis.call('DEL', KEYS[4])
+"""
+
+
+def _queue_key(user_id):
+    return f"sched:queue:{user_id}"
+
+
+def tier_for_roles(roles) -> str:
+    for tier in TIERS:
+        if tier in roles:
+            return tier
+    return DEFAULT_TIER
+
+
+def request_tier(request) -> str:
+    """Tier from the request's JWT roles; DEFAULT_TIER without a valid token. Never raises."""
+    try:
+        token = extract_token_from_header(request)
+        if not token:
+            return DEFAULT_TIER
+        return tier_for_roles(get_user_roles(verify_jwt_token(token)))
+    except Exception:
+        return DEFAULT_TIER
+
+
+def priority_for(tier) -> int:
+    return TIERS.get(tier, TIERS[DEFAULT_TIER])["priority"]
+
+
+def submit(user_id, tier, workflow, job_id, cost=1):
+    """
+    Queue `workflow` (a Celery signature/canvas) for `user_id` and dispatch what fits
+
+    Args:
+        tier: Key of TIERS (see request_tier)
+        job_id: Id passed to release() when the job finishes
+        cost: Worker slots the job holds while running
+
+    Returns:
+        Jobs of `user_id` waiting ahead of this one (0 when dispatched right away)
+    """
+    if not settings.SCHEDULER_ENABLED:
+        workflow.apply_async(priority=priority_for(tier))
+        return 0
+
+    job = {
+        "job_id": job_id,
+        "user_id": user_id,
+        "tier": tier if tier in TIERS else DEFAULT_TIER,
+        "cost": max(1, min(cost, settings.SCHEDULER_MAX_IN_FLIGHT)),
+        "workflow": dict(workflow),
+        "queued_at": time.time(),
+    }
+    r = get_redis()
+    r.eval(SUBMIT_SCRIPT, 2, _queue_key(user_id), RING_KEY, json.dumps(job, default=str), user_id)
+    dispatch()
+    return max(0, r.llen(_queue_key(user_id)) - 1)
+
+
+def release(job_id):
+    """Free the slots of a finished job and dispatch waiting jobs. Never raises."""
+    if not settings.SCHEDULER_ENABLED or not job_id:
+        return
+    try:
+        r = get_redis()
+        r.zrem(INFLIGHT_KEY, job_id)
+        r.hdel(COST_KEY, job_id)
+        dispatch()
+    except Exception as e:
+        logger.warning(f"[Scheduler] Failed to release job {job_id}: {e}")
+
+
+def cancel(user_id, job_id) -> bool:
+    """Drop `job_id` from `user_id`'s queue. False if it was already dispatched (or unknown)."""
+    if not settings.SCHEDULER_ENABLED:
+        return False
+    r = get_redis()
+    queue_key = _queue_key(user_id)
+    for raw in r.lrange(queue_key, 0, -1):
+        if json.loads(raw)["job_id"] != job_id:
+            continue
+        # An emptied queue leaves the ring; the next submit re-adds the user
+        return bool(r.eval(CANCEL_SCRIPT, 3, queue_key, RING_KEY, DEFICIT_KEY, raw, user_id))
+    return False
+
+
+def in_flight() -> int:
+    """Slots held by running jobs, after dropping expired leases."""
+    r = get_redis()
+    expired = r.zrangebyscore(INFLIGHT_KEY, "-inf", time.time())
+    if expired:
+        logger.warning(f"[Scheduler] {len(expired)} job lease(s) expired without release")
+        r.zrem(INFLIGHT_KEY, *expired)
+        r.hdel(COST_KEY, *expired)
+    return sum(int(cost) for cost in r.hvals(COST_KEY))
+
+
+def waiting_jobs() -> int:
+    """Jobs queued in the scheduler and not yet sent to Celery."""
+    if not settings.SCHEDULER_ENABLED:
+        return 0
+    r = get_redis()
+    users = r.lrange(RING_KEY, 0, -1)
+    if not users:
+        return 0
+    pipe = r.pipeline()
+    for user_id in users:
+        pipe.llen(_queue_key(user_id.decode()))
+    return sum(pipe.execute())
+
+
+def dispatch() -> int:
+    """
+    Send waiting jobs to Celery in DRR order while slots are free
+
+    Only one process dispatches at a time. A caller that finds the lock taken
+    marks the queues dirty and returns immediately; the holder checks the
+    mark after releasing the lock and runs another pass if it is set, so a
+    job submitted while the holder was finishing is not left for beat.
+
+    Returns:
+        Number of jobs dispatched
+    """
+    r = get_redis()
+    r.set(DIRTY_KEY, 1)
+    dispatched = 0
+    while r.get(DIRTY_KEY):
+        lock = r.lock(LOCK_KEY, timeout=30)
+        if not lock.acquire(blocking=False):
+            break
+        try:
+            r.delete(DIRTY_KEY)
+            dispatched += _dispatch_pass(r)
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                pass
+    return dispatched
+
+
+def _dispatch_pass(r) -> int:
+    """One DRR pass over the ring; the caller holds LOCK_KEY."""
+    dispatched = 0
+    free = settings.SCHEDULER_MAX_IN_FLIGHT - in_flight()
+    while free > 0:
+        user_id = r.lindex(RING_KEY, 0)
+        if user_id is None:
+            break
+        user_id = user_id.decode()
+        queue_key = _queue_key(user_id)
+        head = r.lindex(queue_key, 0)
+        if head is None:
+            # Nothing left for this user: leave the ring, forfeit the deficit
+            _end_turn(r, user_id, 0)
+            continue
+
+        deficit = float(r.hget(DEFICIT_KEY, user_id) or 0)
+        if (r.get(CURRENT_KEY) or b"").decode() != user_id:
+            # New turn: grant the quantum once, even if the turn spans several dispatch calls
+            deficit += settings.SCHEDULER_QUANTUM * TIERS[json.loads(head)["tier"]]["weight"]
+            r.set(CURRENT_KEY, user_id)
+
+        while head is not None:
+            job = json.loads(head)
+            if job["cost"] > deficit:
+                break
+            if job["cost"] > free:
+                # Wait for slots; the user keeps the turn and its deficit
+                r.hset(DEFICIT_KEY, user_id, deficit)
+                return dispatched
+            if not r.eval(TAKE_SCRIPT, 1, queue_key, head):
+                # Cancelled since it was read: look at the new head
+                head = r.lindex(queue_key, 0)
+                continue
+            _start(r, job)
+            deficit -= job["cost"]
+            free -= job["cost"]
+            dispatched += 1
+            head = r.lindex(queue_key, 0)
+
+        # End of turn: move the user to the back of the ring
+        _end_turn(r, user_id, deficit)
+    return dispatched
+
+
+def _end_turn(r, user_id, deficit):
+    r.eval(END_TURN_SCRIPT, 4, RING_KEY, _queue_key(user_id), DEFICIT_KEY, CURRENT_KEY, user_id, deficit)
+
+
+def _start(r, job):
+    r.zadd(INFLIGHT_KEY, {job["job_id"]: time.time() + settings.SCHEDULER_JOB_LEASE_SECONDS})
+    r.hset(COST_KEY, job["job_id"], job["cost"])
+    try:
+        current_app.signature(job["workflow"]).apply_async(priority=priority_for(job["tier"]))
+    except Exception as e:
+        logger.error(f"[Scheduler] Failed to start job {job['job_id']}: {e}")
+        r.zrem(INFLIGHT_KEY, job["job_id"])
+        r.hdel(COST_KEY, job["job_id"])
+        return
+    waited = time.time() - job["queued_at"]
+    logger.info(f"[Scheduler] Started {job['job_id']} for {job['user_id']} ({job['tier']}) after {waited:.1f}s")
@@ -9,6 +9,7 @@ Usage:
     from core.token_client import token_client
     
     balance = token_client.get_user_tokens(user_id="user123")
+    balance = token_client.get_cached_user_tokens(user_id="user123")  # admission checks
     success = token_client.deduct_tokens(user_id="user123", amount=10, reason="image_generation")
 """
 
@@ -17,6 +18,8 @@ import logging
 import math
 from typing import Optional, Dict, Any
 from django.conf import settings
+from django.core.cache import cache
+from core.constants import ResponseCode
 from core.exceptions import InsufficientTokensError, TokenServiceError
 
 logger = logging.getLogger(__name__)
@@ -133,6 +136,27 @@ class TokenClient:
             logger.error(f"Failed to get tokens for user {user_id}: {str(e)}")
             raise
     
+    @staticmethod
+    def _balance_cache_key(user_id: str) -> str:
+        return f"token_balance:{user_id}"
+
+    def get_cached_user_tokens(self, user_id: str) -> int:
+        """
+        Token balance for admission checks, cached for TOKEN_BALANCE_CACHE_SECONDS
+
+        The entry is dropped on every deduction; top-ups made elsewhere show
+        up after the TTL. Deductions themselves always go to the API.
+
+        Raises:
+            TokenServiceError: When the balance is not cached and the API request fails
+        """
+        cache_key = self._balance_cache_key(user_id)
+        balance = cache.get(cache_key)
+        if balance is None:
+            balance = self.get_user_tokens(user_id)
+            cache.set(cache_key, balance, timeout=getattr(settings, 'TOKEN_BALANCE_CACHE_SECONDS', 30))
+        return balance
+
     def deduct_tokens(
         self, 
         user_id: str, 
@@ -168,8 +192,11 @@ class TokenClient:
             # PATCH /api/v1/identity/users/modify-tokens
             response = self._make_request('PATCH', '/api/v1/identity/users/modify-tokens', json=payload)
             
-            # Response format: {"code": 1000, "message": "success", "result": ...}
-            success = response.get('code') == 1000
+            # The request went through (errors raise above): the cached balance is stale either way
+            cache.delete(self._balance_cache_key(user_id))
+
+            # Response format: {"code": 200, "message": "User tokens modified successfully"}
+            success = response.get('code') in (200, ResponseCode.SUCCESS)
             
             if success:
                 logger.info(f"Successfully deducted {amount} tokens from user {user_id}")
@@ -184,6 +211,23 @@ class TokenClient:
             logger.error(f"Failed to deduct tokens for user {user_id}: {str(e)}")
             raise TokenServiceError(f"Token deduction failed: {str(e)}")
     
+    def refund_tokens(
+        self,
+        user_id: str,
+        amount: int,
+        reason: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        Give back tokens deducted for work that never ran
+
+        modify-tokens subtracts the amount it is sent, so a refund is a negative deduction.
+
+        Raises:
+            TokenServiceError: When API request fails
+        """
+        return self.deduct_tokens(user_id=user_id, amount=-amount, reason=reason, metadata=metadata)
+
     def check_sufficient_tokens(self, user_id: str, required: int) -> bool:
         """
         Check if user has sufficient tokens (without deducting)